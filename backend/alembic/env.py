@@ -7,7 +7,7 @@ from sqlalchemy import engine_from_config, pool
 # Import app settings + metadata
 from app.config import settings
 from app.database import Base  # Base.metadata
-from app import models  # noqa: F401 (ensures models are imported)
+from app.models import cognitive  # noqa: F401 (ensures models are imported)
 
 config = context.config
 
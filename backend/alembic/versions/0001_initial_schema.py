@@ -0,0 +1,89 @@
+"""initial schema
+
+Matches the tables previously created by Base.metadata.create_all. Databases
+created that way should be stamped instead of upgraded:
+  alembic stamp 0001_initial_schema
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sessions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sessions_id', 'sessions', ['id'])
+    op.create_index('ix_sessions_session_id', 'sessions', ['session_id'], unique=True)
+
+    op.create_table(
+        'cognitive_metrics',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.String(length=100), nullable=True),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('avg_dwell_time', sa.Float(), nullable=True),
+        sa.Column('avg_flight_time', sa.Float(), nullable=True),
+        sa.Column('pause_count', sa.Integer(), nullable=True),
+        sa.Column('avg_pause_duration', sa.Float(), nullable=True),
+        sa.Column('error_rate', sa.Float(), nullable=True),
+        sa.Column('correction_rate', sa.Float(), nullable=True),
+        sa.Column('text_length', sa.Integer(), nullable=True),
+        sa.Column('sentiment_score', sa.Float(), nullable=True),
+        sa.Column('word_count', sa.Integer(), nullable=True),
+        sa.Column('cognitive_load', sa.Float(), nullable=True),
+        sa.Column('mood_drift', sa.Float(), nullable=True),
+        sa.Column('decision_stability', sa.Float(), nullable=True),
+        sa.Column('risk_volatility', sa.Float(), nullable=True),
+        sa.Column('heat', sa.Float(), nullable=True),
+        sa.Column('rage', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_cognitive_metrics_id', 'cognitive_metrics', ['id'])
+    op.create_index('ix_cognitive_metrics_session_id', 'cognitive_metrics', ['session_id'])
+
+    op.create_table(
+        'diary_entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.String(length=100), nullable=True),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('mood_rating', sa.Integer(), nullable=True),
+        sa.Column('mood_notes', sa.Text(), nullable=True),
+        sa.Column('cognitive_load', sa.Float(), nullable=True),
+        sa.Column('mood_drift', sa.Float(), nullable=True),
+        sa.Column('decision_stability', sa.Float(), nullable=True),
+        sa.Column('risk_volatility', sa.Float(), nullable=True),
+        sa.Column('heat', sa.Float(), nullable=True),
+        sa.Column('rage', sa.Float(), nullable=True),
+        sa.Column('is_crisis', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_diary_entries_id', 'diary_entries', ['id'])
+    op.create_index('ix_diary_entries_session_id', 'diary_entries', ['session_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_diary_entries_session_id', table_name='diary_entries')
+    op.drop_index('ix_diary_entries_id', table_name='diary_entries')
+    op.drop_table('diary_entries')
+    op.drop_index('ix_cognitive_metrics_session_id', table_name='cognitive_metrics')
+    op.drop_index('ix_cognitive_metrics_id', table_name='cognitive_metrics')
+    op.drop_table('cognitive_metrics')
+    op.drop_index('ix_sessions_session_id', table_name='sessions')
+    op.drop_index('ix_sessions_id', table_name='sessions')
+    op.drop_table('sessions')
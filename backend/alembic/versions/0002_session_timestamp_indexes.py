@@ -0,0 +1,43 @@
+"""composite (session_id, timestamp DESC, id DESC) history indexes
+
+Per-session history reads (ORDER BY timestamp DESC, id DESC LIMIT n, and
+keyset pages below a (timestamp, id) cursor) become index range scans. The
+composite indexes lead with session_id, so they replace the single-column
+session_id indexes.
+
+Revision ID: 0002_session_timestamp_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 00:00:01
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_session_timestamp_indexes'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_cognitive_metrics_session_ts',
+        'cognitive_metrics',
+        ['session_id', sa.text('timestamp DESC'), sa.text('id DESC')],
+    )
+    op.drop_index('ix_cognitive_metrics_session_id', table_name='cognitive_metrics')
+    op.create_index(
+        'ix_diary_entries_session_ts',
+        'diary_entries',
+        ['session_id', sa.text('timestamp DESC'), sa.text('id DESC')],
+    )
+    op.drop_index('ix_diary_entries_session_id', table_name='diary_entries')
+
+
+def downgrade() -> None:
+    op.create_index('ix_diary_entries_session_id', 'diary_entries', ['session_id'])
+    op.drop_index('ix_diary_entries_session_ts', table_name='diary_entries')
+    op.create_index('ix_cognitive_metrics_session_id', 'cognitive_metrics', ['session_id'])
+    op.drop_index('ix_cognitive_metrics_session_ts', table_name='cognitive_metrics')
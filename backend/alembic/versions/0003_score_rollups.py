@@ -0,0 +1,46 @@
+"""minute/hour/day score rollup tables
+
+One row per (session_id, bucket start) with count and min/max/sum of each
+score, kept up to date by the insert paths. Existing history can be folded
+in afterwards with:
+  python -m app.services.rollups --rebuild
+
+Revision ID: 0003_score_rollups
+Revises: 0002_session_timestamp_indexes
+Create Date: 2026-10-18 00:00:02
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_score_rollups'
+down_revision = '0002_session_timestamp_indexes'
+branch_labels = None
+depends_on = None
+
+ROLLUP_TABLES = ('cognitive_rollups_minute', 'cognitive_rollups_hour', 'cognitive_rollups_day')
+SCORES = ('cognitive_load', 'mood_drift', 'decision_stability', 'risk_volatility', 'heat', 'rage')
+
+
+def upgrade() -> None:
+    for table in ROLLUP_TABLES:
+        score_columns = [
+            sa.Column(f'{score}_{agg}', sa.Float(), nullable=True)
+            for score in SCORES
+            for agg in ('min', 'max', 'sum')
+        ]
+        op.create_table(
+            table,
+            sa.Column('session_id', sa.String(length=100), nullable=False),
+            sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            *score_columns,
+            sa.PrimaryKeyConstraint('session_id', 'bucket'),
+        )
+
+
+def downgrade() -> None:
+    for table in reversed(ROLLUP_TABLES):
+        op.drop_table(table)
@@ -0,0 +1,116 @@
+"""optional monthly partitioning of cognitive_metrics (PostgreSQL)
+
+Runs only on PostgreSQL with METRICS_PARTITIONING=true; everywhere else the
+revision is a no-op, so it can be applied unconditionally. To convert an
+existing database later, step back to the revision before this one (which
+from head also reverts 0006_cohort_watermark_gaps and 0005_cohort_aggregates,
+dropping the cohort tables), re-apply, then rebuild the cohort aggregates:
+  alembic downgrade 0003_score_rollups
+  METRICS_PARTITIONING=true alembic upgrade head
+  python -m app.services.cohort --rebuild
+
+cognitive_metrics becomes a table partitioned BY RANGE ("timestamp") with one
+partition per month (cognitive_metrics_yYYYYmMM) from the oldest row through
+METRICS_PARTITION_MONTHS_AHEAD months ahead, plus cognitive_metrics_default
+for anything outside them. Postgres requires the partition key in every
+unique constraint, so the primary key becomes (id, timestamp) and timestamp
+becomes NOT NULL. Existing rows are copied inside the migration transaction,
+which locks the table for the duration of the copy.
+
+Day-to-day partition management: python -m app.partitions --help
+
+Revision ID: 0004_partition_cognitive_metrics
+Revises: 0003_score_rollups
+Create Date: 2026-10-18 00:00:03
+
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+
+# revision identifiers, used by Alembic.
+revision = '0004_partition_cognitive_metrics'
+down_revision = '0003_score_rollups'
+branch_labels = None
+depends_on = None
+
+TABLE = 'cognitive_metrics'
+
+
+def _is_partitioned(bind) -> bool:
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": TABLE}).scalar()
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _create_indexes() -> None:
+    op.execute(f'CREATE INDEX ix_{TABLE}_id ON {TABLE} (id)')
+    op.execute(f'CREATE INDEX ix_{TABLE}_session_ts ON {TABLE} (session_id, "timestamp" DESC, id DESC)')
+
+
+def _swap_out_old_table(suffix: str) -> str:
+    """Rename the current table and its indexes out of the way; returns the new name"""
+    old = f'{TABLE}_{suffix}'
+    op.execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+    op.execute(f'ALTER INDEX ix_{TABLE}_id RENAME TO ix_{old}_id')
+    op.execute(f'ALTER INDEX ix_{TABLE}_session_ts RENAME TO ix_{old}_session_ts')
+    op.execute(f'ALTER TABLE {old} RENAME CONSTRAINT {TABLE}_pkey TO {old}_pkey')
+    return old
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not settings.metrics_partitioning or _is_partitioned(bind):
+        return
+
+    legacy = _swap_out_old_table('legacy')
+    # LIKE ... INCLUDING DEFAULTS keeps id's nextval() on the existing sequence
+    op.execute(f'CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")')
+    op.execute(f'ALTER TABLE {TABLE} ALTER COLUMN "timestamp" SET NOT NULL')
+    op.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, "timestamp")')
+    op.execute(f'ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+    _create_indexes()
+
+    oldest = bind.execute(sa.text(f'SELECT min("timestamp") FROM {legacy}')).scalar()
+    today = datetime.now(timezone.utc).date()
+    first = oldest.astimezone(timezone.utc).date() if oldest else today
+    month = date(first.year, first.month, 1)
+    last = date(today.year, today.month, 1)
+    for _ in range(settings.metrics_partition_months_ahead):
+        last = _next_month(last)
+    while month <= last:
+        upper = _next_month(month)
+        # Bounds are explicit UTC so they do not depend on the session TimeZone
+        op.execute(
+            f"CREATE TABLE {TABLE}_y{month.year:04d}m{month.month:02d} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        )
+        month = upper
+    op.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+    op.execute(f'UPDATE {legacy} SET "timestamp" = now() WHERE "timestamp" IS NULL')
+    op.execute(f'INSERT INTO {TABLE} SELECT * FROM {legacy}')
+    op.execute(f'DROP TABLE {legacy}')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not _is_partitioned(bind):
+        return
+
+    partitioned = _swap_out_old_table('partitioned')
+    op.execute(f'CREATE TABLE {TABLE} (LIKE {partitioned} INCLUDING DEFAULTS)')
+    op.execute(f'ALTER TABLE {TABLE} ALTER COLUMN "timestamp" DROP NOT NULL')
+    op.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id)')
+    op.execute(f'ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+    _create_indexes()
+    op.execute(f'INSERT INTO {TABLE} SELECT * FROM {partitioned}')
+    # Dropping the parent drops every attached partition with it
+    op.execute(f'DROP TABLE {partitioned}')
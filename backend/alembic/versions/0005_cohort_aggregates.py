@@ -0,0 +1,62 @@
+"""cross-session cohort aggregates
+
+Hour and day score histograms (one row per non-empty bin), hourly diary
+counts and the id watermarks of the incremental refresh, plus bucket
+indexes on the hour/day rollups for the threshold queries. Existing history
+can be folded in afterwards with:
+  python -m app.services.cohort --rebuild
+
+Revision ID: 0005_cohort_aggregates
+Revises: 0004_partition_cognitive_metrics
+Create Date: 2026-10-18 00:00:04
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005_cohort_aggregates'
+down_revision = '0004_partition_cognitive_metrics'
+branch_labels = None
+depends_on = None
+
+HISTOGRAM_TABLES = ('cohort_score_hist_hour', 'cohort_score_hist_day')
+ROLLUP_TABLES = ('cognitive_rollups_hour', 'cognitive_rollups_day')
+
+
+def upgrade() -> None:
+    for table in HISTOGRAM_TABLES:
+        op.create_table(
+            table,
+            sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('score', sa.String(length=32), nullable=False),
+            sa.Column('bin', sa.SmallInteger(), nullable=False),
+            sa.Column('count', sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint('bucket', 'score', 'bin'),
+        )
+    op.create_table(
+        'cohort_diary_hour',
+        sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('entries', sa.BigInteger(), nullable=False),
+        sa.Column('crisis_entries', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('bucket'),
+    )
+    op.create_table(
+        'cohort_watermarks',
+        sa.Column('source', sa.String(length=64), nullable=False),
+        sa.Column('last_id', sa.BigInteger(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('source'),
+    )
+    for table in ROLLUP_TABLES:
+        op.create_index(f'ix_{table}_bucket', table, ['bucket'], unique=False)
+
+
+def downgrade() -> None:
+    for table in reversed(ROLLUP_TABLES):
+        op.drop_index(f'ix_{table}_bucket', table_name=table)
+    op.drop_table('cohort_watermarks')
+    op.drop_table('cohort_diary_hour')
+    for table in reversed(HISTOGRAM_TABLES):
+        op.drop_table(table)
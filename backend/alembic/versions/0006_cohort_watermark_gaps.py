@@ -0,0 +1,34 @@
+"""cohort watermark id-gap tracking
+
+Lets the cohort refresh hold its watermark at a gap in the ids until the
+transactions that could still commit into it have ended (PostgreSQL), so
+rows committed out of id order are not skipped. Rows skipped before this
+revision can be folded in with:
+  python -m app.services.cohort --rebuild
+
+Revision ID: 0006_cohort_watermark_gaps
+Revises: 0005_cohort_aggregates
+Create Date: 2026-10-18 00:00:05
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_cohort_watermark_gaps'
+down_revision = '0005_cohort_aggregates'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('settled_id', 'pending_id', 'pending_xid')
+
+
+def upgrade() -> None:
+    for name in COLUMNS:
+        op.add_column('cohort_watermarks', sa.Column(name, sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    for name in reversed(COLUMNS):
+        op.drop_column('cohort_watermarks', name)
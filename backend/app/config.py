@@ -1,10 +1,114 @@
+from typing import Literal
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
+    # Where metrics and diary entries live: the database (sql) or per-session
+    # ring buffers in the worker process (memory; no database at all)
+    storage_backend: Literal["sql", "memory"] = "sql"
+    memory_ring_capacity: int = 2048
+    memory_max_bytes: int = 64 * 1024 * 1024
+    memory_diary_capacity: int = 256
+    
     database_url: str = "postgresql://cognitwin:cognitwin@db:5432/cognitwin"
     cors_origins: str = "http://localhost:5173,http://localhost:3000"
     
+    # Connection pool (SQLAlchemy defaults); recycle -1 never recycles
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    # Read replicas (comma-separated URLs) for the read-only endpoints; reads
+    # of a session written in the last REPLICA_READ_YOUR_WRITES seconds, and
+    # reads while every replica is down, use the primary
+    database_replica_urls: str = ""
+    replica_read_your_writes: float = 5.0
+    replica_retry_after: float = 10.0
+    # Admission control: per-session token bucket for the analyze paths (the
+    # web client sends every 5s; 0 disables) and a cap on in-flight /api
+    # requests per worker, about DB_POOL_SIZE + DB_MAX_OVERFLOW (0 disables)
+    rate_limit_per_session: float = 1.0
+    rate_limit_burst: int = 10
+    rate_limit_max_sessions: int = 100000
+    max_concurrent_requests: int = 15
+    # create_all at startup (dev/test); Alembic-managed databases set this false
+    db_create_tables: bool = True
+    # How long startup waits for the database to accept connections
+    db_startup_timeout: float = 30.0
+    
+    # Monthly partitioning of cognitive_metrics (PostgreSQL, migration 0004
+    # and python -m app.partitions); retention 0 keeps every partition
+    metrics_partitioning: bool = False
+    metrics_partition_months_ahead: int = 3
+    metrics_retention_months: int = 0
+    
+    # Serve the cognitive/diary routes as async endpoints on an AsyncEngine
+    async_db: bool = False
+    
+    # Optional JSON scoring spec; empty uses the built-in spec
+    scoring_spec_path: str = ""
+    scoring_spec_reload_interval: float = 2.0
+    
+    # In-process cache of known session IDs
+    session_cache_size: int = 100000
+    session_cache_ttl: float = 3600.0
+    
+    # Shared cache for per-session state across workers (memory:// or
+    # redis://host:6379/0); empty keeps the per-process caches below
+    cache_url: str = ""
+    cache_ttl: float = 3600.0
+    cache_timeout: float = 0.5
+    
+    # Per-session cache of the newest metric row
+    snapshot_cache_max_bytes: int = 16 * 1024 * 1024
+    
+    # /ws/cognitive connections persist their rows in groups
+    ws_flush_size: int = 50
+    ws_flush_interval: float = 10.0
+    ws_max_buffered_rows: int = 500
+    
+    # Per-session online stats (trend endpoint, baseline z-scores)
+    rolling_stats_max_sessions: int = 10000
+    rolling_stats_window: int = 50
+    rolling_stats_alpha: float = 0.1
+    baseline_min_samples: int = 10
+    
+    # Write-behind persistence for /api/cognitive/analyze (opt-in)
+    write_behind_enabled: bool = False
+    write_behind_flush_size: int = 500
+    write_behind_flush_interval: float = 1.0
+    write_behind_queue_size: int = 10000
+    write_behind_enqueue_timeout: float = 0.05
+    write_behind_max_retries: int = 5
+    write_behind_retry_backoff: float = 0.5
+    
+    # Operational endpoints (/internal/*, profile downloads, /metrics): not
+    # mounted unless enabled; with a token, requests must send X-Internal-Token
+    internal_endpoints_enabled: bool = False
+    internal_token: str = ""
+    
+    # cProfile sampling (off unless a rate or header token is set)
+    profile_sample_rate: float = 0.0
+    profile_header_token: str = ""
+    profile_dir: str = "profiles"
+    profile_keep: int = 200
+    
+    # Cross-session aggregates (/api/analytics/cohort); interval 0 disables
+    # the in-process refresher (use python -m app.services.cohort --refresh)
+    cohort_refresh_interval: float = 60.0
+    cohort_refresh_lag: float = 30.0
+    cohort_refresh_batch_size: int = 5000
+    
     class Config:
         env_file = ".env"
+    
+    @model_validator(mode="after")
+    def memory_storage_is_sync(self) -> "Settings":
+        # The memory backend serves the sync routes and never opens an engine
+        if self.storage_backend == "memory":
+            self.async_db = False
+        return self
 
 settings = Settings()
@@ -1,16 +1,209 @@
-from sqlalchemy import create_engine
+"""
+Engines and session factories, all built on first use
+Importing the app (a uvicorn worker spawn, a test module, a CLI) neither
+loads a DB driver nor connects; schema creation is an explicit startup step
+(see init_schema) or an Alembic migration.
+"""
+import logging
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
+from app.services.pool_monitor import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    async_pool_monitor,
+    sync_pool_monitor,
+)
+from app.services.cache import off_loop
+from app.services.replicas import recent_writes, replica_set
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+def pool_options(url: str, poolclass) -> dict:
+    """Pool settings for create_engine; in-memory SQLite keeps its single-connection pool"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
 
-engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    engine = create_engine(settings.database_url, **pool_options(settings.database_url, InstrumentedQueuePool))
+    sync_pool_monitor.attach(engine.pool)
+    return engine
+
+@lru_cache(maxsize=None)
+def get_sessionmaker() -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+def new_session() -> Session:
+    return get_sessionmaker()()
+
+def init_schema(timeout: float) -> None:
+    """
+    create_all for dev/test databases (DB_CREATE_TABLES); production runs
+    `alembic upgrade head` instead. Retries while the database is still
+    starting, for up to `timeout` seconds.
+    """
+    import app.models.cognitive  # noqa: F401 (registers the tables on Base.metadata)
+
+    engine = get_engine()
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while True:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            break
+        except OperationalError as exc:
+            if time.monotonic() + delay > deadline:
+                raise
+            logger.warning("Database not reachable yet (%s); retrying in %.1fs", exc.orig, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+    Base.metadata.create_all(bind=engine)
+
+# Async drivers for the sync URLs we accept (ASYNC_DB mode)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
 def get_db():
-    db = SessionLocal()
+    db = new_session()
     try:
         yield db
     finally:
         db.close()
+
+def replica_options(url: str, poolclass) -> dict:
+    # Always pre-ping: a replica restarted by a failover must fail at checkout
+    options = pool_options(url, poolclass)
+    if options:
+        options["pool_pre_ping"] = True
+    return options
+
+@lru_cache(maxsize=None)
+def get_replica_engine(index: int) -> Engine:
+    url = replica_set.urls[index]
+    return create_engine(url, **replica_options(url, QueuePool))
+
+def uses_replica(db) -> bool:
+    return "replica" in db.info
+
+def read_session(session_id: Optional[str] = None) -> Session:
+    """
+    Session for read-only work: the next healthy replica, or the primary
+    when there are none, all are down, or the session wrote recently
+    """
+    if replica_set.enabled and session_id and recent_writes.recent(session_id):
+        replica_set.count("read_your_writes")
+    elif replica_set.enabled:
+        for index in replica_set.candidates():
+            db = Session(bind=get_replica_engine(index), autoflush=False, info={"replica": index})
+            try:
+                # Check out (and pre-ping) now, so a dead replica fails over here
+                db.connection()
+            except DBAPIError as exc:
+                db.close()
+                replica_set.mark_down(index, exc)
+                continue
+            replica_set.count("replica_reads")
+            return db
+        replica_set.count("primary_reads")
+    return new_session()
+
+def get_read_db(request: Request):
+    """get_db for read-only routes; a {session_id} path parameter enables read-your-writes"""
+    db = read_session(request.path_params.get("session_id"))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL (e.g. postgresql://, postgresql+psycopg2://) to its async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} URLs")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+@lru_cache(maxsize=None)
+def get_async_engine():
+    # Built on first use so sync-only deployments never need asyncpg/aiosqlite
+    # (or the import time of sqlalchemy.ext.asyncio)
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url(settings.database_url)
+    async_engine = create_async_engine(url, **pool_options(url, InstrumentedAsyncQueuePool))
+    async_pool_monitor.attach(async_engine.sync_engine.pool)
+    return async_engine
+
+@lru_cache(maxsize=None)
+def get_async_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # expire_on_commit=False: attribute access after commit must not do implicit IO
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+@lru_cache(maxsize=None)
+def get_async_replica_engine(index: int):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_database_url(replica_set.urls[index])
+    return create_async_engine(url, **replica_options(url, AsyncAdaptedQueuePool))
+
+async def async_read_session(session_id: Optional[str] = None) -> "AsyncSession":
+    """Async counterpart of read_session"""
+    if replica_set.enabled and session_id and await off_loop(recent_writes.recent, session_id):
+        replica_set.count("read_your_writes")
+    elif replica_set.enabled:
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        for index in replica_set.candidates():
+            db = AsyncSession(
+                get_async_replica_engine(index), autoflush=False, expire_on_commit=False, info={"replica": index}
+            )
+            try:
+                await db.connection()
+            except DBAPIError as exc:
+                await db.close()
+                replica_set.mark_down(index, exc)
+                continue
+            replica_set.count("replica_reads")
+            return db
+        replica_set.count("primary_reads")
+    return get_async_sessionmaker()()
+
+async def get_async_read_db(request: Request):
+    db = await async_read_session(request.path_params.get("session_id"))
+    try:
+        yield db
+    finally:
+        await db.close()
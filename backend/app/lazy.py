@@ -0,0 +1,23 @@
+"""
+Deferred imports for heavy modules only some requests need
+  np = lazy_module("numpy")
+binds a stand-in that imports numpy on its first attribute access and then
+copies the module's namespace onto itself, so later lookups cost the same
+as on the real module. Annotations must not touch the proxy at import time:
+write them as strings ("np.ndarray").
+"""
+import importlib
+from types import ModuleType
+from typing import Any
+
+
+class _LazyModule(ModuleType):
+    def __getattr__(self, attr: str) -> Any:
+        # Only called for names not yet in __dict__, i.e. before the import
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_module(name: str) -> ModuleType:
+    return _LazyModule(name)
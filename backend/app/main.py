@@ -1,22 +1,82 @@
-from fastapi import FastAPI
+# Imported first so the startup timer covers the rest of the app import
+from app.services.startup import startup_timer
+
+import logging
+import math
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.database import engine, Base
-from app.routes import cognitive, diary, health
+from app.database import get_async_engine, init_schema
+from app.routes import analytics, cognitive, cognitive_ws, diary, health, internal
+from app.services.admission import AdmissionMiddleware, concurrency_limiter
+from app.services.cohort import cohort_refresher
+from app.services.pagination import NEXT_CURSOR_HEADER
+from app.services.profiling import ProfilerMiddleware, profile_store, profile_sync_endpoints, profiling_enabled
+from app.services.storage import uses_memory
+from app.services.telemetry import RequestMetricsMiddleware
+from app.services.write_behind import metric_writer
 from app.logging_config import setup_logging
 
 # Configure logging
 setup_logging()
+logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema creation is a startup step, not an import side effect; with
+    # Alembic-managed databases set DB_CREATE_TABLES=false. With
+    # STORAGE_BACKEND=memory nothing here touches a database.
+    memory = uses_memory()
+    if settings.db_create_tables and not memory:
+        await run_in_threadpool(init_schema, settings.db_startup_timeout)
+    if settings.write_behind_enabled and not memory:
+        metric_writer.start()
+    if settings.cohort_refresh_interval > 0 and not memory:
+        cohort_refresher.start()
+    startup_timer.mark("ready")
+    logger.info(
+        "Startup: app imported in %.0f ms, ready after %.0f ms",
+        startup_timer.offset_ms("imported"), startup_timer.offset_ms("ready"),
+    )
+    yield
+    # Flush queued metric rows before the worker exits
+    await run_in_threadpool(metric_writer.stop)
+    await run_in_threadpool(cohort_refresher.stop)
+    if settings.async_db:
+        await get_async_engine().dispose()
 
 app = FastAPI(
     title="CogniTwin API",
     description="Real-time cognitive digital twin - models user mental state from typing behavior",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+def _json_safe(value):
+    """Non-finite floats as strings, so they can be echoed back in a JSON body"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    return value
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # The default handler echoes the input, and a NaN/Infinity in it (valid
+    # in Python's JSON parser) would turn the 422 into a 500
+    return JSONResponse(status_code=422, content={"detail": _json_safe(jsonable_encoder(exc.errors()))})
+
+# Innermost, so shed requests still get CORS headers and request metrics
+app.add_middleware(AdmissionMiddleware, limiter=concurrency_limiter)
+
 # CORS middleware
 origins = settings.cors_origins.split(",")
 app.add_middleware(
@@ -25,12 +85,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+# Outermost, so latency includes CORS handling
+app.add_middleware(RequestMetricsMiddleware)
+if profiling_enabled():
+    app.add_middleware(
+        ProfilerMiddleware,
+        store=profile_store,
+        sample_rate=settings.profile_sample_rate,
+        header_token=settings.profile_header_token,
+    )
+
+# Include routers (ASYNC_DB swaps in the AsyncSession versions, same paths)
+if settings.async_db:
+    from app.routes import cognitive_async, diary_async
 
-# Include routers
-app.include_router(cognitive.router)
-app.include_router(diary.router)
+    app.include_router(cognitive_async.router)
+    app.include_router(diary_async.router)
+else:
+    app.include_router(cognitive.router)
+    app.include_router(diary.router)
+# Cohort analytics read the database's aggregate tables
+if not uses_memory():
+    app.include_router(analytics.router)
+app.include_router(cognitive_ws.router)
 app.include_router(health.router)
+# Pool, queue, cache and startup internals, profile downloads and /metrics
+if settings.internal_endpoints_enabled:
+    app.include_router(internal.router)
+    app.include_router(internal.metrics_router)
 
 @app.get("/")
 def root():
@@ -43,3 +127,9 @@ def root():
 @app.get("/health")
 def health():
     return {"status": "healthy"}
+
+# Sync endpoints run in the threadpool, outside the middleware's profiler
+if profiling_enabled():
+    profile_sync_endpoints(app.routes)
+
+startup_timer.mark("imported")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, Text, Boolean
+from sqlalchemy import BigInteger, Column, Integer, Float, SmallInteger, String, DateTime, Text, Boolean, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -16,7 +16,7 @@ class CognitiveMetric(Base):
     __tablename__ = "cognitive_metrics"
     
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String(100), index=True)
+    session_id = Column(String(100))
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
     # Derived timing features (aggregated, not individual keystrokes)
@@ -43,13 +43,95 @@ class CognitiveMetric(Base):
     # Enhanced mental health metrics
     heat = Column(Float)  # Agitation/arousal level
     rage = Column(Float)  # Anger intensity
+    
+    # Serves per-session history (newest first) and keyset pagination
+    __table_args__ = (
+        Index("ix_cognitive_metrics_session_ts", session_id, timestamp.desc(), id.desc()),
+    )
+
+class RollupMixin:
+    """Per-session score aggregates over one time bucket; mean = sum / count"""
+    session_id = Column(String(100), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Bucket start (UTC)
+    count = Column(Integer, nullable=False)
+    
+    cognitive_load_min = Column(Float)
+    cognitive_load_max = Column(Float)
+    cognitive_load_sum = Column(Float)
+    mood_drift_min = Column(Float)
+    mood_drift_max = Column(Float)
+    mood_drift_sum = Column(Float)
+    decision_stability_min = Column(Float)
+    decision_stability_max = Column(Float)
+    decision_stability_sum = Column(Float)
+    risk_volatility_min = Column(Float)
+    risk_volatility_max = Column(Float)
+    risk_volatility_sum = Column(Float)
+    heat_min = Column(Float)
+    heat_max = Column(Float)
+    heat_sum = Column(Float)
+    rage_min = Column(Float)
+    rage_max = Column(Float)
+    rage_sum = Column(Float)
+
+class MinuteRollup(RollupMixin, Base):
+    __tablename__ = "cognitive_rollups_minute"
+
+class HourRollup(RollupMixin, Base):
+    __tablename__ = "cognitive_rollups_hour"
+    # Cross-session (cohort) queries scan a bucket range
+    __table_args__ = (Index("ix_cognitive_rollups_hour_bucket", "bucket"),)
+
+class DayRollup(RollupMixin, Base):
+    __tablename__ = "cognitive_rollups_day"
+    __table_args__ = (Index("ix_cognitive_rollups_day_bucket", "bucket"),)
+
+class CohortHistogramMixin:
+    """
+    Fleet-wide score distribution over one time bucket: a fixed-width
+    histogram over [0, 1], one row per non-empty bin, so buckets merge by
+    adding counts
+    """
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Bucket start (UTC)
+    score = Column(String(32), primary_key=True)
+    bin = Column(SmallInteger, primary_key=True)
+    count = Column(BigInteger, nullable=False)
+
+class CohortHourHistogram(CohortHistogramMixin, Base):
+    __tablename__ = "cohort_score_hist_hour"
+
+class CohortDayHistogram(CohortHistogramMixin, Base):
+    __tablename__ = "cohort_score_hist_day"
+
+class CohortDiaryHour(Base):
+    """Diary entries and crisis entries per hour, across all sessions"""
+    __tablename__ = "cohort_diary_hour"
+    
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    entries = Column(BigInteger, nullable=False)
+    crisis_entries = Column(BigInteger, nullable=False)
+
+class CohortWatermark(Base):
+    """Highest source row id folded into the cohort aggregates, per source table"""
+    __tablename__ = "cohort_watermarks"
+    
+    source = Column(String(64), primary_key=True)
+    last_id = Column(BigInteger, nullable=False)
+    refreshed_at = Column(DateTime(timezone=True))
+    # Id gaps up to settled_id are final (rolled back, never committed). A
+    # refresh held at a younger gap records the highest id it saw and the
+    # txid horizon of its snapshot; once every transaction below that
+    # horizon has ended, gaps up to pending_id are final too (PostgreSQL)
+    settled_id = Column(BigInteger)
+    pending_id = Column(BigInteger)
+    pending_xid = Column(BigInteger)
 
 class DiaryEntry(Base):
     """Behavior diary entries for mood logging"""
     __tablename__ = "diary_entries"
     
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(String(100), index=True)
+    session_id = Column(String(100))
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
     # User-provided mood data
@@ -66,3 +148,7 @@ class DiaryEntry(Base):
     
     # Context flags
     is_crisis = Column(Boolean, default=False)  # Marked as crisis entry
+    
+    __table_args__ = (
+        Index("ix_diary_entries_session_ts", session_id, timestamp.desc(), id.desc()),
+    )
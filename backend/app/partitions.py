@@ -0,0 +1,210 @@
+"""Partition maintenance for cognitive_metrics (PostgreSQL).
+
+Needs the monthly layout from migration 0004 (METRICS_PARTITIONING=true).
+Run from backend/, e.g. daily from cron:
+  python -m app.partitions ensure    # create partitions for the coming months
+  python -m app.partitions retain    # drop (or --detach) months past retention
+  python -m app.partitions compact   # CLUSTER + ANALYZE the last closed month
+  python -m app.partitions report    # rows and size per partition
+
+Rollup tables are not partitioned and keep their history after raw
+partitions expire, so long-range charts keep working.
+"""
+
+import argparse
+import re
+import sys
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.config import settings
+from app.database import get_engine
+
+TABLE = "cognitive_metrics"
+DEFAULT_PARTITION = f"{TABLE}_default"
+SESSION_INDEX = f"ix_{TABLE}_session_ts"
+PARTITION_NAME = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def current_month(now: Optional[datetime] = None) -> date:
+    now = now or datetime.now(timezone.utc)
+    return date(now.year, now.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _bound(month: date) -> str:
+    # Explicit UTC so bounds do not depend on the session TimeZone
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+def expired_months(months: List[date], retention_months: int, this_month: date) -> List[date]:
+    """Months lying entirely before the retention cutoff (none if retention is 0)"""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(this_month, -retention_months)
+    return sorted(month for month in months if add_months(month, 1) <= cutoff)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": TABLE}).scalar()
+
+
+def list_partitions(conn: Connection) -> List[Dict]:
+    rows = conn.execute(text(
+        "SELECT c.relname AS name, c.reltuples::bigint AS rows, "
+        "pg_total_relation_size(c.oid) AS bytes "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": TABLE}).mappings().all()
+    return [{**row, "month": partition_month(row["name"])} for row in rows]
+
+
+def ensure_partitions(conn: Connection, months_ahead: int) -> List[str]:
+    """Create missing partitions from the current month through months_ahead"""
+    existing = {p["name"] for p in list_partitions(conn)}
+    created = []
+    month = current_month()
+    for _ in range(months_ahead + 1):
+        name = partition_name(month)
+        if name not in existing:
+            _create_partition(conn, name, month)
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def _create_partition(conn: Connection, name: str, month: date) -> None:
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    has_default = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}).scalar()
+    stray = has_default and conn.execute(text(
+        f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE "timestamp" >= :lower AND "timestamp" < :upper)'
+    ), {"lower": lower, "upper": upper}).scalar()
+    if not stray:
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        ))
+        return
+    # Rows for this month already landed in the default partition: Postgres
+    # refuses to create an overlapping partition, so move them in first
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+        f'WHERE "timestamp" >= :lower AND "timestamp" < :upper RETURNING *) '
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), {"lower": lower, "upper": upper})
+    conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+
+
+def retain(conn: Connection, retention_months: int, detach: bool, dry_run: bool) -> List[str]:
+    """Drop (or detach) partitions past retention; also trims the default partition"""
+    partitions = {p["month"]: p["name"] for p in list_partitions(conn) if p["month"]}
+    expired = [partitions[m] for m in expired_months(list(partitions), retention_months, current_month())]
+    if dry_run or retention_months <= 0:
+        return expired
+    for name in expired:
+        if detach:
+            conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+    cutoff = _bound(add_months(current_month(), -retention_months))
+    conn.execute(text(f'DELETE FROM {DEFAULT_PARTITION} WHERE "timestamp" < :cutoff'), {"cutoff": cutoff})
+    return expired
+
+
+def compact(conn: Connection, months: int) -> List[str]:
+    """CLUSTER the newest closed partitions by (session_id, timestamp) and ANALYZE them"""
+    this_month = current_month()
+    closed = sorted(
+        (p for p in list_partitions(conn) if p["month"] and p["month"] < this_month),
+        key=lambda p: p["month"],
+    )
+    closed = closed[-months:] if months > 0 else []
+    for partition in closed:
+        # The partition's copy of the parent's session index
+        index = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_index x ON x.indexrelid = c.oid "
+            "WHERE i.inhparent = to_regclass(:parent) AND x.indrelid = to_regclass(:partition)"
+        ), {"parent": SESSION_INDEX, "partition": partition["name"]}).scalar()
+        if index:
+            conn.execute(text(f"CLUSTER {partition['name']} USING {index}"))
+        conn.execute(text(f"ANALYZE {partition['name']}"))
+    return [p["name"] for p in closed]
+
+
+def report(conn: Connection) -> None:
+    partitions = list_partitions(conn)
+    print(f"{'partition':<32} {'rows (est.)':>12} {'size':>12}")
+    for p in partitions:
+        print(f"{p['name']:<32} {max(p['rows'], 0):>12,} {_size(p['bytes']):>12}")
+    print(f"{'total':<32} {sum(max(p['rows'], 0) for p in partitions):>12,} "
+          f"{_size(sum(p['bytes'] for p in partitions)):>12}")
+
+
+def _size(num_bytes: float) -> str:
+    for unit in ("B", "kB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain monthly partitions of cognitive_metrics")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure_cmd = commands.add_parser("ensure", help="create partitions for the coming months")
+    ensure_cmd.add_argument("--months-ahead", type=int, default=settings.metrics_partition_months_ahead)
+    retain_cmd = commands.add_parser("retain", help="drop or detach partitions past retention")
+    retain_cmd.add_argument("--retention-months", type=int, default=settings.metrics_retention_months)
+    retain_cmd.add_argument("--detach", action="store_true", help="detach instead of dropping (keeps the tables)")
+    retain_cmd.add_argument("--dry-run", action="store_true")
+    compact_cmd = commands.add_parser("compact", help="CLUSTER + ANALYZE recently closed partitions")
+    compact_cmd.add_argument("--months", type=int, default=1)
+    commands.add_parser("report", help="rows and size per partition")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        sys.exit("Partitioning is only supported on PostgreSQL")
+
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            sys.exit(f"{TABLE} is not partitioned (run migration 0004 with METRICS_PARTITIONING=true)")
+
+        if args.command == "ensure":
+            created = ensure_partitions(conn, args.months_ahead)
+            print(f"Created {len(created)} partition(s)" + (": " + ", ".join(created) if created else ""))
+        elif args.command == "retain":
+            if args.retention_months <= 0:
+                print("Retention is disabled (METRICS_RETENTION_MONTHS=0); nothing to do")
+                return
+            expired = retain(conn, args.retention_months, args.detach, args.dry_run)
+            verb = "Would remove" if args.dry_run else ("Detached" if args.detach else "Dropped")
+            print(f"{verb} {len(expired)} partition(s)" + (": " + ", ".join(expired) if expired else ""))
+        elif args.command == "compact":
+            compacted = compact(conn, args.months)
+            print(f"Compacted {len(compacted)} partition(s)" + (": " + ", ".join(compacted) if compacted else ""))
+        else:
+            report(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,2 @@
-from . import cognitive, diary, health  # noqa: F401
+# cognitive_async/diary_async are imported by main only when ASYNC_DB is set
+from . import analytics, cognitive, cognitive_ws, diary, health, internal  # noqa: F401
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.schemas.cognitive import (
+    CohortCrisisResponse,
+    CohortPercentilesResponse,
+    CohortThresholdResponse,
+    SCORE_NAMES,
+)
+from app.services.cohort import (
+    bucket_count,
+    crisis_series,
+    crisis_statement,
+    histogram_statement,
+    percentile_series,
+    threshold_statement,
+)
+from app.services.rollups import as_utc
+
+router = APIRouter(prefix="/api/analytics", tags=["analytics"])
+
+# Upper bound on buckets per cohort query (about 3 months of hours)
+MAX_COHORT_BUCKETS = 2500
+
+Resolution = Literal["hour", "day"]
+
+def cohort_window(start: Optional[datetime], end: Optional[datetime], resolution: str) -> Tuple[datetime, datetime]:
+    """UTC [start, end) for cohort queries; defaults to the last 24 hours"""
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    if bucket_count(start, end, resolution) > MAX_COHORT_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range spans more than {MAX_COHORT_BUCKETS} {resolution} buckets, use a coarser resolution"
+        )
+    return start, end
+
+def parse_scores(scores: Optional[str]) -> List[str]:
+    if not scores:
+        return list(SCORE_NAMES)
+    requested = [name.strip() for name in scores.split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(SCORE_NAMES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown scores: {', '.join(unknown)}")
+    return [name for name in SCORE_NAMES if name in requested]
+
+def parse_quantiles(quantiles: str) -> List[float]:
+    try:
+        values = [float(q) for q in quantiles.split(",") if q.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="quantiles must be comma-separated numbers")
+    if not values or len(values) > 20 or any(not 0.0 <= q <= 1.0 for q in values):
+        raise HTTPException(status_code=400, detail="quantiles must be 1-20 values in [0, 1]")
+    return values
+
+@router.get("/cohort/percentiles", response_model=CohortPercentilesResponse)
+def cohort_percentiles(
+    db: Session = Depends(get_db),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: Resolution = "hour",
+    scores: Optional[str] = None,
+    quantiles: str = "0.5,0.9,0.99"
+):
+    """
+    Score quantiles across all sessions, per bucket and over [from, to)
+    Served from the cohort histograms, so values lag by up to the refresh
+    interval and are accurate to one bin width (0.01)
+    """
+    start, end = cohort_window(start, end, resolution)
+    names = parse_scores(scores)
+    rows = db.execute(histogram_statement(resolution, start, end, names)).mappings().all()
+    series, overall = percentile_series(rows, names, parse_quantiles(quantiles))
+
+    return CohortPercentilesResponse(resolution=resolution, start=start, end=end, series=series, overall=overall)
+
+@router.get("/cohort/thresholds", response_model=CohortThresholdResponse)
+def cohort_thresholds(
+    score: str = Query(..., description="Score to test, e.g. rage or heat"),
+    threshold: float = Query(..., ge=0.0, le=1.0),
+    db: Session = Depends(get_db),
+    stat: Literal["mean", "max"] = "mean",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: Resolution = "hour"
+):
+    """
+    Share of active sessions per bucket whose mean (or max) score reached
+    the threshold, read from the per-session rollups
+    """
+    if score not in SCORE_NAMES:
+        raise HTTPException(status_code=400, detail=f"Unknown score: {score}")
+    start, end = cohort_window(start, end, resolution)
+    rows = db.execute(threshold_statement(score, threshold, stat, resolution, start, end)).mappings().all()
+
+    return CohortThresholdResponse(
+        resolution=resolution,
+        score=score,
+        stat=stat,
+        threshold=threshold,
+        series=[
+            {
+                "timestamp": as_utc(row["timestamp"]),
+                "sessions": row["sessions"],
+                "above": row["above"],
+                "share": row["above"] / row["sessions"],
+            }
+            for row in rows
+        ]
+    )
+
+@router.get("/cohort/crisis", response_model=CohortCrisisResponse)
+def cohort_crisis(
+    db: Session = Depends(get_db),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: Resolution = "day"
+):
+    """Diary entries and the is_crisis rate per bucket, across all sessions"""
+    start, end = cohort_window(start, end, resolution)
+    rows = db.execute(crisis_statement(resolution, start, end)).mappings().all()
+
+    return CohortCrisisResponse(resolution=resolution, start=start, end=end, series=crisis_series(rows, resolution))
@@ -1,88 +1,244 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
-
-from app.database import get_db
-from app.models.cognitive import CognitiveMetric, Session as SessionModel
-from app.schemas.cognitive import KeystrokeData, AnalysisResponse, CognitiveMetricResponse
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
+
+from app.schemas.cognitive import (
+    KeystrokeData,
+    KeystrokeBatch,
+    AnalysisResponse,
+    BatchAnalysisResponse,
+    CognitiveMetricResponse,
+    TrendResponse,
+    SeriesResponse,
+    FEATURE_NAMES,
+    MAX_SERIES_POINTS,
+    SCORE_NAMES,
+)
+from app.services.admission import enforce_session_rate
 from app.services.cognitive_analyzer import CognitiveAnalyzer
+from app.services.export import EXPORTERS, EXPORT_MEDIA_TYPES
+from app.services.pagination import NEXT_CURSOR_HEADER, next_cursor
+from app.services.replicas import recent_writes
+from app.services.rollups import as_utc, downsample_series
+from app.services.rolling_stats import rolling_stats
+from app.services.serialization import FastJSONResponse, metrics_payload, parse_fields
+from app.services.storage import MetricStorage, get_read_storage, get_storage
+from app.services.write_behind import metric_writer
 
 router = APIRouter(prefix="/api/cognitive", tags=["cognitive"])
 analyzer = CognitiveAnalyzer()
 
+def metric_row(data: KeystrokeData, scores, timestamp: datetime) -> dict:
+    """Column values for one cognitive_metrics row (derived features only)"""
+    row = {name: getattr(data, name) for name in FEATURE_NAMES}
+    row.update({name: getattr(scores, name) for name in SCORE_NAMES})
+    row.update(session_id=data.session_id, timestamp=timestamp)
+    return row
+
+def batch_rows(batch: KeystrokeBatch, score_columns: dict, timestamp: datetime) -> List[dict]:
+    """cognitive_metrics rows for a whole batch, in batch order"""
+    columns = {"session_id": batch.session_id, **batch.feature_columns(), **score_columns}
+    return [
+        dict(zip(columns, values), timestamp=timestamp)
+        for values in zip(*columns.values())
+    ]
+
+def write_behind(row: dict) -> bool:
+    """Queue a row for the background writer and mark its session written; False when the queue is full"""
+    if not metric_writer.submit(row):
+        return False
+    recent_writes.mark([row["session_id"]])
+    return True
+
+def submit_write_behind(row: dict) -> None:
+    """Queue a row for the background writer, shedding load when it is full"""
+    if not write_behind(row):
+        raise HTTPException(
+            status_code=503,
+            detail="Metric write queue is full, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+def queued_for_write_behind(row: dict) -> bool:
+    """Write-behind mode: queue the row (503 when full); False when rows are stored inline"""
+    if not metric_writer.running:
+        return False
+    submit_write_behind(row)
+    return True
+
+def score_window(data: KeystrokeData):
+    """(scores, cognitive_metrics row) for one typing window"""
+    scores = analyzer.analyze(data)
+    return scores, metric_row(data, scores, datetime.now(timezone.utc))
+
+def score_batch(batch: KeystrokeBatch):
+    """(score columns, rows, timestamp) for a whole batch, in one vectorized pass"""
+    scores = analyzer.analyze_batch(batch.feature_columns())
+    score_columns = {name: scores[name].tolist() for name in SCORE_NAMES}
+    timestamp = datetime.now(timezone.utc)
+    return score_columns, batch_rows(batch, score_columns, timestamp), timestamp
+
+def metrics_page_response(rows: list, columns, limit: int, before: Optional[str], layout: str):
+    if not rows and not before:
+        raise HTTPException(status_code=404, detail="No metrics found for this session")
+    
+    # Rows are encoded as selected, skipping per-row response models
+    cursor = next_cursor(rows, limit)
+    headers = {NEXT_CURSOR_HEADER: cursor} if cursor else None
+    return FastJSONResponse(metrics_payload(rows, columns, layout), headers=headers)
+
+def series_response(session_id: str, start: datetime, end: datetime, resolution, rows, points: int):
+    return SeriesResponse(
+        session_id=session_id,
+        resolution=resolution or "raw",
+        start=start,
+        end=end,
+        series=downsample_series(rows, points)
+    )
+
+def export_headers(session_id: str, export_format: str) -> dict:
+    filename = re.sub(r"[^A-Za-z0-9_.-]", "_", session_id)
+    return {"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+
+def series_window(start: Optional[datetime], end: Optional[datetime]):
+    """UTC [start, end) for the series endpoint; defaults to the last 24 hours"""
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be before 'to'")
+    return start, end
+
 @router.post("/analyze", response_model=AnalysisResponse)
-def analyze_typing(data: KeystrokeData, db: Session = Depends(get_db)):
+def analyze_typing(data: KeystrokeData, store: MetricStorage = Depends(get_storage), baseline: bool = False):
     """
     Analyze typing behavior and compute cognitive metrics
     Privacy-first: accepts only derived features, never raw keystrokes
+    ?baseline=true adds z-scores against the session's own history
     """
-    # Ensure session exists
-    session = db.query(SessionModel).filter(
-        SessionModel.session_id == data.session_id
-    ).first()
-    
-    if not session:
-        session = SessionModel(session_id=data.session_id)
-        db.add(session)
-        db.commit()
+    enforce_session_rate([data.session_id])
     
     # Calculate cognitive scores using deterministic formulas
-    scores = analyzer.analyze(data)
+    scores, row = score_window(data)
     
-    # Store derived metrics (privacy-preserving)
-    metric = CognitiveMetric(
-        session_id=data.session_id,
-        avg_dwell_time=data.avg_dwell_time,
-        avg_flight_time=data.avg_flight_time,
-        pause_count=data.pause_count,
-        avg_pause_duration=data.avg_pause_duration,
-        error_rate=data.error_rate,
-        correction_rate=data.correction_rate,
-        text_length=data.text_length,
-        sentiment_score=data.sentiment_score,
-        word_count=data.word_count,
-        cognitive_load=scores.cognitive_load,
-        mood_drift=scores.mood_drift,
-        decision_stability=scores.decision_stability,
-        risk_volatility=scores.risk_volatility,
-        heat=scores.heat,
-        rage=scores.rage
-    )
+    # Rolling stats: loaded once per session, then updated in O(1) per row
+    store.warm_stats([data.session_id])
+    baseline_scores = analyzer.baseline_scores(data.session_id, scores) if baseline else None
     
-    db.add(metric)
-    db.commit()
-    db.refresh(metric)
+    # Store derived metrics (privacy-preserving), or queue them in write-behind mode
+    if not queued_for_write_behind(row):
+        store.add_metrics([row])
+    rolling_stats.update(row)
     
     return AnalysisResponse(
         session_id=data.session_id,
         scores=scores,
-        timestamp=metric.timestamp
+        timestamp=row["timestamp"],
+        baseline=baseline_scores
+    )
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+def analyze_typing_batch(batch: KeystrokeBatch, store: MetricStorage = Depends(get_storage)):
+    """
+    Analyze a batch of typing windows (struct-of-arrays) in one vectorized pass
+    Persists every row with a single bulk insert and one commit
+    """
+    enforce_session_rate(batch.session_id)
+    score_columns, rows, timestamp = score_batch(batch)
+    
+    store.warm_stats(batch.session_id)
+    store.add_metrics(rows)
+    rolling_stats.update_many(rows)
+    
+    return BatchAnalysisResponse(
+        count=len(rows),
+        scores=score_columns,
+        timestamp=timestamp
     )
 
 @router.get("/metrics/{session_id}", response_model=List[CognitiveMetricResponse])
-def get_session_metrics(session_id: str, db: Session = Depends(get_db), limit: int = 50):
+def get_session_metrics(
+    session_id: str,
+    store: MetricStorage = Depends(get_read_storage),
+    limit: int = 50,
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+    layout: Literal["rows", "columnar"] = Query("rows", alias="format")
+):
     """
     Retrieve historical cognitive metrics for a session
-    Returns up to 'limit' most recent metrics
+    Returns up to 'limit' most recent metrics; pass the X-Next-Cursor header
+    of a page as ?before= to get the next (older) page. ?fields=a,b selects
+    columns (id and timestamp are always included) and ?format=columnar
+    returns {"field": [values...]} arrays instead of row objects.
+    """
+    try:
+        columns = parse_fields(fields)
+        rows = store.metrics_page(session_id, columns, limit, before)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    return metrics_page_response(rows, columns, limit, before, layout)
+
+@router.get("/export/{session_id}")
+def export_session_metrics(
+    session_id: str,
+    store: MetricStorage = Depends(get_read_storage),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format")
+):
+    """
+    Stream a session's complete metric history, oldest first
+    Supports ?format=ndjson (default) or ?format=csv
     """
-    metrics = db.query(CognitiveMetric).filter(
-        CognitiveMetric.session_id == session_id
-    ).order_by(CognitiveMetric.timestamp.desc()).limit(limit).all()
+    if not store.has_metrics(session_id):
+        raise HTTPException(status_code=404, detail="No metrics found for this session")
+    
+    return StreamingResponse(
+        EXPORTERS[export_format](store.export_partitions(session_id)),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=export_headers(session_id, export_format)
+    )
+
+@router.get("/trend/{session_id}", response_model=TrendResponse)
+def get_session_trend(session_id: str, store: MetricStorage = Depends(get_storage)):
+    """
+    Rolling statistics (Welford mean/std, EWMA, window mean) per feature and score
+    Maintained incrementally on every analyze call, no history scan
+    """
+    store.warm_stats([session_id])
+    summary = rolling_stats.summary(session_id)
     
-    if not metrics:
+    if summary is None:
         raise HTTPException(status_code=404, detail="No metrics found for this session")
     
-    return metrics
+    return TrendResponse(session_id=session_id, **summary)
+
+@router.get("/series/{session_id}", response_model=SeriesResponse)
+def get_session_series(
+    session_id: str,
+    store: MetricStorage = Depends(get_read_storage),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    points: int = Query(500, ge=3, le=MAX_SERIES_POINTS)
+):
+    """
+    Chart series per score over [from, to) (default: the last 24 hours)
+    Reads the coarsest rollup with at least 'points' buckets in the range
+    (raw rows for short ranges) and LTTB-downsamples it to 'points'
+    """
+    start, end = series_window(start, end)
+    resolution, rows = store.series_rows(session_id, start, end, points)
+    
+    return series_response(session_id, start, end, resolution, rows, points)
 
 @router.get("/latest/{session_id}", response_model=CognitiveMetricResponse)
-def get_latest_metric(session_id: str, db: Session = Depends(get_db)):
+def get_latest_metric(session_id: str, store: MetricStorage = Depends(get_read_storage)):
     """
     Get the most recent cognitive metric for a session
     """
-    metric = db.query(CognitiveMetric).filter(
-        CognitiveMetric.session_id == session_id
-    ).order_by(CognitiveMetric.timestamp.desc()).first()
+    metric = store.latest(session_id)
     
     if not metric:
         raise HTTPException(status_code=404, detail="No metrics found for this session")
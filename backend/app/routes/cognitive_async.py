@@ -0,0 +1,170 @@
+"""
+Async versions of the cognitive routes, used when ASYNC_DB is on
+Same paths and steps as app.routes.cognitive, awaiting AsyncSqlStorage;
+the scoring, write-behind and response helpers are shared with it.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from datetime import datetime
+
+from app.routes.cognitive import (
+    analyzer,
+    export_headers,
+    health_check,
+    metrics_page_response,
+    queued_for_write_behind,
+    score_batch,
+    score_window,
+    series_response,
+    series_window,
+)
+from app.schemas.cognitive import (
+    KeystrokeData,
+    KeystrokeBatch,
+    AnalysisResponse,
+    BatchAnalysisResponse,
+    CognitiveMetricResponse,
+    TrendResponse,
+    SeriesResponse,
+    MAX_SERIES_POINTS,
+)
+from app.services.admission import enforce_session_rate
+from app.services.cache import off_loop
+from app.services.export import ASYNC_EXPORTERS, EXPORT_MEDIA_TYPES
+from app.services.rolling_stats import rolling_stats
+from app.services.serialization import parse_fields
+from app.services.storage import AsyncSqlStorage, get_async_read_storage, get_async_storage
+
+router = APIRouter(prefix="/api/cognitive", tags=["cognitive"])
+
+@router.post("/analyze", response_model=AnalysisResponse)
+async def analyze_typing(
+    data: KeystrokeData,
+    store: AsyncSqlStorage = Depends(get_async_storage),
+    baseline: bool = False
+):
+    """
+    Analyze typing behavior and compute cognitive metrics
+    Privacy-first: accepts only derived features, never raw keystrokes
+    ?baseline=true adds z-scores against the session's own history
+    """
+    enforce_session_rate([data.session_id])
+    scores, row = score_window(data)
+    
+    await store.warm_stats([data.session_id])
+    baseline_scores = await off_loop(analyzer.baseline_scores, data.session_id, scores) if baseline else None
+    
+    # submit() waits up to enqueue_timeout on a full queue; not on the event loop
+    if not await run_in_threadpool(queued_for_write_behind, row):
+        await store.add_metrics([row])
+    await off_loop(rolling_stats.update, row)
+    
+    return AnalysisResponse(
+        session_id=data.session_id,
+        scores=scores,
+        timestamp=row["timestamp"],
+        baseline=baseline_scores
+    )
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_typing_batch(batch: KeystrokeBatch, store: AsyncSqlStorage = Depends(get_async_storage)):
+    """
+    Analyze a batch of typing windows (struct-of-arrays) in one vectorized pass
+    Persists every row with a single bulk insert and one commit
+    """
+    enforce_session_rate(batch.session_id)
+    score_columns, rows, timestamp = score_batch(batch)
+    
+    await store.warm_stats(batch.session_id)
+    await store.add_metrics(rows)
+    await off_loop(rolling_stats.update_many, rows)
+    
+    return BatchAnalysisResponse(count=len(rows), scores=score_columns, timestamp=timestamp)
+
+@router.get("/metrics/{session_id}", response_model=List[CognitiveMetricResponse])
+async def get_session_metrics(
+    session_id: str,
+    store: AsyncSqlStorage = Depends(get_async_read_storage),
+    limit: int = 50,
+    before: Optional[str] = None,
+    fields: Optional[str] = None,
+    layout: Literal["rows", "columnar"] = Query("rows", alias="format")
+):
+    """
+    Retrieve historical cognitive metrics for a session
+    Returns up to 'limit' most recent metrics; pass the X-Next-Cursor header
+    of a page as ?before= to get the next (older) page. ?fields=a,b selects
+    columns (id and timestamp are always included) and ?format=columnar
+    returns {"field": [values...]} arrays instead of row objects.
+    """
+    try:
+        columns = parse_fields(fields)
+        rows = await store.metrics_page(session_id, columns, limit, before)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    return metrics_page_response(rows, columns, limit, before, layout)
+
+@router.get("/export/{session_id}")
+async def export_session_metrics(
+    session_id: str,
+    store: AsyncSqlStorage = Depends(get_async_read_storage),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format")
+):
+    """
+    Stream a session's complete metric history, oldest first
+    Supports ?format=ndjson (default) or ?format=csv
+    """
+    if not await store.has_metrics(session_id):
+        raise HTTPException(status_code=404, detail="No metrics found for this session")
+    
+    return StreamingResponse(
+        ASYNC_EXPORTERS[export_format](store.export_partitions(session_id)),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=export_headers(session_id, export_format)
+    )
+
+@router.get("/trend/{session_id}", response_model=TrendResponse)
+async def get_session_trend(session_id: str, store: AsyncSqlStorage = Depends(get_async_storage)):
+    """
+    Rolling statistics (Welford mean/std, EWMA, window mean) per feature and score
+    """
+    await store.warm_stats([session_id])
+    summary = await off_loop(rolling_stats.summary, session_id)
+    
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No metrics found for this session")
+    
+    return TrendResponse(session_id=session_id, **summary)
+
+@router.get("/series/{session_id}", response_model=SeriesResponse)
+async def get_session_series(
+    session_id: str,
+    store: AsyncSqlStorage = Depends(get_async_read_storage),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    points: int = Query(500, ge=3, le=MAX_SERIES_POINTS)
+):
+    """
+    Chart series per score over [from, to) (default: the last 24 hours)
+    """
+    start, end = series_window(start, end)
+    resolution, rows = await store.series_rows(session_id, start, end, points)
+    
+    return series_response(session_id, start, end, resolution, rows, points)
+
+@router.get("/latest/{session_id}", response_model=CognitiveMetricResponse)
+async def get_latest_metric(session_id: str, store: AsyncSqlStorage = Depends(get_async_read_storage)):
+    """
+    Get the most recent cognitive metric for a session
+    """
+    metric = await store.latest(session_id)
+    
+    if not metric:
+        raise HTTPException(status_code=404, detail="No metrics found for this session")
+    
+    return metric
+
+router.add_api_route("/health", health_check, methods=["GET"])
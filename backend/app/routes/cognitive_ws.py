@@ -0,0 +1,166 @@
+"""
+WebSocket ingestion for cognitive analysis
+One long-lived connection per typist replaces the periodic POST /analyze:
+each KeystrokeData frame is scored and answered on the same socket, and the
+connection persists its rows in groups (or hands them to the write-behind
+writer when that is running). Rows of a failed flush stay buffered for the
+next one; past WS_MAX_BUFFERED_ROWS, frames are answered with an error
+instead of being scored, so a client is never sent scores for rows that
+were dropped (except by a failed final flush at close, which is logged).
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+
+from app.config import settings
+from app.routes.cognitive import analyzer, metric_row, write_behind
+from app.schemas.cognitive import AnalysisResponse, KeystrokeData
+from app.services.admission import session_wait
+from app.services.cache import off_loop
+from app.services.rolling_stats import rolling_stats
+from app.services.storage import open_async_storage, open_storage
+from app.services.write_behind import metric_writer
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["cognitive"])
+
+def persist_rows(rows: List[dict]) -> None:
+    """Store a connection's buffered rows (on sql: one statement and one commit)"""
+    with open_storage() as store:
+        store.add_metrics(rows)
+
+async def persist_rows_async(rows: List[dict]) -> None:
+    async with open_async_storage() as store:
+        await store.add_metrics(rows)
+
+def warm_session(session_id: str) -> None:
+    with open_storage() as store:
+        store.warm_stats([session_id])
+
+async def warm_session_async(session_id: str) -> None:
+    async with open_async_storage() as store:
+        await store.warm_stats([session_id])
+
+class ConnectionBuffer:
+    """Rows scored on one connection, flushed by size, by age and on close"""
+
+    def __init__(self, flush_size: int, flush_interval: float, max_rows: int = 500):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self._rows: List[dict] = []
+        self._last_flush = time.monotonic()
+
+    async def add(self, row: dict) -> bool:
+        """Buffer a row; False means it was shed (write-behind queue or buffer full)"""
+        if metric_writer.running:
+            # submit() can wait on a full queue; keep it off the event loop
+            return await run_in_threadpool(write_behind, row)
+        if len(self._rows) >= self.max_rows:
+            return False
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_size:
+            await self.flush()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
+
+    async def flush(self, final: bool = False) -> bool:
+        """Persist the buffered rows; on failure they are kept for the next flush"""
+        # Swap the buffer before awaiting so a concurrent flush never re-inserts rows
+        rows, self._rows = self._rows, []
+        self._last_flush = time.monotonic()
+        if not rows:
+            return True
+        try:
+            if settings.async_db:
+                await persist_rows_async(rows)
+            else:
+                await run_in_threadpool(persist_rows, rows)
+        except Exception:
+            if final:
+                logger.exception("WebSocket flush of %s rows failed at close; rows lost", len(rows))
+                return False
+            logger.exception("WebSocket flush of %s rows failed; keeping them for the next flush", len(rows))
+            # Ahead of rows buffered meanwhile, so they are inserted in order
+            self._rows = rows + self._rows
+            return False
+        return True
+
+    async def flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(max(0.0, self._last_flush + self.flush_interval - time.monotonic()))
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                await self.flush()
+
+def parse_frame(text: str, session_id: str) -> KeystrokeData:
+    """Validate one frame; the path's session_id always wins over the frame's"""
+    frame = json.loads(text)
+    if not isinstance(frame, dict):
+        raise ValueError("Frame must be a JSON object")
+    return KeystrokeData.model_validate({**frame, "session_id": session_id})
+
+@router.websocket("/ws/cognitive/{session_id}")
+async def cognitive_stream(websocket: WebSocket, session_id: str):
+    """
+    Stream KeystrokeData frames in, get an AnalysisResponse back per frame
+    Invalid frames get an {"error": ...} reply and the connection stays open,
+    as do frames over the session's rate limit ({"error": ..., "retry_after": s})
+    ?baseline=true adds z-scores against the session's own history
+    """
+    await websocket.accept()
+    baseline = websocket.query_params.get("baseline", "").lower() in ("1", "true", "yes")
+    if settings.async_db:
+        await warm_session_async(session_id)
+    else:
+        await run_in_threadpool(warm_session, session_id)
+    buffer = ConnectionBuffer(settings.ws_flush_size, settings.ws_flush_interval, settings.ws_max_buffered_rows)
+    flusher = asyncio.create_task(buffer.flush_periodically())
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                data = parse_frame(text, session_id)
+            except ValidationError as exc:
+                await websocket.send_json({
+                    "error": "Invalid frame",
+                    "detail": jsonable_encoder(exc.errors(include_url=False))
+                })
+                continue
+            except ValueError as exc:
+                await websocket.send_json({"error": "Invalid frame", "detail": str(exc)})
+                continue
+            # Only valid frames spend the session's rate budget
+            wait = session_wait([session_id])
+            if wait:
+                await websocket.send_json({"error": "Rate limit exceeded", "retry_after": round(wait, 3)})
+                continue
+
+            scores = analyzer.analyze(data)
+            row = metric_row(data, scores, datetime.now(timezone.utc))
+            baseline_scores = await off_loop(analyzer.baseline_scores, session_id, scores) if baseline else None
+            if not await buffer.add(row):
+                await websocket.send_json({"error": "Metric writes are failing or backed up, retry shortly"})
+                continue
+            await off_loop(rolling_stats.update, row)
+
+            response = AnalysisResponse(
+                session_id=session_id, scores=scores, timestamp=row["timestamp"], baseline=baseline_scores
+            )
+            await websocket.send_json(response.model_dump(mode="json"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        flusher.cancel()
+        await buffer.flush(final=True)
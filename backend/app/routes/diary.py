@@ -1,67 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import List, Optional
 
-from app.database import get_db
-from app.models.cognitive import DiaryEntry, CognitiveMetric
 from app.schemas.cognitive import DiaryEntryCreate, DiaryEntryResponse
+from app.services.pagination import NEXT_CURSOR_HEADER, next_cursor
+from app.services.storage import MetricStorage, diary_entry_values, get_read_storage, get_storage
 
 router = APIRouter(prefix="/api/diary", tags=["diary"])
 
+NO_METRICS_DETAIL = "No cognitive metrics found for this session. Please analyze typing first."
+
 @router.post("/entry", response_model=DiaryEntryResponse)
-def create_diary_entry(entry_data: DiaryEntryCreate, db: Session = Depends(get_db)):
+def create_diary_entry(entry_data: DiaryEntryCreate, store: MetricStorage = Depends(get_storage)):
     """
     Create a new behavior diary entry with cognitive snapshot
     """
     # Get latest cognitive metrics for this session
-    latest_metric = db.query(CognitiveMetric).filter(
-        CognitiveMetric.session_id == entry_data.session_id
-    ).order_by(CognitiveMetric.timestamp.desc()).first()
+    latest_metric = store.latest(entry_data.session_id)
     
     if not latest_metric:
-        raise HTTPException(
-            status_code=404, 
-            detail="No cognitive metrics found for this session. Please analyze typing first."
-        )
+        raise HTTPException(status_code=404, detail=NO_METRICS_DETAIL)
     
     # Create diary entry with cognitive snapshot
-    diary_entry = DiaryEntry(
-        session_id=entry_data.session_id,
-        mood_rating=entry_data.mood_rating,
-        mood_notes=entry_data.mood_notes,
-        is_crisis=entry_data.is_crisis,
-        cognitive_load=latest_metric.cognitive_load,
-        mood_drift=latest_metric.mood_drift,
-        decision_stability=latest_metric.decision_stability,
-        risk_volatility=latest_metric.risk_volatility,
-        heat=latest_metric.heat,
-        rage=latest_metric.rage
-    )
-    
-    db.add(diary_entry)
-    db.commit()
-    db.refresh(diary_entry)
-    
-    return diary_entry
+    return store.add_diary_entry(diary_entry_values(entry_data, latest_metric))
 
 @router.get("/entries/{session_id}", response_model=List[DiaryEntryResponse])
-def get_diary_entries(session_id: str, db: Session = Depends(get_db), limit: int = 50):
+def get_diary_entries(
+    session_id: str,
+    response: Response,
+    store: MetricStorage = Depends(get_read_storage),
+    limit: int = 50,
+    before: Optional[str] = None
+):
     """
-    Retrieve diary entries for a session
+    Retrieve diary entries for a session, newest first
+    Pass the X-Next-Cursor header of a page as ?before= for the next page
     """
-    entries = db.query(DiaryEntry).filter(
-        DiaryEntry.session_id == session_id
-    ).order_by(DiaryEntry.timestamp.desc()).limit(limit).all()
+    try:
+        entries = store.diary_page(session_id, limit, before)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     
+    cursor = next_cursor(entries, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return entries
 
 @router.get("/entry/{entry_id}", response_model=DiaryEntryResponse)
-def get_diary_entry(entry_id: int, db: Session = Depends(get_db)):
+def get_diary_entry(entry_id: int, store: MetricStorage = Depends(get_read_storage)):
     """
     Get a specific diary entry
+    A replica miss is retried on the primary (the entry may not have replicated yet)
     """
-    entry = db.query(DiaryEntry).filter(DiaryEntry.id == entry_id).first()
+    entry = store.get_diary_entry(entry_id)
     
     if not entry:
         raise HTTPException(status_code=404, detail="Diary entry not found")
@@ -69,16 +59,11 @@ def get_diary_entry(entry_id: int, db: Session = Depends(get_db)):
     return entry
 
 @router.delete("/entry/{entry_id}")
-def delete_diary_entry(entry_id: int, db: Session = Depends(get_db)):
+def delete_diary_entry(entry_id: int, store: MetricStorage = Depends(get_storage)):
     """
     Delete a diary entry
     """
-    entry = db.query(DiaryEntry).filter(DiaryEntry.id == entry_id).first()
-    
-    if not entry:
+    if not store.delete_diary_entry(entry_id):
         raise HTTPException(status_code=404, detail="Diary entry not found")
     
-    db.delete(entry)
-    db.commit()
-    
     return {"message": "Diary entry deleted successfully"}
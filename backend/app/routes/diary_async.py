@@ -0,0 +1,67 @@
+"""Async versions of the diary routes (AsyncSqlStorage), used when ASYNC_DB is on"""
+from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import List, Optional
+
+from app.routes.diary import NO_METRICS_DETAIL
+from app.schemas.cognitive import DiaryEntryCreate, DiaryEntryResponse
+from app.services.pagination import NEXT_CURSOR_HEADER, next_cursor
+from app.services.storage import AsyncSqlStorage, diary_entry_values, get_async_read_storage, get_async_storage
+
+router = APIRouter(prefix="/api/diary", tags=["diary"])
+
+@router.post("/entry", response_model=DiaryEntryResponse)
+async def create_diary_entry(entry_data: DiaryEntryCreate, store: AsyncSqlStorage = Depends(get_async_storage)):
+    """
+    Create a new behavior diary entry with cognitive snapshot
+    """
+    latest_metric = await store.latest(entry_data.session_id)
+    
+    if not latest_metric:
+        raise HTTPException(status_code=404, detail=NO_METRICS_DETAIL)
+    
+    return await store.add_diary_entry(diary_entry_values(entry_data, latest_metric))
+
+@router.get("/entries/{session_id}", response_model=List[DiaryEntryResponse])
+async def get_diary_entries(
+    session_id: str,
+    response: Response,
+    store: AsyncSqlStorage = Depends(get_async_read_storage),
+    limit: int = 50,
+    before: Optional[str] = None
+):
+    """
+    Retrieve diary entries for a session, newest first
+    Pass the X-Next-Cursor header of a page as ?before= for the next page
+    """
+    try:
+        entries = await store.diary_page(session_id, limit, before)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    cursor = next_cursor(entries, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return entries
+
+@router.get("/entry/{entry_id}", response_model=DiaryEntryResponse)
+async def get_diary_entry(entry_id: int, store: AsyncSqlStorage = Depends(get_async_read_storage)):
+    """
+    Get a specific diary entry
+    A replica miss is retried on the primary (the entry may not have replicated yet)
+    """
+    entry = await store.get_diary_entry(entry_id)
+    
+    if not entry:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    
+    return entry
+
+@router.delete("/entry/{entry_id}")
+async def delete_diary_entry(entry_id: int, store: AsyncSqlStorage = Depends(get_async_storage)):
+    """
+    Delete a diary entry
+    """
+    if not await store.delete_diary_entry(entry_id):
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    
+    return {"message": "Diary entry deleted successfully"}
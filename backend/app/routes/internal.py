@@ -0,0 +1,123 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from app.config import settings
+from app.services.admission import admission_stats
+from app.services.cache import shared_cache
+from app.services.cohort import cohort_refresher
+from app.services.pool_monitor import async_pool_monitor, sync_pool_monitor
+from app.services.profiling import profile_store
+from app.services.replicas import replica_set
+from app.services.rolling_stats import rolling_stats
+from app.services.sessions import session_registry
+from app.services.snapshot_cache import snapshot_cache
+from app.services.startup import startup_timer
+from app.services.storage import memory_backend, uses_memory
+from app.services.telemetry import CONTENT_TYPE, StatsGauges, register_stats, registry
+from app.services.write_behind import metric_writer
+
+INTERNAL_TOKEN_HEADER = "X-Internal-Token"
+
+def require_internal_token(token: Optional[str] = Header(None, alias=INTERNAL_TOKEN_HEADER)):
+    """403 unless INTERNAL_TOKEN is unset or sent in X-Internal-Token"""
+    if settings.internal_token and not secrets.compare_digest(token or "", settings.internal_token):
+        raise HTTPException(status_code=403, detail="Internal endpoints need a valid X-Internal-Token")
+
+# Mounted only with INTERNAL_ENDPOINTS_ENABLED (app.main)
+router = APIRouter(prefix="/internal", tags=["internal"], dependencies=[Depends(require_internal_token)])
+# Prometheus scrapes /metrics at the root
+metrics_router = APIRouter(tags=["internal"], dependencies=[Depends(require_internal_token)])
+
+@router.get("/admission")
+def admission_control_stats():
+    """Per-session rate limit and in-flight request cap: admitted and shed counters"""
+    return admission_stats()
+
+@router.get("/write-behind")
+def write_behind_stats():
+    """Queue depth, backpressure and flush counters for the metric writer"""
+    return metric_writer.stats()
+
+@router.get("/cache")
+def shared_cache_stats():
+    """Shared cache backend (CACHE_URL) counters; empty when per-process caches are used"""
+    return shared_cache.stats() if shared_cache is not None else {}
+
+@router.get("/sessions")
+def session_cache_stats():
+    """Hit/miss counters for the known-session cache"""
+    return session_registry.stats()
+
+@router.get("/snapshots")
+def snapshot_cache_stats():
+    """Size and hit/miss counters for the latest-snapshot cache"""
+    return snapshot_cache.stats()
+
+@router.get("/rolling-stats")
+def rolling_stats_overview():
+    """Session count and update/eviction counters for the rolling stats store"""
+    return rolling_stats.stats()
+
+@router.get("/pool")
+def pool_stats():
+    """Checkout waits, occupancy, overflow and invalidations for the DB pools"""
+    stats = {"sync": sync_pool_monitor.stats()}
+    if settings.async_db:
+        stats["async"] = async_pool_monitor.stats()
+    return stats
+
+@router.get("/replicas")
+def replica_stats():
+    """Configured/healthy read replicas, reads per target and failovers"""
+    return replica_set.stats()
+
+@router.get("/cohort")
+def cohort_refresher_stats():
+    """Refresh passes, rows folded in and failures for the cohort aggregates"""
+    return cohort_refresher.stats()
+
+@router.get("/storage")
+def storage_stats():
+    """Sessions, rows, bytes and evictions of the memory backend; empty on sql"""
+    return memory_backend().stats() if uses_memory() else {}
+
+@router.get("/startup")
+def startup_stats():
+    """Milliseconds from the start of the app import to imported/ready/first_request"""
+    return startup_timer.stats()
+
+@router.get("/profiles")
+def slowest_profiles(limit: int = Query(20, ge=1, le=200)):
+    """Captured request profiles, slowest first (see PROFILE_SAMPLE_RATE)"""
+    return profile_store.slowest(limit)
+
+@router.get("/profiles/{profile_id}.{extension}")
+def download_profile(profile_id: str, extension: str):
+    """A capture as pstats (.prof) or collapsed stacks (.collapsed)"""
+    path = profile_store.path(profile_id, extension)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=f"{profile_id}.{extension}")
+
+# The /internal stats, exported as gauges on every scrape
+register_stats([
+    StatsGauges("cognitwin_admission", "Admission control", admission_stats, label="limiter"),
+    StatsGauges("cognitwin_write_behind", "Metric write-behind buffer", metric_writer.stats),
+    StatsGauges("cognitwin_shared_cache", "Shared cache backend", shared_cache_stats),
+    StatsGauges("cognitwin_session_cache", "Known-session cache", session_registry.stats),
+    StatsGauges("cognitwin_snapshot_cache", "Latest-snapshot cache", snapshot_cache.stats),
+    StatsGauges("cognitwin_rolling_stats", "Per-session rolling stats store", rolling_stats.stats),
+    StatsGauges("cognitwin_db_pool", "Database connection pool", pool_stats, label="engine"),
+    StatsGauges("cognitwin_replicas", "Read replica routing", replica_set.stats),
+    StatsGauges("cognitwin_cohort_refresher", "Cohort aggregate refresher", cohort_refresher.stats),
+    StatsGauges("cognitwin_memory_storage", "In-memory storage backend", storage_stats),
+    StatsGauges("cognitwin_startup", "Worker startup phase offsets", startup_timer.stats),
+])
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Request, SQL and analyzer metrics plus the /internal stats, in Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,7 +1,37 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+import math
+
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional
 from datetime import datetime
 
+# Numeric input features accepted by the analyzer, in KeystrokeData order
+FEATURE_NAMES = (
+    "avg_dwell_time",
+    "avg_flight_time",
+    "pause_count",
+    "avg_pause_duration",
+    "error_rate",
+    "correction_rate",
+    "text_length",
+    "sentiment_score",
+    "word_count",
+)
+
+# Output scores, in CognitiveScores order
+SCORE_NAMES = (
+    "cognitive_load",
+    "mood_drift",
+    "decision_stability",
+    "risk_volatility",
+    "heat",
+    "rage",
+)
+
+MAX_BATCH_SIZE = 1000
+
+# Upper bound for ?points= on the series endpoint
+MAX_SERIES_POINTS = 5000
+
 class KeystrokeData(BaseModel):
     """Input data - derived features only, never raw keystrokes"""
     session_id: str
@@ -24,6 +54,66 @@ class CognitiveScores(BaseModel):
     heat: float = Field(..., ge=0, le=1)
     rage: float = Field(..., ge=0, le=1)
 
+class BaselineScores(BaseModel):
+    """Scores as z-scores against the session's own history (None until enough history)"""
+    cognitive_load: Optional[float] = None
+    mood_drift: Optional[float] = None
+    decision_stability: Optional[float] = None
+    risk_volatility: Optional[float] = None
+    heat: Optional[float] = None
+    rage: Optional[float] = None
+
+class KeystrokeBatch(BaseModel):
+    """Batch input as a struct-of-arrays - one list per KeystrokeData field"""
+    session_id: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    avg_dwell_time: List[float]
+    avg_flight_time: List[float]
+    pause_count: List[int]
+    avg_pause_duration: Optional[List[float]] = None
+    error_rate: List[float]
+    correction_rate: Optional[List[float]] = None
+    text_length: List[int]
+    sentiment_score: Optional[List[float]] = None
+    word_count: Optional[List[int]] = None
+
+    @model_validator(mode="after")
+    def check_columns(self):
+        """Fill optional columns with KeystrokeData defaults, then enforce its bounds"""
+        size = len(self.session_id)
+        for name in FEATURE_NAMES:
+            values = getattr(self, name)
+            if values is None:
+                setattr(self, name, [0] * size)
+                continue
+            if len(values) != size:
+                raise ValueError(f"{name} has {len(values)} values, expected {size}")
+            # Element by element: NaN compares False to everything, so min/max
+            # bounds would let it through
+            bad = next((i for i, value in enumerate(values) if not math.isfinite(value)), None)
+            if bad is not None:
+                raise ValueError(f"{name}[{bad}] must be a finite number")
+            field = KeystrokeData.model_fields[name]
+            for constraint in field.metadata:
+                ge = getattr(constraint, "ge", None)
+                le = getattr(constraint, "le", None)
+                if ge is not None and min(values) < ge:
+                    raise ValueError(f"{name} values must be >= {ge}")
+                if le is not None and max(values) > le:
+                    raise ValueError(f"{name} values must be <= {le}")
+        return self
+
+    def feature_columns(self) -> Dict[str, List[float]]:
+        return {name: getattr(self, name) for name in FEATURE_NAMES}
+
+class CognitiveScoresBatch(BaseModel):
+    """Output scores as a struct-of-arrays, index-aligned with the batch input"""
+    cognitive_load: List[float]
+    mood_drift: List[float]
+    decision_stability: List[float]
+    risk_volatility: List[float]
+    heat: List[float]
+    rage: List[float]
+
 class CognitiveMetricResponse(BaseModel):
     id: int
     session_id: str
@@ -47,11 +137,95 @@ class CognitiveMetricResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# Columns of a stored metric row, in CognitiveMetricResponse order
+METRIC_FIELDS = tuple(CognitiveMetricResponse.model_fields)
+
 class AnalysisResponse(BaseModel):
     """Response containing cognitive analysis"""
     session_id: str
     scores: CognitiveScores
     timestamp: datetime
+    baseline: Optional[BaselineScores] = None
+
+class StatSummary(BaseModel):
+    """Online statistics of one feature or score"""
+    count: int
+    mean: float
+    std: float
+    ewma: float
+    last: float
+    window_size: int
+    window_mean: float
+
+class TrendResponse(BaseModel):
+    """Per-session rolling statistics for every input feature and score"""
+    session_id: str
+    count: int
+    features: Dict[str, StatSummary]
+    scores: Dict[str, StatSummary]
+
+class BatchAnalysisResponse(BaseModel):
+    """Response containing cognitive analysis for a whole batch"""
+    count: int
+    scores: CognitiveScoresBatch
+    timestamp: datetime
+
+class SeriesPoint(BaseModel):
+    """One chart point: a raw row (count 1) or a rollup bucket"""
+    timestamp: datetime
+    count: int
+    min: float
+    mean: float
+    max: float
+
+class SeriesResponse(BaseModel):
+    """Downsampled per-score chart series for a time range"""
+    session_id: str
+    resolution: str = Field(..., description="raw, minute, hour or day")
+    start: datetime
+    end: datetime
+    series: Dict[str, List[SeriesPoint]]
+
+class CohortQuantilePoint(BaseModel):
+    """Score quantiles across all sessions for one bucket (or the whole range)"""
+    timestamp: Optional[datetime] = None
+    count: int
+    quantiles: Dict[str, Optional[float]]
+
+class CohortPercentilesResponse(BaseModel):
+    """Per-bucket and whole-range score quantiles across sessions"""
+    resolution: str = Field(..., description="hour or day")
+    start: datetime
+    end: datetime
+    series: Dict[str, List[CohortQuantilePoint]]
+    overall: Dict[str, CohortQuantilePoint]
+
+class CohortThresholdPoint(BaseModel):
+    """Sessions active in a bucket and how many reached the threshold"""
+    timestamp: datetime
+    sessions: int
+    above: int
+    share: float
+
+class CohortThresholdResponse(BaseModel):
+    resolution: str
+    score: str
+    stat: str = Field(..., description="mean or max of the session's values in the bucket")
+    threshold: float
+    series: List[CohortThresholdPoint]
+
+class CohortCrisisPoint(BaseModel):
+    timestamp: datetime
+    entries: int
+    crisis_entries: int
+    crisis_rate: float
+
+class CohortCrisisResponse(BaseModel):
+    """Diary entries and the share marked is_crisis, per bucket"""
+    resolution: str
+    start: datetime
+    end: datetime
+    series: List[CohortCrisisPoint]
 
 class DiaryEntryCreate(BaseModel):
     """Create a new diary entry"""
@@ -2,17 +2,24 @@
 
 Run from backend/:
   python -m app.seed
+
+For scale testing (millions of rows) use python -m app.synthetic instead.
 """
 
-from datetime import datetime
-from app.database import SessionLocal, Base, engine
+from datetime import datetime, timezone
+from app.config import settings
+from app.database import init_schema, new_session
 from app.models.cognitive import CognitiveMetric, DiaryEntry, Session as SessionModel
+from app.schemas.cognitive import KeystrokeData
+from app.services.cognitive_analyzer import CognitiveAnalyzer
+from app.services.rolling_stats import RollingStatsStore
+from app.services.rollups import apply_rollups
 
 
 def main() -> None:
-    Base.metadata.create_all(bind=engine)
+    init_schema(settings.db_startup_timeout)
 
-    db = SessionLocal()
+    db = new_session()
     try:
         session_id = "demo-session"
 
@@ -22,31 +29,29 @@ def main() -> None:
             db.add(session)
             db.commit()
 
-        metric = CognitiveMetric(
+        features = KeystrokeData(
             session_id=session_id,
             avg_dwell_time=110.0,
-            avg_flight_time=85.0,
+            avg_flight_time=185.0,
             pause_count=4,
-            avg_pause_duration=0.45,
+            avg_pause_duration=3200.0,
             error_rate=0.06,
-            backspace_rate=0.04,
-            typing_speed=52.0,
-            rhythm_variability=0.22,
-            cognitive_load=0.42,
-            mood_drift=-0.10,
-            decision_stability=0.78,
-            risk_volatility=0.25,
-            heat=0.15,
-            rage=0.05,
-            timestamp=datetime.utcnow(),
+            correction_rate=0.04,
+            text_length=260,
+            sentiment_score=0.2,
+            word_count=48,
         )
+        scores = CognitiveAnalyzer(stats_store=RollingStatsStore()).analyze(features)
+        row = {**features.model_dump(), **scores.model_dump(), "timestamp": datetime.now(timezone.utc)}
+        metric = CognitiveMetric(**row)
         db.add(metric)
+        apply_rollups(db, [row])
         db.commit()
         db.refresh(metric)
 
         entry = DiaryEntry(
             session_id=session_id,
-            mood_rating=7,
+            mood_rating=4,
             mood_notes="Seeded demo entry for hackathon / local testing.",
             is_crisis=False,
             cognitive_load=metric.cognitive_load,
@@ -55,7 +60,7 @@ def main() -> None:
             risk_volatility=metric.risk_volatility,
             heat=metric.heat,
             rage=metric.rage,
-            timestamp=datetime.utcnow(),
+            timestamp=datetime.now(timezone.utc),
         )
         db.add(entry)
         db.commit()
@@ -0,0 +1,186 @@
+"""
+Admission control for the database-backed API
+Two limits shed load before it reaches the connection pool:
+- a token bucket per session (RATE_LIMIT_PER_SESSION requests per second, bursts
+  of RATE_LIMIT_BURST), checked by the analyze routes and per WebSocket
+  frame; over the limit is 429 with Retry-After
+- a cap on in-flight /api requests per worker (MAX_CONCURRENT_REQUESTS);
+  past it, AdmissionMiddleware answers 503 with Retry-After right away
+  instead of letting the request wait DB_POOL_TIMEOUT for a connection
+
+Both are per worker process. Health checks (/health and
+/api/cognitive/health, via HEALTH_PATHS), /internal and /metrics are never
+shed, so liveness probes keep answering under load.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.config import settings
+
+
+class SessionRateLimiter:
+    """Token bucket per session ID; idle buckets beyond max_sessions are evicted LRU"""
+
+    def __init__(self, rate: float, burst: int, max_sessions: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_sessions = max_sessions
+        # session_id -> [tokens, monotonic time of the last refill]
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"admitted": 0, "rate_limited": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, session_ids: Iterable[str]) -> float:
+        """
+        Take one token from each session's bucket
+        Returns 0 when admitted, else the seconds until every bucket has a
+        token again (no tokens are taken from any of them in that case).
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._bucket(sid, now) for sid in set(session_ids)]
+            wait = max(((1 - bucket[0]) / self.rate for bucket in buckets if bucket[0] < 1), default=0.0)
+            if wait:
+                self._counters["rate_limited"] += 1
+                return wait
+            for bucket in buckets:
+                bucket[0] -= 1
+            self._counters["admitted"] += 1
+            return 0.0
+
+    def _bucket(self, session_id: str, now: float) -> list:
+        bucket = self._buckets.get(session_id)
+        if bucket is None:
+            bucket = self._buckets[session_id] = [float(self.burst), now]
+            if len(self._buckets) > self.max_sessions:
+                self._buckets.popitem(last=False)
+                self._counters["evictions"] += 1
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(session_id)
+        return bucket
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._buckets), **self._counters}
+
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on requests in flight; a full limiter sheds instead of queueing"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._counters = {"admitted": 0, "shed": 0, "peak_in_flight": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight >= self.limit:
+                self._counters["shed"] += 1
+                return False
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+            self._counters["peak_in_flight"] = max(self._counters["peak_in_flight"], self._in_flight)
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"limit": self.limit, "in_flight": self._in_flight, **self._counters}
+
+
+# /api paths the in-flight cap never sheds (liveness probes)
+HEALTH_PATHS = ("/api/cognitive/health",)
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class AdmissionMiddleware:
+    """ASGI middleware: 503 + Retry-After for /api requests past the concurrency limit"""
+
+    def __init__(
+        self,
+        app,
+        limiter: ConcurrencyLimiter,
+        prefix: str = "/api/",
+        retry_seconds: float = 1.0,
+        exempt: Sequence[str] = HEALTH_PATHS,
+    ):
+        self.app = app
+        self.limiter = limiter
+        self.prefix = prefix
+        self.retry_seconds = retry_seconds
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        # WebSockets hold one slot for hours, so only HTTP requests count
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.prefix)
+            or scope["path"] in self.exempt
+            or not self.limiter.enabled
+        ):
+            await self.app(scope, receive, send)
+            return
+        if not self.limiter.try_acquire():
+            response = JSONResponse(
+                {"detail": "Server is at capacity, retry shortly"},
+                status_code=503,
+                headers={"Retry-After": retry_after(self.retry_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            # Held until the body is sent: streamed exports keep their connection that long
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+
+def session_wait(session_ids: Iterable[str]) -> float:
+    """Take a token for the sessions: 0 when admitted, else seconds to wait"""
+    return session_limiter.acquire(session_ids)
+
+
+def enforce_session_rate(session_ids: Iterable[str]) -> None:
+    """429 with Retry-After when any of the sessions is over its rate"""
+    wait = session_wait(session_ids)
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests for this session, slow down",
+            headers={"Retry-After": retry_after(wait)}
+        )
+
+
+def admission_stats() -> Dict[str, Any]:
+    return {"rate_limit": session_limiter.stats(), "concurrency": concurrency_limiter.stats()}
+
+
+session_limiter = SessionRateLimiter(
+    settings.rate_limit_per_session, settings.rate_limit_burst, settings.rate_limit_max_sessions
+)
+concurrency_limiter = ConcurrencyLimiter(settings.max_concurrent_requests)
@@ -0,0 +1,372 @@
+"""
+Shared cache backends for per-session state
+With several uvicorn workers (or replicas) the in-process caches diverge:
+one worker keeps serving a snapshot another has replaced. Setting CACHE_URL
+moves the known-session set, latest snapshots and rolling stats into a
+backend every worker shares:
+  memory://               in-process (one worker; exercises the shared code path)
+  redis://[:pw@]host:6379/0   any Redis-protocol server (Redis, Valkey, KeyDB...)
+Values are bytes; stores encode them with the versioned orjson codec below,
+so every worker reads the same format. The Redis client is dependency-free:
+it speaks RESP2 over a small pool of sockets and pipelines multi-key
+operations into one round trip. Its sockets block, so async code calls the
+stores through off_loop, which moves the call to the threadpool whenever
+the shared cache is remote.
+"""
+import socket
+import ssl
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import unquote, urlsplit
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.schemas.cognitive import METRIC_FIELDS, SCORE_NAMES
+
+T = TypeVar("T")
+
+# Bumped whenever an encoded layout changes; blobs of another version read as misses
+CODEC_VERSION = 1
+
+
+class CacheError(Exception):
+    """The cache backend failed or is unreachable"""
+
+
+class CacheBackend(ABC):
+    """Bytes key/value store with TTLs and multi-key operations"""
+
+    name = "base"
+
+    @abstractmethod
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    def set_many(self, items: Mapping[str, bytes], ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set only if the key does not exist; True if it was set"""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> int:
+        ...
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    def close(self) -> None:
+        pass
+
+
+class LocalCache(CacheBackend):
+    """In-process backend: LRU of bytes values with per-key expiry"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        with self._lock:
+            return [self._lookup(key, now) for key in keys]
+
+    def set_many(self, items: Mapping[str, bytes], ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._store(key, value, expires_at)
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._lookup(key, now) is not None:
+                return False
+            self._store(key, value, now + ttl if ttl else None)
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._entries.pop(key, None) is not None for key in keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.name, "entries": len(self._entries), "max_entries": self.max_entries}
+
+    def _lookup(self, key: str, now: float) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: bytes, expires_at: Optional[float]) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class _RespError(Exception):
+    """An error reply (-ERR ...) from the server"""
+
+
+def _encode_command(args: Sequence[Any]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        elif isinstance(arg, str):
+            data = arg.encode()
+        else:
+            data = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+class _RespConnection:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+    def send(self, commands: Sequence[Sequence[Any]]) -> None:
+        self.sock.sendall(b"".join(_encode_command(command) for command in commands))
+
+    def read_reply(self) -> Any:
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise CacheError("Connection closed by the cache server")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return _RespError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise CacheError("Connection closed by the cache server")
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise CacheError(f"Unexpected reply from the cache server: {line[:40]!r}")
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespCache(CacheBackend):
+    """Redis-protocol (RESP2) client with a connection pool and pipelining"""
+
+    name = "resp"
+
+    def __init__(self, url: str, timeout: float = 0.5, pool_size: int = 8):
+        parsed = urlsplit(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip("/") or 0)
+        self.tls = parsed.scheme == "rediss"
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._idle: List[_RespConnection] = []
+        self._lock = threading.Lock()
+        self._counters = {"commands": 0, "round_trips": 0, "connects": 0, "errors": 0}
+
+    def execute(self, *commands: Sequence[Any]) -> List[Any]:
+        """Send every command in one write and read their replies in order"""
+        connection = self._acquire()
+        try:
+            connection.send(commands)
+            replies = [connection.read_reply() for _ in commands]
+        except (OSError, CacheError, ValueError) as exc:
+            connection.close()
+            self._count("errors")
+            raise CacheError(str(exc) or type(exc).__name__) from exc
+        self._release(connection)
+        with self._lock:
+            self._counters["commands"] += len(commands)
+            self._counters["round_trips"] += 1
+        for reply in replies:
+            if isinstance(reply, _RespError):
+                self._count("errors")
+                raise CacheError(str(reply))
+        return replies
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        return self.execute(("MGET", *keys))[0]
+
+    def set_many(self, items: Mapping[str, bytes], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        expiry = ("PX", max(1, int(ttl * 1000))) if ttl else ()
+        self.execute(*[("SET", key, value, *expiry) for key, value in items.items()])
+
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        expiry = ("PX", max(1, int(ttl * 1000))) if ttl else ()
+        return self.execute(("SET", key, value, "NX", *expiry))[0] is not None
+
+    def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        return self.execute(("DEL", *keys))[0]
+
+    def ping(self) -> bool:
+        return self.execute(("PING",))[0] == "PONG"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.name, "idle_connections": len(self._idle), **self._counters}
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _acquire(self) -> _RespConnection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, connection: _RespConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def _connect(self) -> _RespConnection:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.tls:
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.host)
+        except OSError as exc:
+            self._count("errors")
+            raise CacheError(f"Cannot connect to cache at {self.host}:{self.port}: {exc}") from exc
+        self._count("connects")
+        connection = _RespConnection(sock)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                connection.send(setup)
+                replies = [connection.read_reply() for _ in setup]
+            except (OSError, CacheError) as exc:
+                connection.close()
+                raise CacheError(str(exc)) from exc
+            for reply in replies:
+                if isinstance(reply, _RespError):
+                    connection.close()
+                    raise CacheError(str(reply))
+        return connection
+
+
+def create_cache(url: str, timeout: float = 0.5) -> Optional[CacheBackend]:
+    """Backend for a CACHE_URL; None (empty URL) keeps the per-process stores"""
+    if not url:
+        return None
+    scheme = urlsplit(url).scheme
+    if scheme == "memory":
+        return LocalCache()
+    if scheme in ("redis", "rediss"):
+        return RespCache(url, timeout=timeout)
+    raise ValueError(f"Unsupported CACHE_URL scheme: {scheme!r}")
+
+
+# Codec: {"v": CODEC_VERSION, "kind": ..., "data": ...} as orjson, datetimes as ISO 8601
+
+def dumps(kind: str, data: Any) -> bytes:
+    return orjson.dumps({"v": CODEC_VERSION, "kind": kind, "data": data}, option=orjson.OPT_UTC_Z)
+
+
+def loads(kind: str, blob: Optional[bytes]) -> Optional[Any]:
+    """Decoded payload, or None for a miss, another kind or another codec version"""
+    if blob is None:
+        return None
+    try:
+        envelope = orjson.loads(blob)
+    except orjson.JSONDecodeError:
+        return None
+    if not isinstance(envelope, dict) or envelope.get("v") != CODEC_VERSION or envelope.get("kind") != kind:
+        return None
+    return envelope["data"]
+
+
+_SNAPSHOT_FIELDS = tuple(name for name in METRIC_FIELDS if name not in SCORE_NAMES)
+
+
+def encode_snapshot(snapshot: Mapping[str, Any], cached_at: float) -> bytes:
+    """A latest-metric snapshot (scores in the scores layout) plus when it was cached"""
+    data = {name: snapshot[name] for name in _SNAPSHOT_FIELDS}
+    data["scores"] = [float(snapshot[name]) for name in SCORE_NAMES]
+    data["cached_at"] = cached_at
+    return dumps("snapshot", data)
+
+
+def decode_snapshot(blob: Optional[bytes]) -> Optional[Tuple[Dict[str, Any], float]]:
+    data = loads("snapshot", blob)
+    if data is None:
+        return None
+    snapshot = {name: data[name] for name in _SNAPSHOT_FIELDS}
+    snapshot.update(zip(SCORE_NAMES, data["scores"]))
+    snapshot["timestamp"] = datetime.fromisoformat(snapshot["timestamp"].replace("Z", "+00:00"))
+    return snapshot, data["cached_at"]
+
+
+def cache_keys(prefix: str, ids: Iterable[str]) -> List[str]:
+    return [f"cognitwin:{prefix}:{item}" for item in ids]
+
+
+shared_cache = create_cache(settings.cache_url, settings.cache_timeout)
+
+
+async def off_loop(func: Callable[..., T], *args: Any) -> T:
+    """
+    Call a cache-backed store method from async code: in the threadpool when
+    the shared cache does network I/O, inline (no thread hop) otherwise
+    """
+    if isinstance(shared_cache, RespCache):
+        return await run_in_threadpool(func, *args)
+    return func(*args)
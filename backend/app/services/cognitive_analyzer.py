@@ -3,14 +3,31 @@ Cognitive Analysis Service - Deterministic formulas (no ML)
 Privacy-first: processes derived features only, never raw keystrokes
 """
 import math
-from app.schemas.cognitive import KeystrokeData, CognitiveScores
-from app.services.features import FeatureDetector, OPTIMAL_DWELL_TIME
+from typing import TYPE_CHECKING, Dict, Mapping, Optional, Sequence
+
+from app.config import settings
+from app.schemas.cognitive import KeystrokeData, CognitiveScores, BaselineScores
+from app.services.features import FeatureDetector
+from app.services.rolling_stats import RollingStatsStore, rolling_stats
+from app.services.scoring_spec import ScoringSpecLoader
+from app.services.telemetry import analyzer_latency
+
+if TYPE_CHECKING:
+    import numpy as np
 
 class CognitiveAnalyzer:
     """Analyzes typing behavior to compute cognitive state metrics"""
     
-    def __init__(self):
-        self.feature_detector = FeatureDetector()
+    def __init__(
+        self,
+        spec_loader: Optional[ScoringSpecLoader] = None,
+        stats_store: Optional[RollingStatsStore] = None
+    ):
+        self.spec_loader = spec_loader or ScoringSpecLoader(
+            settings.scoring_spec_path, settings.scoring_spec_reload_interval
+        )
+        self.stats_store = stats_store or rolling_stats
+        self.feature_detector = FeatureDetector(self.spec_loader)
     
     @staticmethod
     def normalize(value: float, min_val: float, max_val: float) -> float:
@@ -25,124 +42,63 @@ class CognitiveAnalyzer:
         """Sigmoid function for smooth 0-1 mapping"""
         return 1 / (1 + math.exp(-x))
     
+    # One score each, from the scoring spec (the formulas and weights live there)
+    
     def calculate_cognitive_load(self, data: KeystrokeData) -> float:
         """
         Cognitive load: higher with faster typing, more errors, shorter pauses
         Indicates mental effort and task complexity
         """
-        # Faster typing under pressure (inverse relationship with flight time)
-        typing_speed_factor = self.normalize(data.avg_flight_time, 50, 300)
-        typing_speed_score = 1 - typing_speed_factor  # Invert: faster = higher load
-        
-        # Error rate indicates struggle
-        error_score = data.error_rate
-        
-        # Fewer/shorter pauses = sustained high load
-        if data.pause_count > 0:
-            pause_score = 1 - self.normalize(data.avg_pause_duration, 2000, 10000)
-        else:
-            pause_score = 0.8  # No pauses = high sustained load
-        
-        # Weighted combination
-        cognitive_load = (
-            0.4 * typing_speed_score +
-            0.4 * error_score +
-            0.2 * pause_score
-        )
-        
-        return max(0.0, min(1.0, cognitive_load))
+        return self.spec_loader.get().evaluate(dict(data))["cognitive_load"]
     
     def calculate_mood_drift(self, data: KeystrokeData) -> float:
         """
         Mood drift: tracks emotional state from sentiment and typing rhythm
         Negative sentiment and irregular timing = higher drift (stress/frustration)
         """
-        # Sentiment: map -1 to 1 range into 0 to 1 (negative sentiment = high drift)
-        sentiment_factor = (1 - data.sentiment_score) / 2  # -1->1, 0->0.5, 1->0
-        
-        # Dwell time variability proxy: longer dwell = hesitation/fatigue
-        dwell_factor = self.normalize(data.avg_dwell_time, 50, 200)
-        
-        # High error rate indicates frustration
-        frustration_factor = data.error_rate
-        
-        # Weighted combination
-        mood_drift = (
-            0.5 * sentiment_factor +
-            0.3 * frustration_factor +
-            0.2 * dwell_factor
-        )
-        
-        return max(0.0, min(1.0, mood_drift))
+        return self.spec_loader.get().evaluate(dict(data))["mood_drift"]
     
     def calculate_decision_stability(self, data: KeystrokeData) -> float:
         """
         Decision stability: measures consistency in typing behavior
         High corrections and pauses = low stability (indecision)
         """
-        # High correction rate = low stability
-        correction_instability = data.correction_rate
-        
-        # Many pauses = indecision
-        pause_factor = self.normalize(data.pause_count, 0, 10)
-        
-        # Very low or very high dwell time = instability
-        dwell_deviation = abs(data.avg_dwell_time - OPTIMAL_DWELL_TIME) / OPTIMAL_DWELL_TIME
-        dwell_instability = min(1.0, dwell_deviation)
-        
-        # Calculate stability (inverse of instability)
-        instability = (
-            0.5 * correction_instability +
-            0.3 * pause_factor +
-            0.2 * dwell_instability
-        )
-        
-        stability = 1 - instability
-        return max(0.0, min(1.0, stability))
+        return self.spec_loader.get().evaluate(dict(data))["decision_stability"]
     
     def calculate_risk_volatility(self, data: KeystrokeData) -> float:
         """
         Risk volatility: rapid changes in behavior indicating uncertainty
         High speed with high errors = risky/impulsive behavior
         """
-        # Fast typing (low flight time) = impulsive
-        speed_risk = 1 - self.normalize(data.avg_flight_time, 50, 300)
-        
-        # High error rate without corrections = reckless
-        if data.correction_rate > 0:
-            recklessness = data.error_rate / (1 + data.correction_rate)
-        else:
-            recklessness = data.error_rate
-        
-        # Short pauses with high text volume = rushed
-        if data.text_length > 0:
-            rush_factor = data.text_length / (1 + data.avg_pause_duration / 1000)
-            rush_score = self.normalize(rush_factor, 0, 100)
-        else:
-            rush_score = 0
-        
-        # Weighted combination
-        risk_volatility = (
-            0.4 * speed_risk +
-            0.4 * recklessness +
-            0.2 * rush_score
-        )
-        
-        return max(0.0, min(1.0, risk_volatility))
+        return self.spec_loader.get().evaluate(dict(data))["risk_volatility"]
     
     def analyze(self, data: KeystrokeData) -> CognitiveScores:
         """
         Main analysis function: computes all cognitive metrics
         Returns scores between 0 and 1
         """
-        # Get advanced features (heat and rage)
-        features = self.feature_detector.analyze_features(data)
-        
-        return CognitiveScores(
-            cognitive_load=self.calculate_cognitive_load(data),
-            mood_drift=self.calculate_mood_drift(data),
-            decision_stability=self.calculate_decision_stability(data),
-            risk_volatility=self.calculate_risk_volatility(data),
-            heat=features['heat'],
-            rage=features['rage']
-        )
+        # All weights, ranges and thresholds live in the scoring spec; its
+        # compiled plan computes each shared term once
+        with analyzer_latency.time("single"):
+            scores = self.spec_loader.get().evaluate(dict(data))
+            return CognitiveScores(**scores)
+    
+    def analyze_batch(self, features: Mapping[str, Sequence[float]]) -> "Dict[str, np.ndarray]":
+        """
+        Vectorized analysis over a struct-of-arrays of input features
+        Runs the same compiled plan as analyze() on NumPy columns, so results
+        are bit-identical to the scalar path
+        """
+        with analyzer_latency.time("batch"):
+            return self.spec_loader.get().evaluate_batch(features)
+    
+    def baseline_scores(self, session_id: str, scores: CognitiveScores) -> BaselineScores:
+        """
+        Baseline-relative mode: each score as a z-score against the session's
+        own history, read from the rolling stats (no history query)
+        Call before the row is folded into the stats; None until the session
+        has baseline_min_samples rows or while a score has zero variance
+        """
+        return BaselineScores(**self.stats_store.zscores(
+            session_id, scores.model_dump(), settings.baseline_min_samples
+        ))
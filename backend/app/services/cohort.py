@@ -0,0 +1,435 @@
+"""
+Cross-session (cohort) aggregates
+Fleet-wide score percentiles come from per-hour and per-day histograms of
+every score: 100 fixed-width bins over [0, 1] (scores are clipped to that
+range), stored as one row per non-empty bin. Histograms of different
+buckets, workers or refresh passes merge by adding counts, so a quantile
+over any range of buckets is one indexed read plus a cumulative sum, with
+an error of at most one bin width (0.01).
+
+The histograms and the hourly diary counts are refreshed incrementally: a
+pass folds cognitive_metrics and diary_entries rows past the id watermark
+stored in cohort_watermarks, in id order, and stops at the first row newer
+than COHORT_REFRESH_LAG. Ids are allocated at INSERT but become visible at
+COMMIT, so on PostgreSQL a lower id can still commit after a higher one
+(concurrent workers, long transactions, the parallel COPY loader). A pass
+therefore also stops at a gap in the ids until every transaction that was
+open when the gap was first seen has ended (txid snapshot horizon); only
+then is the gap final (a rollback) and skipped. SQLite serializes writers,
+so its gaps are always final. Threshold shares need per-session values and read the hour/day
+rollups (one row per session and bucket) instead of raw rows.
+
+Refresh or rebuild from the full history (run from backend/):
+  python -m app.services.cohort --refresh
+  python -m app.services.cohort --rebuild
+"""
+import argparse
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, func, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import new_session
+from app.models.cognitive import (
+    CognitiveMetric,
+    CohortDayHistogram,
+    CohortDiaryHour,
+    CohortHourHistogram,
+    CohortWatermark,
+    DayRollup,
+    DiaryEntry,
+    HourRollup,
+)
+from app.schemas.cognitive import SCORE_NAMES
+from app.services.rollups import as_utc, bucket_start
+
+logger = logging.getLogger(__name__)
+
+BINS = 100
+
+HISTOGRAMS = {"hour": CohortHourHistogram, "day": CohortDayHistogram}
+ROLLUPS = {"hour": HourRollup, "day": DayRollup}
+BUCKET_WIDTHS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+METRICS_SOURCE = "cognitive_metrics"
+DIARY_SOURCE = "diary_entries"
+
+
+def score_bin(value: float) -> int:
+    return min(max(int(value * BINS), 0), BINS - 1)
+
+
+def histogram_rows(rows: Iterable[Mapping[str, Any]], resolution: str) -> List[Dict[str, Any]]:
+    """Histogram rows (bucket, score, bin, count) for the given metric rows"""
+    counts: Dict[Tuple[datetime, str, int], int] = defaultdict(int)
+    for row in rows:
+        bucket = bucket_start(row["timestamp"], resolution)
+        for name in SCORE_NAMES:
+            value = row[name]
+            if value is not None:
+                counts[(bucket, name, score_bin(value))] += 1
+    # Sorted so concurrent refreshes lock histogram rows in the same order
+    return [
+        {"bucket": bucket, "score": name, "bin": index, "count": counts[(bucket, name, index)]}
+        for bucket, name, index in sorted(counts)
+    ]
+
+
+def diary_rows(rows: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """Hourly (bucket, entries, crisis_entries) rows for the given diary rows"""
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    for row in rows:
+        bucket = bucket_start(row["timestamp"], "hour")
+        agg = buckets.setdefault(bucket, {"bucket": bucket, "entries": 0, "crisis_entries": 0})
+        agg["entries"] += 1
+        agg["crisis_entries"] += 1 if row["is_crisis"] else 0
+    return [buckets[bucket] for bucket in sorted(buckets)]
+
+
+def _upsert_statement(dialect: str, model, keys: Sequence[str], counters: Sequence[str]):
+    """INSERT ... ON CONFLICT DO UPDATE adding the counters, or None"""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        stmt = pg_insert(model)
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        stmt = sqlite_insert(model)
+    else:
+        return None
+    merged = {name: getattr(model, name) + getattr(stmt.excluded, name) for name in counters}
+    return stmt.on_conflict_do_update(index_elements=list(keys), set_=merged)
+
+
+def _merge_counts(db: Session, model, rows: List[Dict[str, Any]], keys: Sequence[str], counters: Sequence[str]) -> None:
+    if not rows:
+        return
+    stmt = _upsert_statement(db.get_bind().dialect.name, model, keys, counters)
+    if stmt is not None:
+        db.execute(stmt, rows)
+        return
+    for row in rows:
+        existing = db.get(model, tuple(row[key] for key in keys))
+        if existing is None:
+            db.add(model(**row))
+        else:
+            for name in counters:
+                setattr(existing, name, getattr(existing, name) + row[name])
+    db.flush()
+
+
+def apply_histograms(db: Session, rows: List[Mapping[str, Any]]) -> None:
+    """Fold metric rows into the hour and day histograms (caller commits)"""
+    for resolution, model in HISTOGRAMS.items():
+        _merge_counts(db, model, histogram_rows(rows, resolution), ("bucket", "score", "bin"), ("count",))
+
+
+def apply_diary(db: Session, rows: List[Mapping[str, Any]]) -> None:
+    _merge_counts(db, CohortDiaryHour, diary_rows(rows), ("bucket",), ("entries", "crisis_entries"))
+
+
+# Source table -> (columns to read, fold function)
+SOURCES: Dict[str, Tuple[list, Callable[[Session, List[Mapping[str, Any]]], None]]] = {
+    METRICS_SOURCE: (
+        [CognitiveMetric.id, CognitiveMetric.timestamp] + [getattr(CognitiveMetric, name) for name in SCORE_NAMES],
+        apply_histograms,
+    ),
+    DIARY_SOURCE: ([DiaryEntry.id, DiaryEntry.timestamp, DiaryEntry.is_crisis], apply_diary),
+}
+
+
+def _locked_watermark(db: Session, source: str) -> CohortWatermark:
+    """The source's watermark row, locked until commit (FOR UPDATE; a no-op on SQLite)"""
+    stmt = select(CohortWatermark).where(CohortWatermark.source == source).with_for_update()
+    watermark = db.scalars(stmt).first()
+    if watermark is None:
+        watermark = CohortWatermark(source=source, last_id=0)
+        db.add(watermark)
+        db.flush()
+    return watermark
+
+
+def tracks_in_flight_ids(db: Session) -> bool:
+    """Whether ids can commit out of order, so gaps may still fill (PostgreSQL)"""
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def snapshot_xmin(db: Session) -> int:
+    """Every txid below this has committed or rolled back"""
+    return db.scalar(text("SELECT txid_snapshot_xmin(txid_current_snapshot())"))
+
+
+def snapshot_xmax(db: Session) -> int:
+    """Every transaction running at this snapshot has a txid below this"""
+    return db.scalar(text("SELECT txid_snapshot_xmax(txid_current_snapshot())"))
+
+
+def _final_id(db: Session, watermark: CohortWatermark) -> float:
+    """Highest id whose gaps below it can no longer fill"""
+    if not tracks_in_flight_ids(db):
+        return float("inf")
+    if watermark.pending_xid is not None and snapshot_xmin(db) >= watermark.pending_xid:
+        watermark.settled_id = max(watermark.settled_id or 0, watermark.pending_id)
+        watermark.pending_id = watermark.pending_xid = None
+    return watermark.settled_id or 0
+
+
+def refresh_source(db: Session, source: str, cutoff: datetime, batch_size: int) -> int:
+    """Fold rows past the watermark and older than cutoff, up to an unsettled id gap; returns rows folded in"""
+    columns, fold = SOURCES[source]
+    id_column = columns[0]
+    total = 0
+    while True:
+        try:
+            watermark = _locked_watermark(db, source)
+        except IntegrityError:
+            # Another worker created the watermark first; it refreshes this pass
+            db.rollback()
+            return total
+        final_id = _final_id(db, watermark)
+        rows = db.execute(
+            select(*columns).where(id_column > watermark.last_id).order_by(id_column).limit(batch_size)
+        ).mappings().all()
+        ready = []
+        previous = watermark.last_id
+        for row in rows:
+            if row["timestamp"] is None or as_utc(row["timestamp"]) >= cutoff:
+                break
+            if row["id"] - 1 > max(previous, final_id):
+                # Ids previous+1 .. row.id-1 may belong to open transactions:
+                # hold here until every transaction running now has ended
+                if watermark.pending_xid is None:
+                    watermark.pending_id = rows[-1]["id"]
+                    watermark.pending_xid = snapshot_xmax(db)
+                break
+            ready.append(row)
+            previous = row["id"]
+        if ready:
+            fold(db, ready)
+            watermark.last_id = ready[-1]["id"]
+        watermark.refreshed_at = datetime.now(timezone.utc)
+        db.commit()
+        total += len(ready)
+        if len(ready) < batch_size:
+            return total
+
+
+def refresh(db: Session, lag: float = 30.0, batch_size: int = 5000) -> Dict[str, int]:
+    """One incremental pass over every source; returns rows folded in per source"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=lag)
+    return {source: refresh_source(db, source, cutoff, batch_size) for source in SOURCES}
+
+
+def rebuild(db: Session, lag: float = 30.0, batch_size: int = 5000) -> Dict[str, int]:
+    """Drop every cohort aggregate and watermark, then refresh from the start"""
+    for model in (CohortHourHistogram, CohortDayHistogram, CohortDiaryHour, CohortWatermark):
+        db.execute(delete(model))
+    db.commit()
+    return refresh(db, lag, batch_size)
+
+
+def bucket_count(start: datetime, end: datetime, resolution: str) -> int:
+    return int((end - bucket_start(start, resolution)) / BUCKET_WIDTHS[resolution]) + 1
+
+
+def quantiles(counts: Mapping[int, int], qs: Sequence[float]) -> Dict[str, Optional[float]]:
+    """
+    Quantiles of a histogram ({bin: count}), keyed like "p50"
+    Values are interpolated linearly within the bin holding the rank
+    """
+    total = sum(counts.values())
+    result: Dict[str, Optional[float]] = {}
+    for q in qs:
+        key = f"p{q * 100:g}"
+        if total == 0:
+            result[key] = None
+            continue
+        target = q * total
+        seen = 0
+        for index in sorted(counts):
+            count = counts[index]
+            if count and seen + count >= target:
+                result[key] = (index + (target - seen) / count) / BINS
+                break
+            seen += count
+    return result
+
+
+def histogram_statement(resolution: str, start: datetime, end: datetime, scores: Sequence[str]):
+    model = HISTOGRAMS[resolution]
+    return select(model.bucket, model.score, model.bin, model.count).where(
+        model.bucket >= bucket_start(start, resolution),
+        model.bucket < end,
+        model.score.in_(scores),
+    ).order_by(model.bucket, model.score, model.bin)
+
+
+def percentile_series(
+    rows: Iterable[Mapping[str, Any]], scores: Sequence[str], qs: Sequence[float]
+) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, Dict[str, Any]]]:
+    """Per-bucket quantiles per score, plus the merged histogram over the whole range"""
+    per_bucket: Dict[str, Dict[datetime, Dict[int, int]]] = {name: {} for name in scores}
+    overall: Dict[str, Dict[int, int]] = {name: defaultdict(int) for name in scores}
+    for row in rows:
+        bins = per_bucket[row["score"]].setdefault(as_utc(row["bucket"]), {})
+        bins[row["bin"]] = row["count"]
+        overall[row["score"]][row["bin"]] += row["count"]
+    series = {
+        name: [
+            {"timestamp": bucket, "count": sum(bins.values()), "quantiles": quantiles(bins, qs)}
+            for bucket, bins in buckets.items()
+        ]
+        for name, buckets in per_bucket.items()
+    }
+    totals = {
+        name: {"count": sum(bins.values()), "quantiles": quantiles(bins, qs)}
+        for name, bins in overall.items()
+    }
+    return series, totals
+
+
+def threshold_statement(score: str, threshold: float, stat: str, resolution: str, start: datetime, end: datetime):
+    """(timestamp, sessions, above) per bucket, from the per-session rollups"""
+    model = ROLLUPS[resolution]
+    if stat == "max":
+        value = getattr(model, f"{score}_max")
+    else:
+        value = getattr(model, f"{score}_sum") / model.count
+    return select(
+        model.bucket.label("timestamp"),
+        func.count().label("sessions"),
+        func.sum(case((value >= threshold, 1), else_=0)).label("above"),
+    ).where(
+        model.bucket >= bucket_start(start, resolution),
+        model.bucket < end,
+    ).group_by(model.bucket).order_by(model.bucket)
+
+
+def crisis_statement(resolution: str, start: datetime, end: datetime):
+    # Day buckets are summed from the hours in Python: no portable date_trunc
+    return select(CohortDiaryHour.bucket, CohortDiaryHour.entries, CohortDiaryHour.crisis_entries).where(
+        CohortDiaryHour.bucket >= bucket_start(start, resolution),
+        CohortDiaryHour.bucket < end,
+    ).order_by(CohortDiaryHour.bucket)
+
+
+def crisis_series(rows: Iterable[Mapping[str, Any]], resolution: str) -> List[Dict[str, Any]]:
+    buckets: Dict[datetime, List[int]] = {}
+    for row in rows:
+        totals = buckets.setdefault(bucket_start(row["bucket"], resolution), [0, 0])
+        totals[0] += row["entries"]
+        totals[1] += row["crisis_entries"]
+    return [
+        {
+            "timestamp": bucket,
+            "entries": entries,
+            "crisis_entries": crisis,
+            "crisis_rate": crisis / entries if entries else 0.0,
+        }
+        for bucket, (entries, crisis) in buckets.items()
+    ]
+
+
+class CohortRefresher:
+    """Background thread running an incremental refresh every `interval` seconds"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = 60.0,
+        lag: float = 30.0,
+        batch_size: int = 5000,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.lag = lag
+        self.batch_size = batch_size
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._counters = {"passes": 0, "failures": 0, "metric_rows": 0, "diary_rows": 0}
+        self._last_refresh_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="cohort-refresher", daemon=True)
+        self._thread.start()
+        logger.info("Cohort refresher started (interval=%ss, lag=%ss)", self.interval, self.lag)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if not self.running:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def refresh_once(self) -> None:
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            folded = refresh(db, self.lag, self.batch_size)
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._counters["failures"] += 1
+            logger.exception("Cohort refresh failed")
+            return
+        finally:
+            db.close()
+        self._last_refresh_seconds = time.perf_counter() - started
+        with self._lock:
+            self._counters["passes"] += 1
+            self._counters["metric_rows"] += folded[METRICS_SOURCE]
+            self._counters["diary_rows"] += folded[DIARY_SOURCE]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "lag": self.lag,
+            "last_refresh_seconds": self._last_refresh_seconds,
+            **counters,
+        }
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.refresh_once()
+
+
+cohort_refresher = CohortRefresher(
+    new_session,
+    interval=settings.cohort_refresh_interval,
+    lag=settings.cohort_refresh_lag,
+    batch_size=settings.cohort_refresh_batch_size,
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the cohort aggregate tables")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--refresh", action="store_true", help="fold rows past the watermarks")
+    group.add_argument("--rebuild", action="store_true", help="recompute every cohort aggregate")
+    args = parser.parse_args()
+
+    session = new_session()
+    try:
+        run = rebuild if args.rebuild else refresh
+        folded = run(session, settings.cohort_refresh_lag, settings.cohort_refresh_batch_size)
+        print(", ".join(f"{source}: {count} rows" for source, count in folded.items()))
+    finally:
+        session.close()
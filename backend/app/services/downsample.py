@@ -0,0 +1,42 @@
+"""
+Largest-Triangle-Three-Buckets downsampling for chart series
+Keeps the first and last points and, from each of threshold - 2 equal
+buckets in between, the point forming the largest triangle with the point
+kept from the previous bucket and the mean of the next bucket. Preserves
+the visual shape (peaks, dips) far better than striding or averaging.
+"""
+from app.lazy import lazy_module
+
+np = lazy_module("numpy")
+
+
+def lttb(x, y, threshold: int) -> "np.ndarray":
+    """Indices of the points to keep, ascending; all of them if len(x) <= threshold"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        raise ValueError("LTTB needs a threshold of at least 3 points")
+
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    # Bucket edges over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+            next_x, next_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change the argmax
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
@@ -0,0 +1,120 @@
+"""
+Streaming export of a session's full metric history
+Rows are fetched through a server-side cursor in yield_per partitions and
+serialized straight from result tuples (no ORM instances, no pydantic), so
+memory stays flat regardless of how long the session is.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator
+
+from sqlalchemy import select
+
+from app.database import async_read_session, read_session
+from app.models.cognitive import CognitiveMetric
+from app.schemas.cognitive import METRIC_FIELDS
+
+EXPORT_BATCH_SIZE = 1000
+
+# Both formats write timestamps as ISO 8601 (csv would otherwise use str())
+TIMESTAMP_INDEX = METRIC_FIELDS.index("timestamp")
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _export_statement(session_id: str):
+    return (
+        select(*[getattr(CognitiveMetric, name) for name in METRIC_FIELDS])
+        .where(CognitiveMetric.session_id == session_id)
+        .order_by(CognitiveMetric.timestamp, CognitiveMetric.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+
+def iter_partitions(session_id: str) -> Iterator[list]:
+    # The route's DB session is closed before the body streams, so the
+    # generator owns its session (a replica, if any) for the lifetime of the response
+    db = read_session(session_id)
+    try:
+        for partition in db.execute(_export_statement(session_id)).partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+async def aiter_partitions(session_id: str) -> AsyncIterator[list]:
+    db = await async_read_session(session_id)
+    try:
+        result = await db.stream(_export_statement(session_id))
+        async for partition in result.partitions():
+            yield partition
+    finally:
+        await db.close()
+
+
+def _isoformat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_chunk(partition: list) -> str:
+    return "".join(
+        json.dumps(dict(zip(METRIC_FIELDS, row)), default=_isoformat) + "\n"
+        for row in partition
+    )
+
+
+class _CsvChunker:
+    """Renders partitions to CSV text, header first"""
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(METRIC_FIELDS)
+
+    def chunk(self, partition: list) -> str:
+        i = TIMESTAMP_INDEX
+        self.writer.writerows((*row[:i], row[i].isoformat(), *row[i + 1:]) for row in partition)
+        text = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return text
+
+
+def iter_ndjson(partitions: Iterable[list]) -> Iterator[str]:
+    for partition in partitions:
+        yield _ndjson_chunk(partition)
+
+
+def iter_csv(partitions: Iterable[list]) -> Iterator[str]:
+    chunker = _CsvChunker()
+    for partition in partitions:
+        yield chunker.chunk(partition)
+
+
+async def aiter_ndjson(partitions: AsyncIterator[list]) -> AsyncIterator[str]:
+    async for partition in partitions:
+        yield _ndjson_chunk(partition)
+
+
+async def aiter_csv(partitions: AsyncIterator[list]) -> AsyncIterator[str]:
+    chunker = _CsvChunker()
+    async for partition in partitions:
+        yield chunker.chunk(partition)
+
+
+EXPORTERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+}
+
+ASYNC_EXPORTERS = {
+    "ndjson": aiter_ndjson,
+    "csv": aiter_csv,
+}
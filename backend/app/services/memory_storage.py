@@ -0,0 +1,348 @@
+"""
+Ephemeral in-memory storage (STORAGE_BACKEND=memory)
+Nothing reaches a database. Each session's metrics live in a fixed-capacity
+ring buffer in the worker process, one typed array per column: array('f')
+for the features and scores, 'd' for timestamps, 'q' for ids. A row costs
+about 76 bytes instead of a dict or ORM object per row. Once a session has
+MEMORY_RING_CAPACITY rows, each new row overwrites its oldest. While the
+total exceeds MEMORY_MAX_BYTES, the least recently used sessions are dropped
+whole, diary entries included. Each session keeps its newest
+MEMORY_DIARY_CAPACITY diary entries.
+
+Values are stored as float32, so they come back with about 7 significant
+digits. Data is per worker and lost on restart: run one worker, or route
+each session to the same worker.
+"""
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque, namedtuple
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.schemas.cognitive import FEATURE_NAMES, METRIC_FIELDS, SCORE_NAMES
+from app.services.export import EXPORT_BATCH_SIZE
+from app.services.pagination import decode_cursor
+from app.services.rolling_stats import rolling_stats
+from app.services.rollups import as_utc
+from app.services.storage import MetricStorage
+
+# One array('f') per column, in this order
+VALUE_COLUMNS = FEATURE_NAMES + SCORE_NAMES
+INT_COLUMNS = frozenset({"pause_count", "text_length", "word_count"})
+# Python objects around one session's arrays (rough; the arrays are measured)
+SESSION_OVERHEAD = 2048
+DIARY_ENTRY_OVERHEAD = 400
+
+
+@lru_cache(maxsize=None)
+def row_type(fields: Sequence[str]):
+    """Tuple type for history rows: positional like a Row, with .id and .timestamp"""
+    return namedtuple("MetricRow", fields)
+
+
+def _timestamp(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+class MetricRing:
+    """Fixed-capacity ring buffer of one session's metric rows, columnar"""
+
+    __slots__ = ("capacity", "head", "ids", "timestamps", "columns")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # Physical index of the oldest row once the buffer is full
+        self.head = 0
+        self.ids = array("q")
+        self.timestamps = array("d")
+        self.columns = {name: array("f") for name in VALUE_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, row: Dict[str, Any]) -> None:
+        timestamp = as_utc(row["timestamp"]).timestamp()
+        if len(self.ids) < self.capacity:
+            self.ids.append(row["id"])
+            self.timestamps.append(timestamp)
+            for name, values in self.columns.items():
+                values.append(row[name])
+            return
+        slot = self.head
+        self.ids[slot] = row["id"]
+        self.timestamps[slot] = timestamp
+        for name, values in self.columns.items():
+            values[slot] = row[name]
+        self.head = (slot + 1) % self.capacity
+
+    def physical(self, index: int) -> int:
+        """Physical slot of the index-th oldest row"""
+        return (self.head + index) % len(self.ids)
+
+    def older_than(self, row_id: int) -> int:
+        """Number of rows with an id below row_id (ids grow with insertion order)"""
+        ids = self.ids
+        return bisect_left(range(len(ids)), row_id, key=lambda index: ids[self.physical(index)])
+
+    def value(self, slot: int, name: str, session_id: str) -> Any:
+        if name == "id":
+            return self.ids[slot]
+        if name == "timestamp":
+            return _timestamp(self.timestamps[slot])
+        if name == "session_id":
+            return session_id
+        value = self.columns[name][slot]
+        return int(value) if name in INT_COLUMNS else value
+
+    def rows(self, session_id: str, fields: Sequence[str], indexes) -> list:
+        return [
+            tuple(self.value(self.physical(index), name, session_id) for name in fields)
+            for index in indexes
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.ids) + sys.getsizeof(self.timestamps) + sum(
+            sys.getsizeof(values) for values in self.columns.values()
+        )
+
+
+@dataclass
+class DiaryRecord:
+    """A diary entry; same attributes as the DiaryEntry model"""
+
+    id: int
+    session_id: str
+    timestamp: datetime
+    mood_rating: int
+    mood_notes: str
+    is_crisis: bool
+    cognitive_load: float
+    mood_drift: float
+    decision_stability: float
+    risk_volatility: float
+    heat: float
+    rage: float
+
+
+class SessionData:
+    __slots__ = ("metrics", "diary", "diary_bytes")
+
+    def __init__(self, ring_capacity: int, diary_capacity: int):
+        self.metrics = MetricRing(ring_capacity)
+        self.diary: Deque[DiaryRecord] = deque(maxlen=diary_capacity)
+        self.diary_bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return SESSION_OVERHEAD + self.metrics.nbytes + self.diary_bytes
+
+
+def diary_entry_size(entry: DiaryRecord) -> int:
+    return DIARY_ENTRY_OVERHEAD + len(entry.mood_notes)
+
+
+class MemoryStorage(MetricStorage):
+    """Per-session ring buffers under one lock, LRU-evicted to a byte budget"""
+
+    name = "memory"
+
+    def __init__(self, ring_capacity: int = 2048, max_bytes: int = 64 * 1024 * 1024, diary_capacity: int = 256):
+        self.ring_capacity = ring_capacity
+        self.max_bytes = max_bytes
+        self.diary_capacity = diary_capacity
+        self._sessions: "OrderedDict[str, SessionData]" = OrderedDict()
+        self._session_bytes: Dict[str, int] = {}
+        self._diary_index: Dict[int, str] = {}
+        self._bytes = 0
+        self._next_metric_id = 1
+        self._next_entry_id = 1
+        self._lock = threading.Lock()
+        self._counters = {"rows_added": 0, "rows_overwritten": 0, "evictions": 0, "evicted_rows": 0}
+
+    # Metrics
+
+    def add_metrics(self, rows: List[dict]) -> None:
+        with self._lock:
+            touched = {}
+            for row in rows:
+                row["id"] = self._next_metric_id
+                self._next_metric_id += 1
+                session = touched.get(row["session_id"]) or self._session(row["session_id"], create=True)
+                touched[row["session_id"]] = session
+                if len(session.metrics) == self.ring_capacity:
+                    self._counters["rows_overwritten"] += 1
+                session.metrics.append(row)
+            self._counters["rows_added"] += len(rows)
+            for session_id, session in touched.items():
+                self._resize(session_id, session)
+            self._evict()
+
+    def warm_stats(self, session_ids: Sequence[str]) -> None:
+        for session_id in rolling_stats.missing(session_ids):
+            with self._lock:
+                session = self._session(session_id)
+                if session is None:
+                    continue
+                ring = session.metrics
+                start = max(0, len(ring) - rolling_stats.window)
+                rows = [
+                    dict(zip(VALUE_COLUMNS, values))
+                    for values in ring.rows(session_id, VALUE_COLUMNS, range(start, len(ring)))
+                ]
+            rolling_stats.warm(session_id, rows)
+
+    def metrics_page(self, session_id: str, fields: Sequence[str], limit: int, before: Optional[str]) -> list:
+        cursor_id = decode_cursor(before)[1] if before else None
+        with self._lock:
+            session = self._session(session_id)
+            if session is None:
+                return []
+            ring = session.metrics
+            end = ring.older_than(cursor_id) if cursor_id is not None else len(ring)
+            rows = ring.rows(session_id, fields, range(end - 1, max(end - limit, 0) - 1, -1))
+        make_row = row_type(tuple(fields))
+        return [make_row(*row) for row in rows]
+
+    def latest(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self._session(session_id)
+            if session is None or not len(session.metrics):
+                return None
+            ring = session.metrics
+            return dict(zip(METRIC_FIELDS, ring.rows(session_id, METRIC_FIELDS, [len(ring) - 1])[0]))
+
+    def has_metrics(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._session(session_id)
+            return session is not None and len(session.metrics) > 0
+
+    def export_partitions(self, session_id: str) -> Iterator[list]:
+        # Copied up front: the ring may be overwritten while the response streams
+        with self._lock:
+            session = self._session(session_id)
+            rows = session.metrics.rows(session_id, METRIC_FIELDS, range(len(session.metrics))) if session else []
+        for start in range(0, len(rows), EXPORT_BATCH_SIZE):
+            yield rows[start:start + EXPORT_BATCH_SIZE]
+
+    def series_rows(
+        self, session_id: str, start: datetime, end: datetime, points: int
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        # The rings are short enough to downsample raw rows at any range
+        lower, upper = as_utc(start).timestamp(), as_utc(end).timestamp()
+        fields = ("timestamp",) + SCORE_NAMES
+        with self._lock:
+            session = self._session(session_id)
+            if session is None:
+                return None, []
+            ring = session.metrics
+            indexes = [
+                index for index in range(len(ring))
+                if lower <= ring.timestamps[ring.physical(index)] < upper
+            ]
+            rows = ring.rows(session_id, fields, indexes)
+        series = []
+        for timestamp, *scores in rows:
+            row = {"timestamp": timestamp, "count": 1}
+            for name, value in zip(SCORE_NAMES, scores):
+                row.update({f"{name}_min": value, f"{name}_mean": value, f"{name}_max": value})
+            series.append(row)
+        return None, series
+
+    # Diary
+
+    def add_diary_entry(self, values: Dict[str, Any]) -> DiaryRecord:
+        with self._lock:
+            entry = DiaryRecord(id=self._next_entry_id, **values)
+            self._next_entry_id += 1
+            session = self._session(entry.session_id, create=True)
+            if len(session.diary) == session.diary.maxlen:
+                dropped = session.diary.popleft()
+                self._diary_index.pop(dropped.id, None)
+                session.diary_bytes -= diary_entry_size(dropped)
+            session.diary.append(entry)
+            session.diary_bytes += diary_entry_size(entry)
+            self._diary_index[entry.id] = entry.session_id
+            self._resize(entry.session_id, session)
+            self._evict()
+            return entry
+
+    def diary_page(self, session_id: str, limit: int, before: Optional[str]) -> list:
+        cursor_id = decode_cursor(before)[1] if before else None
+        with self._lock:
+            session = self._session(session_id)
+            if session is None:
+                return []
+            entries = [entry for entry in reversed(session.diary) if cursor_id is None or entry.id < cursor_id]
+        return entries[:limit]
+
+    def get_diary_entry(self, entry_id: int) -> Optional[DiaryRecord]:
+        with self._lock:
+            entry, _ = self._find_entry(entry_id)
+            return entry
+
+    def delete_diary_entry(self, entry_id: int) -> bool:
+        with self._lock:
+            entry, session = self._find_entry(entry_id)
+            if entry is None:
+                return False
+            session.diary.remove(entry)
+            session.diary_bytes -= diary_entry_size(entry)
+            del self._diary_index[entry_id]
+            self._resize(entry.session_id, session)
+            return True
+
+    # Bookkeeping (callers hold the lock)
+
+    def _session(self, session_id: str, create: bool = False) -> Optional[SessionData]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        elif create:
+            session = self._sessions[session_id] = SessionData(self.ring_capacity, self.diary_capacity)
+        return session
+
+    def _find_entry(self, entry_id: int):
+        session_id = self._diary_index.get(entry_id)
+        if session_id is None:
+            return None, None
+        session = self._session(session_id)
+        for entry in session.diary:
+            if entry.id == entry_id:
+                return entry, session
+        return None, None
+
+    def _resize(self, session_id: str, session: SessionData) -> None:
+        size = session.nbytes
+        self._bytes += size - self._session_bytes.get(session_id, 0)
+        self._session_bytes[session_id] = size
+
+    def _evict(self) -> None:
+        # The most recently used session always stays, even alone over budget
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            session_id, session = self._sessions.popitem(last=False)
+            self._bytes -= self._session_bytes.pop(session_id)
+            for entry in session.diary:
+                self._diary_index.pop(entry.id, None)
+            self._counters["evictions"] += 1
+            self._counters["evicted_rows"] += len(session.metrics)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "rows": sum(len(session.metrics) for session in self._sessions.values()),
+                **self._counters,
+            }
+
+
+memory_storage = MemoryStorage(
+    settings.memory_ring_capacity, settings.memory_max_bytes, settings.memory_diary_capacity
+)
@@ -0,0 +1,44 @@
+"""
+Keyset (cursor) pagination for per-session history
+A cursor encodes the (timestamp, id) of the last row on a page; the next
+page is every row strictly older than it, so each page is one index range
+scan no matter how deep into the history it is.
+"""
+import base64
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from exc
+
+
+def newest_first_page(stmt: Select, model, limit: int, before: str = None) -> Select:
+    """Order newest first and, given a cursor, keep only rows older than it"""
+    if before:
+        timestamp, row_id = decode_cursor(before)
+        stmt = stmt.where(tuple_(model.timestamp, model.id) < tuple_(timestamp, row_id))
+    return stmt.order_by(model.timestamp.desc(), model.id.desc()).limit(limit)
+
+
+def next_cursor(rows, limit: int):
+    """Cursor for the page after rows, or None when this was the last page"""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.timestamp, last.id)
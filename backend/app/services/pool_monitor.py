@@ -0,0 +1,159 @@
+"""
+Connection pool instrumentation
+The engines are built with the Instrumented*QueuePool classes below, which
+time every pool checkout (queue wait plus any new connection or pre-ping);
+pool event listeners count checkouts, checkins, new connections and
+invalidations. PoolMonitor.stats() adds the pool's live occupancy.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+# Recent checkout waits kept for the percentile figures
+WAIT_SAMPLES = 2048
+
+
+class PoolMonitor:
+    """Counters and checkout-wait samples for one engine's pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool: Optional[Pool] = None
+        self._lock = threading.Lock()
+        self._waits: "deque[float]" = deque(maxlen=WAIT_SAMPLES)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._counters = {
+            "checkouts": 0,
+            "checkins": 0,
+            "connects": 0,
+            "invalidations": 0,
+            "soft_invalidations": 0,
+            "timeouts": 0,
+            "peak_checked_out": 0,
+            "peak_overflow": 0,
+        }
+
+    def attach(self, pool: Pool) -> None:
+        """Listen to the pool's events (they survive engine.dispose())"""
+        self.pool = pool
+        if isinstance(pool, _TimedCheckout):
+            pool.monitor = self
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        event.listen(pool, "soft_invalidate", self._on_soft_invalidate)
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self._waits.append(seconds)
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+            if timed_out:
+                self._counters["timeouts"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            waits = sorted(self._waits)
+            wait_total, wait_max = self._wait_total, self._wait_max
+        attempts = counters["checkouts"] + counters["timeouts"]
+        return {
+            "pool": type(self.pool).__name__ if self.pool is not None else None,
+            **_occupancy(self.pool),
+            **counters,
+            "wait_avg_ms": (wait_total / attempts * 1000) if attempts else 0.0,
+            "wait_max_ms": wait_max * 1000,
+            "wait_p50_ms": _percentile(waits, 0.50) * 1000,
+            "wait_p99_ms": _percentile(waits, 0.99) * 1000,
+        }
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        occupancy = _occupancy(self.pool)
+        with self._lock:
+            self._counters["checkouts"] += 1
+            self._counters["peak_checked_out"] = max(
+                self._counters["peak_checked_out"], occupancy.get("checked_out", 0)
+            )
+            self._counters["peak_overflow"] = max(
+                self._counters["peak_overflow"], occupancy.get("overflow", 0)
+            )
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        self._count("checkins")
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        self._count("connects")
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self._count("invalidations")
+
+    def _on_soft_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        self._count("soft_invalidations")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+
+def _occupancy(pool: Optional[Pool]) -> Dict[str, int]:
+    # Only QueuePool and its subclasses track size/overflow
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+    }
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class _TimedCheckout:
+    """Pool mixin timing connect(): how long callers wait for a connection"""
+
+    monitor: Optional[PoolMonitor] = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            if self.monitor is not None:
+                self.monitor.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.monitor is not None:
+            self.monitor.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool; keep reporting to the same monitor
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        if self.monitor is not None:
+            self.monitor.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+sync_pool_monitor = PoolMonitor("sync")
+async_pool_monitor = PoolMonitor("async")
@@ -0,0 +1,270 @@
+"""
+Opt-in request profiler
+Disabled by default. When PROFILE_SAMPLE_RATE > 0 (or a request carries
+X-Profile: <PROFILE_HEADER_TOKEN>) the middleware runs cProfile around the
+request on the event-loop thread, which covers body validation, async
+handlers and response serialization. Sync endpoints run in the threadpool,
+so each of them is wrapped to profile its own call in the worker thread
+(ORM flush/commit included); both profiles are merged into one dump.
+
+Only one request is profiled at a time: cProfile on the event-loop thread
+also sees other coroutines that run meanwhile, so keep the sample rate low.
+Each capture writes <id>.prof (pstats), <id>.collapsed (flame graph input)
+and <id>.json (metadata) to PROFILE_DIR, keeping the newest PROFILE_KEEP.
+"""
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID = re.compile(r"^[0-9]+-[A-Z]+-[A-Za-z0-9_.-]+$")
+MAX_STACK_DEPTH = 64
+
+
+class _Capture:
+    """Profiles collected for one sampled request"""
+
+    def __init__(self):
+        self.thread_profiles: List[cProfile.Profile] = []
+
+
+_current_capture: contextvars.ContextVar[Optional[_Capture]] = contextvars.ContextVar(
+    "profile_capture", default=None
+)
+
+
+def collapsed_stacks(stats: pstats.Stats, min_fraction: float = 0.001) -> List[str]:
+    """
+    Approximate collapsed stacks ("a;b;c <microseconds>") from a pstats graph
+    cProfile keeps caller->callee edges rather than full stacks, so a
+    function's time is split across the paths reaching it in proportion to
+    each caller edge's cumulative time. Paths below min_fraction of the total
+    are dropped, which keeps the walk bounded on large call graphs.
+    """
+    children: Dict[tuple, List[tuple]] = {}
+    # Time not explained by any recorded caller starts a stack of its own:
+    # true roots, plus frames resumed by the event loop after enable()
+    roots = []
+    for func, (_, _, _, cumulative, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge[3]))
+        unattributed = cumulative - sum(edge[3] for edge in callers.values())
+        if unattributed > 0:
+            roots.append((func, unattributed))
+
+    def label(func) -> str:
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})" if line else name
+
+    threshold = stats.total_tt * min_fraction
+    lines = []
+    emitted: Dict[tuple, float] = {}
+
+    def walk(func, path, path_time):
+        if path_time <= threshold or path_time <= 0:
+            return
+        path = path + [label(func)]
+        _, _, own_time, cumulative, _ = stats.stats[func]
+        share = min(path_time / cumulative, 1.0) if cumulative else 0.0
+        if own_time * share >= 1e-6:
+            lines.append(f"{';'.join(path)} {int(own_time * share * 1_000_000)}")
+            emitted[func] = emitted.get(func, 0.0) + own_time * share
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for child, child_time in children.get(func, ()):
+            if label(child) not in path:
+                walk(child, path, child_time * share)
+
+    for root, root_time in roots:
+        walk(root, [], root_time)
+
+    # Coroutine resumption forms caller cycles with no unexplained entry
+    # point; hang the remaining own time under each function's heaviest
+    # caller chain so the totals still add up
+    for func, (_, _, own_time, _, callers) in stats.stats.items():
+        leftover = own_time - emitted.get(func, 0.0)
+        if leftover <= threshold:
+            continue
+        path, seen, current = [label(func)], {func}, callers
+        while current and len(path) < MAX_STACK_DEPTH:
+            caller = max(current, key=lambda key: current[key][3])
+            if caller in seen:
+                break
+            seen.add(caller)
+            path.append(label(caller))
+            current = stats.stats[caller][4] if caller in stats.stats else None
+        lines.append(f"{';'.join(reversed(path))} {int(leftover * 1_000_000)}")
+    return lines
+
+
+class ProfileStore:
+    """Directory of captured profiles, pruned to the newest `keep`"""
+
+    def __init__(self, directory: str, keep: int = 200):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, profiles: List[cProfile.Profile], meta: Dict[str, Any]) -> str:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", meta["route"]).strip("_") or "root"
+        profile_id = f"{int(time.time() * 1000)}-{meta['method']}-{slug}"
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, profile_id)
+            stats.dump_stats(base + ".prof")
+            with open(base + ".collapsed", "w") as handle:
+                handle.write("\n".join(collapsed_stacks(stats)) + "\n")
+            with open(base + ".json", "w") as handle:
+                json.dump({"id": profile_id, **meta}, handle)
+            self._prune()
+        return profile_id
+
+    def slowest(self, limit: int = 20) -> List[Dict[str, Any]]:
+        entries = []
+        for name in self._metadata_files():
+            try:
+                with open(os.path.join(self.directory, name)) as handle:
+                    entries.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+        entries.sort(key=lambda entry: entry["duration_ms"], reverse=True)
+        return entries[:limit]
+
+    def path(self, profile_id: str, extension: str) -> Optional[str]:
+        """File of a capture, or None for unknown/invalid ids"""
+        if not PROFILE_ID.match(profile_id) or extension not in ("prof", "collapsed"):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{extension}")
+        return path if os.path.isfile(path) else None
+
+    def _metadata_files(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        except FileNotFoundError:
+            return []
+
+    def _prune(self) -> None:
+        # Ids start with a millisecond timestamp, so name order is age order
+        expired = self._metadata_files()[:-self.keep] if self.keep > 0 else []
+        for name in expired:
+            base = os.path.join(self.directory, name[: -len(".json")])
+            for extension in (".json", ".prof", ".collapsed"):
+                try:
+                    os.remove(base + extension)
+                except FileNotFoundError:
+                    pass
+
+
+def profile_sync_endpoints(routes) -> None:
+    """Wrap sync endpoints so a sampled request is also profiled in its worker thread"""
+    for route in routes:
+        if not isinstance(route, APIRoute) or getattr(route.dependant.call, "__profiled__", False):
+            continue
+        call = route.dependant.call
+        if getattr(call, "__code__", None) is not None and call.__code__.co_flags & 0x80:
+            continue  # coroutine function: already covered on the event-loop thread
+
+        @functools.wraps(call)
+        def profiled(*args, __call=call, **kwargs):
+            capture = _current_capture.get()
+            if capture is None:
+                return __call(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ profiles through sys.monitoring, which is
+                # process-wide: the middleware's profiler already sees this thread
+                return __call(*args, **kwargs)
+            capture.thread_profiles.append(profiler)
+            try:
+                return __call(*args, **kwargs)
+            finally:
+                profiler.disable()
+
+        profiled.__profiled__ = True
+        route.dependant.call = profiled
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling a sample of requests (see module docstring)"""
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, header_token: str = ""):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.header_token = header_token.encode()
+        self._busy = threading.Lock()
+
+    def _wants_profile(self, scope) -> bool:
+        if self.header_token:
+            for name, value in scope.get("headers", ()):
+                if name == PROFILE_HEADER and value == self.header_token:
+                    return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        capture = _Capture()
+        token = _current_capture.set(capture)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            _current_capture.reset(token)
+            self._busy.release()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            meta = {
+                "route": route,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status[0],
+                "duration_ms": round(duration * 1000, 3),
+                "captured_at": datetime.now(timezone.utc).isoformat(),
+            }
+            try:
+                # pstats dump and pruning hit the disk; keep them off the event loop
+                await run_in_threadpool(self.store.save, [profiler] + capture.thread_profiles, meta)
+            except OSError:
+                logger.exception("Could not write profile for %s %s", scope["method"], scope["path"])
+
+
+def profiling_enabled() -> bool:
+    return settings.profile_sample_rate > 0 or bool(settings.profile_header_token)
+
+
+profile_store = ProfileStore(settings.profile_dir, settings.profile_keep)
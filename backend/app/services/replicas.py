@@ -0,0 +1,123 @@
+"""
+Read replicas for the read-only endpoints
+DATABASE_REPLICA_URLS lists replicas; get_read_db (app.database) gives the
+read-only routes a session on the next healthy replica, round robin. A
+replica whose connection checkout fails is skipped for REPLICA_RETRY_AFTER
+seconds and the next one is tried, then the primary, so a dead replica
+costs one failed connect per retry period rather than one per request.
+Replica pools always pre-ping, so connections broken by a failover are
+caught at checkout instead of inside the route.
+
+Read-your-writes: the write paths record the session IDs they wrote in
+recent_writes, and reads for a session written in the last
+REPLICA_READ_YOUR_WRITES seconds go to the primary. With CACHE_URL set the
+record is shared by all workers; without it, it is per worker (route a
+session's requests to one worker, or set CACHE_URL).
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.services.cache import CacheBackend, CacheError, cache_keys, shared_cache
+
+logger = logging.getLogger(__name__)
+
+
+def replica_urls(value: str) -> List[str]:
+    return [url.strip() for url in value.split(",") if url.strip()]
+
+
+class ReplicaSet:
+    """Round-robin choice among replicas, skipping ones that recently failed"""
+
+    def __init__(self, urls: List[str], retry_after: float = 10.0):
+        self.urls = urls
+        self.retry_after = retry_after
+        self._down_until = [0.0] * len(urls)
+        self._next = 0
+        self._lock = threading.Lock()
+        # primary_reads: every replica was down; read_your_writes: the session wrote recently
+        self._counters = {"replica_reads": 0, "primary_reads": 0, "read_your_writes": 0, "failovers": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.urls)
+
+    def candidates(self) -> List[int]:
+        """Healthy replica indexes, starting with the next one in rotation"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [index for index, until in enumerate(self._down_until) if until <= now]
+            if not healthy:
+                return []
+            # Rotate over the healthy ones, so a dead replica's share is spread evenly
+            start = self._next % len(healthy)
+            self._next += 1
+            return healthy[start:] + healthy[:start]
+
+    def mark_down(self, index: int, exc: BaseException) -> None:
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry_after
+            self._counters["failovers"] += 1
+        logger.warning("Replica %s unavailable, skipping it for %.0fs: %s", index, self.retry_after, exc)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "replicas": len(self.urls),
+                "healthy": sum(until <= now for until in self._down_until),
+                **self._counters,
+            }
+
+
+class RecentWrites:
+    """Session IDs written in the last `window` seconds (local, plus the shared cache if any)"""
+
+    def __init__(self, window: float = 5.0, shared: Optional[CacheBackend] = None, max_sessions: int = 100_000):
+        self.window = window
+        self.shared = shared
+        self.max_sessions = max_sessions
+        self._written: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, session_ids: Iterable[str]) -> None:
+        if not replica_set.enabled or self.window <= 0:
+            return
+        session_ids = set(session_ids)
+        expires_at = time.monotonic() + self.window
+        with self._lock:
+            for sid in session_ids:
+                self._written[sid] = expires_at
+                self._written.move_to_end(sid)
+            while len(self._written) > self.max_sessions:
+                self._written.popitem(last=False)
+        if self.shared is not None:
+            try:
+                self.shared.set_many(dict.fromkeys(cache_keys("wrote", session_ids), b"1"), self.window)
+            except CacheError:
+                logger.warning("Could not share recent writes; other workers may read replicas for them")
+
+    def recent(self, session_id: str) -> bool:
+        with self._lock:
+            expires_at = self._written.get(session_id)
+            if expires_at is not None and expires_at > time.monotonic():
+                return True
+        if self.shared is None:
+            return False
+        try:
+            return self.shared.get(cache_keys("wrote", [session_id])[0]) is not None
+        except CacheError:
+            # Unknown: the primary is always up to date
+            return True
+
+
+replica_set = ReplicaSet(replica_urls(settings.database_replica_urls), settings.replica_retry_after)
+recent_writes = RecentWrites(settings.replica_read_your_writes, shared_cache)
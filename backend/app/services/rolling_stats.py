@@ -0,0 +1,385 @@
+"""
+Per-session online statistics for every input feature and score
+Each analyzed row updates, in O(1), a Welford mean/variance over the
+session's whole history, an EWMA and a fixed-size rolling window. The
+trend endpoint and the baseline (z-score) mode read these instead of
+rescanning cognitive_metrics. Sessions are kept in an LRU; a session that is
+not in it (new process, evicted) is rebuilt once from its most recent
+`window` rows, so its Welford totals then cover those rows only.
+
+With CACHE_URL set, SharedRollingStats keeps each session's stats in the
+shared cache instead, so every worker updates and reads the same state.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.cognitive import CognitiveMetric
+from app.schemas.cognitive import FEATURE_NAMES, SCORE_NAMES
+from app.services.cache import CacheBackend, CacheError, cache_keys, dumps, loads, off_loop, shared_cache
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+TRACKED_FIELDS = FEATURE_NAMES + SCORE_NAMES
+
+
+class OnlineStat:
+    """Welford mean/variance, EWMA and a rolling window over one series"""
+
+    __slots__ = ("count", "mean", "_m2", "ewma", "last", "_window", "_window_sum")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.ewma = 0.0
+        self.last = 0.0
+        self._window: "deque[float]" = deque(maxlen=window)
+        self._window_sum = 0.0
+
+    def update(self, value: float, alpha: float) -> None:
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.ewma = value if self.count == 1 else alpha * value + (1 - alpha) * self.ewma
+        self.last = value
+        if len(self._window) == self._window.maxlen:
+            self._window_sum -= self._window[0]
+        self._window.append(value)
+        self._window_sum += value
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (0 until there are two values)"""
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    @property
+    def window_mean(self) -> float:
+        return self._window_sum / len(self._window) if self._window else 0.0
+
+    def zscore(self, value: float) -> Optional[float]:
+        std = self.std
+        return (value - self.mean) / std if std > 0 else None
+
+    def to_payload(self) -> list:
+        return [self.count, self.mean, self._m2, self.ewma, self.last, list(self._window)]
+
+    @classmethod
+    def from_payload(cls, payload: list, window: int) -> "OnlineStat":
+        stat = cls(window)
+        stat.count, stat.mean, stat._m2, stat.ewma, stat.last, values = payload
+        stat._window.extend(values)
+        stat._window_sum = sum(stat._window)
+        return stat
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "ewma": self.ewma,
+            "last": self.last,
+            "window_size": len(self._window),
+            "window_mean": self.window_mean,
+        }
+
+
+class SessionStats:
+    """OnlineStat per tracked field for one session"""
+
+    def __init__(self, window: int, alpha: float):
+        self.alpha = alpha
+        self.fields = {name: OnlineStat(window) for name in TRACKED_FIELDS}
+
+    @property
+    def count(self) -> int:
+        return self.fields[SCORE_NAMES[0]].count
+
+    def update(self, row: Mapping[str, Any]) -> None:
+        for name, stat in self.fields.items():
+            stat.update(row[name], self.alpha)
+
+    def to_payload(self) -> Dict[str, list]:
+        return {name: stat.to_payload() for name, stat in self.fields.items()}
+
+    @classmethod
+    def from_payload(cls, payload: Mapping[str, list], window: int, alpha: float) -> "SessionStats":
+        stats = cls(window, alpha)
+        stats.fields = {name: OnlineStat.from_payload(payload[name], window) for name in TRACKED_FIELDS}
+        return stats
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "features": {name: self.fields[name].summary() for name in FEATURE_NAMES},
+            "scores": {name: self.fields[name].summary() for name in SCORE_NAMES},
+        }
+
+
+class RollingStatsStore:
+    """LRU of session_id -> SessionStats"""
+
+    def __init__(self, max_sessions: int = 10000, window: int = 50, alpha: float = 0.1):
+        self.max_sessions = max_sessions
+        self.window = window
+        self.alpha = alpha
+        self._sessions: "OrderedDict[str, SessionStats]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"updates": 0, "evictions": 0, "warmups": 0}
+
+    def update(self, row: Mapping[str, Any]) -> None:
+        """Fold one metric row (features + scores) into its session's stats"""
+        with self._lock:
+            stats = self._session(row["session_id"])
+            stats.update(row)
+            self._counters["updates"] += 1
+
+    def update_many(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        for row in rows:
+            self.update(row)
+
+    def summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            stats = self._sessions.get(session_id)
+            if stats is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return stats.summary()
+
+    def zscores(
+        self, session_id: str, values: Mapping[str, float], min_count: int
+    ) -> Dict[str, Optional[float]]:
+        """z-score of each value against the session's history so far"""
+        with self._lock:
+            stats = self._sessions.get(session_id)
+            if stats is None or stats.count < min_count:
+                return {name: None for name in values}
+            return {name: stats.fields[name].zscore(value) for name, value in values.items()}
+
+    def missing(self, session_ids: Iterable[str]) -> List[str]:
+        with self._lock:
+            return [sid for sid in set(session_ids) if sid not in self._sessions]
+
+    def warm(self, session_id: str, rows_oldest_first: Iterable[Mapping[str, Any]]) -> Optional[SessionStats]:
+        """Rebuild a session missing from the store from its stored rows"""
+        with self._lock:
+            stats = self._sessions.get(session_id)
+            if stats is not None:
+                return stats
+            fresh = SessionStats(self.window, self.alpha)
+            for row in rows_oldest_first:
+                fresh.update(row)
+            if not fresh.count:
+                return None
+            self._counters["warmups"] += 1
+            self._insert(session_id, fresh)
+            return fresh
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "window": self.window,
+                "alpha": self.alpha,
+                **self._counters,
+            }
+
+    def _session(self, session_id: str) -> SessionStats:
+        stats = self._sessions.get(session_id)
+        if stats is None:
+            stats = SessionStats(self.window, self.alpha)
+            self._insert(session_id, stats)
+        else:
+            self._sessions.move_to_end(session_id)
+        return stats
+
+    def _insert(self, session_id: str, stats: SessionStats) -> None:
+        self._sessions[session_id] = stats
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._counters["evictions"] += 1
+
+
+class SharedRollingStats:
+    """
+    RollingStatsStore API over a shared CacheBackend: one encoded
+    SessionStats per session, refreshed to the TTL on every update
+    Updates are read-modify-write (one multi-get and one pipelined set per
+    batch); two workers updating the same session at the same instant keep
+    only one of the two rows, which sessions written by one client at a
+    time do not do. Sessions this worker touched recently are remembered
+    locally, so the warm-up check does not cost a round trip per request.
+    """
+
+    # Seconds a locally seen session is assumed to be in the shared cache
+    PRESENT_TTL = 60.0
+
+    def __init__(
+        self, backend: CacheBackend, window: int = 50, alpha: float = 0.1, ttl: float = 3600.0,
+        max_present: int = 100_000,
+    ):
+        self.backend = backend
+        self.window = window
+        self.alpha = alpha
+        self.ttl = ttl
+        self.max_present = max_present
+        self._present: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"updates": 0, "warmups": 0, "errors": 0}
+
+    def update(self, row: Mapping[str, Any]) -> None:
+        self.update_many([row])
+
+    def update_many(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        by_session: Dict[str, List[Mapping[str, Any]]] = defaultdict(list)
+        for row in rows:
+            by_session[row["session_id"]].append(row)
+        if not by_session:
+            return
+        keys = cache_keys("rolling", by_session)
+        try:
+            blobs = self.backend.get_many(keys)
+            items = {}
+            for key, blob, session_rows in zip(keys, blobs, by_session.values()):
+                stats = self._decode(blob) or SessionStats(self.window, self.alpha)
+                for row in session_rows:
+                    stats.update(row)
+                items[key] = dumps("rolling", stats.to_payload())
+            self.backend.set_many(items, self.ttl)
+        except CacheError:
+            self._count("errors")
+            return
+        self._mark_present(by_session)
+        self._count("updates", sum(len(session_rows) for session_rows in by_session.values()))
+
+    def summary(self, session_id: str) -> Optional[Dict[str, Any]]:
+        stats = self._get(session_id)
+        return None if stats is None else stats.summary()
+
+    def zscores(
+        self, session_id: str, values: Mapping[str, float], min_count: int
+    ) -> Dict[str, Optional[float]]:
+        stats = self._get(session_id)
+        if stats is None or stats.count < min_count:
+            return {name: None for name in values}
+        return {name: stats.fields[name].zscore(value) for name, value in values.items()}
+
+    def missing(self, session_ids: Iterable[str]) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            unseen = [sid for sid in set(session_ids) if self._present.get(sid, 0.0) <= now]
+        if not unseen:
+            return []
+        try:
+            blobs = self.backend.get_many(cache_keys("rolling", unseen))
+        except CacheError:
+            # Rebuilding from the database cannot be stored either
+            self._count("errors")
+            return []
+        self._mark_present([sid for sid, blob in zip(unseen, blobs) if blob is not None])
+        return [sid for sid, blob in zip(unseen, blobs) if blob is None]
+
+    def warm(self, session_id: str, rows_oldest_first: Iterable[Mapping[str, Any]]) -> Optional[SessionStats]:
+        """Store stats rebuilt from rows unless another worker stored them first"""
+        fresh = SessionStats(self.window, self.alpha)
+        for row in rows_oldest_first:
+            fresh.update(row)
+        if not fresh.count:
+            return None
+        try:
+            if self.backend.add(cache_keys("rolling", [session_id])[0], dumps("rolling", fresh.to_payload()), self.ttl):
+                self._count("warmups")
+        except CacheError:
+            self._count("errors")
+            return fresh
+        self._mark_present([session_id])
+        return fresh
+
+    def clear(self) -> None:
+        """Forget which sessions this worker has seen (shared entries expire by TTL)"""
+        with self._lock:
+            self._present.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "present_sessions": len(self._present),
+                "window": self.window,
+                "alpha": self.alpha,
+                "ttl": self.ttl,
+                **self._counters,
+            }
+
+    def _get(self, session_id: str) -> Optional[SessionStats]:
+        try:
+            return self._decode(self.backend.get(cache_keys("rolling", [session_id])[0]))
+        except CacheError:
+            self._count("errors")
+            return None
+
+    def _decode(self, blob: Optional[bytes]) -> Optional[SessionStats]:
+        payload = loads("rolling", blob)
+        return None if payload is None else SessionStats.from_payload(payload, self.window, self.alpha)
+
+    def _mark_present(self, session_ids: Iterable[str]) -> None:
+        expires_at = time.monotonic() + self.PRESENT_TTL
+        with self._lock:
+            for sid in session_ids:
+                self._present[sid] = expires_at
+                self._present.move_to_end(sid)
+            while len(self._present) > self.max_present:
+                self._present.popitem(last=False)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+
+def _recent_rows_statement(session_id: str, limit: int):
+    columns = [getattr(CognitiveMetric, name) for name in TRACKED_FIELDS]
+    return select(*columns).where(
+        CognitiveMetric.session_id == session_id
+    ).order_by(CognitiveMetric.timestamp.desc(), CognitiveMetric.id.desc()).limit(limit)
+
+
+def warm_sessions(db: Session, session_ids: Iterable[str]) -> None:
+    """Load stats for sessions not in the store from their last `window` rows"""
+    for sid in rolling_stats.missing(session_ids):
+        rows = db.execute(_recent_rows_statement(sid, rolling_stats.window)).mappings().all()
+        rolling_stats.warm(sid, reversed(rows))
+
+
+async def warm_sessions_async(db: "AsyncSession", session_ids: Iterable[str]) -> None:
+    for sid in await off_loop(rolling_stats.missing, list(session_ids)):
+        rows = (await db.execute(_recent_rows_statement(sid, rolling_stats.window))).mappings().all()
+        await off_loop(rolling_stats.warm, sid, rows[::-1])
+
+
+if shared_cache is not None:
+    rolling_stats = SharedRollingStats(
+        shared_cache,
+        settings.rolling_stats_window,
+        settings.rolling_stats_alpha,
+        settings.cache_ttl,
+    )
+else:
+    rolling_stats = RollingStatsStore(
+        settings.rolling_stats_max_sessions,
+        settings.rolling_stats_window,
+        settings.rolling_stats_alpha,
+    )
@@ -0,0 +1,235 @@
+"""
+Minute/hour/day rollups of the cognitive scores
+Every insert path folds its new rows into the three rollup tables in the
+same transaction (aggregated in memory first, then one upsert per table),
+and the series endpoint reads the coarsest rollup that still has enough
+buckets for the requested number of points.
+
+Rebuild the rollups from the full cognitive_metrics history (run from backend/):
+  python -m app.services.rollups --rebuild
+"""
+import argparse
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.orm import Session
+
+from app.lazy import lazy_module
+from app.models.cognitive import CognitiveMetric, DayRollup, HourRollup, MinuteRollup
+from app.schemas.cognitive import SCORE_NAMES
+from app.services.downsample import lttb
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+np = lazy_module("numpy")
+
+# Finest to coarsest
+RESOLUTIONS = OrderedDict([
+    ("minute", (MinuteRollup, timedelta(minutes=1))),
+    ("hour", (HourRollup, timedelta(hours=1))),
+    ("day", (DayRollup, timedelta(days=1))),
+])
+
+REBUILD_BATCH_SIZE = 5000
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def bucket_start(timestamp: datetime, resolution: str) -> datetime:
+    timestamp = as_utc(timestamp)
+    if resolution == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate_rows(rows: Iterable[Mapping[str, Any]], resolution: str) -> List[Dict[str, Any]]:
+    """Rollup rows (count, min/max/sum per score) for the given metric rows"""
+    buckets: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["session_id"], bucket_start(row["timestamp"], resolution))
+        agg = buckets.get(key)
+        if agg is None:
+            agg = buckets[key] = {"session_id": key[0], "bucket": key[1], "count": 0}
+            for name in SCORE_NAMES:
+                agg[f"{name}_min"] = agg[f"{name}_max"] = row[name]
+                agg[f"{name}_sum"] = 0.0
+        agg["count"] += 1
+        for name in SCORE_NAMES:
+            value = row[name]
+            agg[f"{name}_min"] = min(agg[f"{name}_min"], value)
+            agg[f"{name}_max"] = max(agg[f"{name}_max"], value)
+            agg[f"{name}_sum"] += value
+    # Sorted so concurrent transactions lock rollup rows in the same order
+    return [buckets[key] for key in sorted(buckets)]
+
+
+def _upsert_statement(dialect: str, model):
+    """INSERT ... ON CONFLICT DO UPDATE merging into existing buckets, or None"""
+    # Dialect insert constructs are imported on use, like the dialects themselves
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        stmt, least, greatest = pg_insert(model), func.least, func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        # Two-argument min()/max() are SQLite's scalar least/greatest
+        stmt, least, greatest = sqlite_insert(model), func.min, func.max
+    else:
+        return None
+    excluded = stmt.excluded
+    merged = {"count": model.count + excluded.count}
+    for name in SCORE_NAMES:
+        low, high, total = f"{name}_min", f"{name}_max", f"{name}_sum"
+        merged[low] = least(getattr(model, low), getattr(excluded, low))
+        merged[high] = greatest(getattr(model, high), getattr(excluded, high))
+        merged[total] = getattr(model, total) + getattr(excluded, total)
+    return stmt.on_conflict_do_update(index_elements=["session_id", "bucket"], set_=merged)
+
+
+def _merge_into(existing, agg: Dict[str, Any]) -> None:
+    existing.count += agg["count"]
+    for name in SCORE_NAMES:
+        low, high, total = f"{name}_min", f"{name}_max", f"{name}_sum"
+        setattr(existing, low, min(getattr(existing, low), agg[low]))
+        setattr(existing, high, max(getattr(existing, high), agg[high]))
+        setattr(existing, total, getattr(existing, total) + agg[total])
+
+
+def apply_rollups(db: Session, rows: List[Mapping[str, Any]]) -> None:
+    """Fold freshly inserted metric rows into every rollup table (caller commits)"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    for resolution, (model, _) in RESOLUTIONS.items():
+        aggregates = aggregate_rows(rows, resolution)
+        stmt = _upsert_statement(dialect, model)
+        if stmt is not None:
+            db.execute(stmt, aggregates)
+            continue
+        for agg in aggregates:
+            existing = db.get(model, (agg["session_id"], agg["bucket"]))
+            if existing is None:
+                db.add(model(**agg))
+            else:
+                _merge_into(existing, agg)
+        db.flush()
+
+
+async def apply_rollups_async(db: "AsyncSession", rows: List[Mapping[str, Any]]) -> None:
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    for resolution, (model, _) in RESOLUTIONS.items():
+        aggregates = aggregate_rows(rows, resolution)
+        stmt = _upsert_statement(dialect, model)
+        if stmt is not None:
+            await db.execute(stmt, aggregates)
+            continue
+        for agg in aggregates:
+            existing = await db.get(model, (agg["session_id"], agg["bucket"]))
+            if existing is None:
+                db.add(model(**agg))
+            else:
+                _merge_into(existing, agg)
+        await db.flush()
+
+
+def choose_resolution(start: datetime, end: datetime, points: int) -> Optional[str]:
+    """Coarsest rollup with at least `points` buckets in the span; None means raw rows"""
+    span = end - start
+    for resolution, (_, width) in reversed(RESOLUTIONS.items()):
+        if span / width >= points:
+            return resolution
+    return None
+
+
+def series_statement(session_id: str, resolution: Optional[str], start: datetime, end: datetime):
+    """(timestamp, count, then min/mean/max per score) rows in time order"""
+    if resolution is None:
+        columns = [CognitiveMetric.timestamp, literal(1).label("count")]
+        for name in SCORE_NAMES:
+            column = getattr(CognitiveMetric, name)
+            columns += [column.label(f"{name}_min"), column.label(f"{name}_mean"), column.label(f"{name}_max")]
+        return select(*columns).where(
+            CognitiveMetric.session_id == session_id,
+            CognitiveMetric.timestamp >= start,
+            CognitiveMetric.timestamp < end,
+        ).order_by(CognitiveMetric.timestamp, CognitiveMetric.id)
+
+    model = RESOLUTIONS[resolution][0]
+    columns = [model.bucket.label("timestamp"), model.count]
+    for name in SCORE_NAMES:
+        columns += [
+            getattr(model, f"{name}_min"),
+            (getattr(model, f"{name}_sum") / model.count).label(f"{name}_mean"),
+            getattr(model, f"{name}_max"),
+        ]
+    return select(*columns).where(
+        model.session_id == session_id,
+        model.bucket >= bucket_start(start, resolution),
+        model.bucket < end,
+    ).order_by(model.bucket)
+
+
+def downsample_series(rows: List[Mapping[str, Any]], points: int) -> Dict[str, List[Dict[str, Any]]]:
+    """LTTB each score's mean series (from series_statement rows) down to `points`"""
+    if not rows:
+        return {name: [] for name in SCORE_NAMES}
+    x = np.array([as_utc(row["timestamp"]).timestamp() for row in rows])
+    series = {}
+    for name in SCORE_NAMES:
+        means = np.array([row[f"{name}_mean"] for row in rows], dtype=float)
+        series[name] = [
+            {
+                "timestamp": rows[i]["timestamp"],
+                "count": rows[i]["count"],
+                "min": rows[i][f"{name}_min"],
+                "mean": rows[i][f"{name}_mean"],
+                "max": rows[i][f"{name}_max"],
+            }
+            for i in lttb(x, means, points)
+        ]
+    return series
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute every rollup table from cognitive_metrics; returns rows folded in"""
+    for model, _ in RESOLUTIONS.values():
+        db.execute(delete(model))
+    columns = [CognitiveMetric.session_id, CognitiveMetric.timestamp] + [
+        getattr(CognitiveMetric, name) for name in SCORE_NAMES
+    ]
+    stmt = select(*columns).order_by(CognitiveMetric.id).execution_options(yield_per=REBUILD_BATCH_SIZE)
+    total = 0
+    for partition in db.execute(stmt).mappings().partitions():
+        apply_rollups(db, partition)
+        total += len(partition)
+    db.commit()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the score rollup tables")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all rollups from cognitive_metrics")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do (use --rebuild)")
+
+    from app.database import new_session
+
+    session = new_session()
+    try:
+        print(f"Rebuilt rollups from {rebuild_rollups(session)} metric rows")
+    finally:
+        session.close()
@@ -0,0 +1,404 @@
+"""
+Declarative scoring spec - weights, ranges and thresholds for all six scores
+The spec is compiled once into a fused evaluator: every shared term (e.g. the
+normalized flight time used by load, risk and heat) is computed a single time
+per evaluation, and the same plan runs on scalars or NumPy columns.
+
+Dump the built-in spec as a starting point for a custom spec file:
+  python -m app.services.scoring_spec > scoring_spec.json
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from app.lazy import lazy_module
+from app.schemas.cognitive import FEATURE_NAMES, SCORE_NAMES
+from app.services.features import (
+    HIGH_ERROR_THRESHOLD,
+    CORRECTION_PENALTY_MULTIPLIER,
+    OPTIMAL_DWELL_TIME,
+)
+
+# Only the batch (vector) path needs NumPy
+np = lazy_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Terms reference input features, other terms or (already computed) scores by
+# name. Score weights are applied left to right, matching the original
+# hand-written formulas operation for operation (test_scoring_spec.py keeps
+# them as the golden reference).
+DEFAULT_SCORING_SPEC: Dict[str, Any] = {
+    "terms": {
+        "flight_norm": {"op": "normalize", "of": "avg_flight_time", "range": [50, 300]},
+        "speed": {"op": "invert", "of": "flight_norm"},
+        "dwell_norm": {"op": "normalize", "of": "avg_dwell_time", "range": [50, 200]},
+        "dwell_instability": {"op": "deviation", "of": "avg_dwell_time", "center": OPTIMAL_DWELL_TIME},
+        "pause_norm": {"op": "normalize", "of": "pause_count", "range": [0, 10]},
+        "pause_duration_norm": {"op": "normalize", "of": "avg_pause_duration", "range": [2000, 10000]},
+        "load_pause": {
+            "op": "select",
+            "when": [["pause_count", ">", 0]],
+            "then": "pause_relief",
+            "else": 0.8,
+        },
+        "pause_relief": {"op": "invert", "of": "pause_duration_norm"},
+        "sentiment_factor": {"op": "reflect", "of": "sentiment_score", "offset": 1, "divisor": 2},
+        "recklessness": {"op": "damp", "of": "error_rate", "by": "correction_rate", "per": 1},
+        "rush_rate": {"op": "damp", "of": "text_length", "by": "avg_pause_duration", "per": 1000},
+        "rush_score": {"op": "normalize", "of": "rush_rate", "range": [0, 100]},
+        "pause_heat": {
+            "op": "select",
+            "when": [["pause_count", "==", 0]],
+            "then": 0.9,
+            "else": "pause_calm",
+        },
+        "pause_calm": {"op": "invert", "of": "pause_norm"},
+        "typing_intensity": {"op": "normalize", "of": "text_length", "range": [0, 500]},
+        "sentiment_magnitude": {"op": "abs", "of": "sentiment_score"},
+        "sentiment_rage": {
+            "op": "select",
+            "when": [["sentiment_score", "<", 0]],
+            "then": "sentiment_magnitude",
+            "else": 0,
+        },
+        "error_penalty": {"op": "scale", "of": "error_rate", "by": CORRECTION_PENALTY_MULTIPLIER},
+        "frustration": {
+            "op": "select",
+            "when": [
+                ["error_rate", ">", HIGH_ERROR_THRESHOLD],
+                ["correction_rate", "<", "error_penalty"],
+            ],
+            "then": 0.8,
+            "else": "error_penalty",
+        },
+        "heat_amplification": {"op": "scale", "of": "heat", "by": 0.5},
+    },
+    "scores": {
+        "cognitive_load": {
+            "weights": [["speed", 0.4], ["error_rate", 0.4], ["load_pause", 0.2]],
+        },
+        "mood_drift": {
+            "weights": [["sentiment_factor", 0.5], ["error_rate", 0.3], ["dwell_norm", 0.2]],
+        },
+        "decision_stability": {
+            "weights": [["correction_rate", 0.5], ["pause_norm", 0.3], ["dwell_instability", 0.2]],
+            "invert": True,
+        },
+        "risk_volatility": {
+            "weights": [["speed", 0.4], ["recklessness", 0.4], ["rush_score", 0.2]],
+        },
+        "heat": {
+            "weights": [
+                ["speed", 0.35],
+                ["dwell_norm", 0.25],
+                ["pause_heat", 0.25],
+                ["typing_intensity", 0.15],
+            ],
+        },
+        "rage": {
+            "weights": [
+                ["error_rate", 0.30],
+                ["sentiment_rage", 0.30],
+                ["frustration", 0.20],
+                ["dwell_instability", 0.10],
+                ["heat_amplification", 0.10],
+            ],
+        },
+    },
+}
+
+
+class ScoringSpecError(ValueError):
+    """Raised when a scoring spec cannot be compiled"""
+
+
+_COMPARISONS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "==": lambda a, b: a == b,
+}
+
+# Operand: either ("ref", name) or ("const", value)
+Operand = Tuple[str, Any]
+
+
+def _scalar_normalize(x, lo, hi):
+    if hi == lo:
+        return 0.5
+    return max(0.0, min(1.0, (x - lo) / (hi - lo)))
+
+
+def _vector_normalize(x, lo, hi):
+    if hi == lo:
+        return np.full(np.shape(x), 0.5)
+    return np.clip((x - lo) / (hi - lo), 0.0, 1.0)
+
+
+# op -> (scalar implementation, vector implementation); each takes the
+# resolved operand values followed by the op's numeric parameters
+_OPS: Dict[str, Tuple[Callable, Callable]] = {
+    "normalize": (_scalar_normalize, _vector_normalize),
+    "invert": (lambda x: 1 - x, lambda x: 1 - x),
+    "scale": (lambda x, k: x * k, lambda x, k: x * k),
+    "abs": (abs, lambda x: np.abs(x)),
+    "reflect": (lambda x, offset, divisor: (offset - x) / divisor,
+                lambda x, offset, divisor: (offset - x) / divisor),
+    "damp": (lambda x, y, per: x / (1 + y / per), lambda x, y, per: x / (1 + y / per)),
+    "deviation": (lambda x, c: min(1.0, abs(x - c) / c),
+                  lambda x, c: np.minimum(1.0, np.abs(x - c) / c)),
+}
+
+# op -> (operand keys, parameter keys)
+_OP_SIGNATURES = {
+    "normalize": (("of",), ("range",)),
+    "invert": (("of",), ()),
+    "scale": (("of",), ("by",)),
+    "abs": (("of",), ()),
+    "reflect": (("of",), ("offset", "divisor")),
+    "damp": (("of", "by"), ("per",)),
+    "deviation": (("of",), ("center",)),
+}
+
+
+class ScoringEvaluator:
+    """Compiled scoring plan: one step per term/score, in dependency order"""
+
+    def __init__(self, steps: List[Tuple[str, Callable, Callable]]):
+        self._steps = steps
+
+    def evaluate(self, features: Mapping[str, float]) -> Dict[str, float]:
+        """Score a single window; returns the six scores as floats"""
+        values = {name: features[name] for name in FEATURE_NAMES}
+        for name, scalar_fn, _ in self._steps:
+            values[name] = scalar_fn(values)
+        return {name: values[name] for name in SCORE_NAMES}
+
+    def evaluate_batch(self, columns: Mapping[str, Any]) -> "Dict[str, np.ndarray]":
+        """Score a struct-of-arrays in one pass; returns one float64 array per score"""
+        values = {name: np.asarray(columns[name], dtype=np.float64) for name in FEATURE_NAMES}
+        # A length-1 column would otherwise broadcast silently against the rest
+        lengths = {name: values[name].shape for name in FEATURE_NAMES}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"Feature columns differ in length: {lengths}")
+        for name, _, vector_fn in self._steps:
+            values[name] = vector_fn(values)
+        return {name: values[name] for name in SCORE_NAMES}
+
+
+def _operand(value: Any) -> Operand:
+    if isinstance(value, str):
+        return ("ref", value)
+    if _is_number(value):
+        return ("const", value)
+    raise ScoringSpecError(f"Invalid operand {value!r}")
+
+
+def _resolver(operand: Operand) -> Callable[[Dict[str, Any]], Any]:
+    kind, value = operand
+    if kind == "ref":
+        return lambda values: values[value]
+    return lambda values: value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _compile_term(name: str, term: Mapping[str, Any]) -> Tuple[List[str], Callable, Callable]:
+    if not isinstance(term, Mapping):
+        raise ScoringSpecError(f"Term {name!r}: must be an object")
+    op = term.get("op")
+    if op == "select":
+        return _compile_select(name, term)
+    if op not in _OP_SIGNATURES:
+        raise ScoringSpecError(f"Term {name!r}: unknown op {op!r}")
+
+    operand_keys, param_keys = _OP_SIGNATURES[op]
+    try:
+        operands = [_operand(term[key]) for key in operand_keys]
+        params: List[Any] = []
+        for key in param_keys:
+            params.extend(term[key] if key == "range" and isinstance(term[key], list) else [term[key]])
+    except KeyError as exc:
+        raise ScoringSpecError(f"Term {name!r}: missing {exc.args[0]!r}") from None
+    if op == "normalize" and len(params) != 2:
+        raise ScoringSpecError(f"Term {name!r}: range must be [min, max]")
+    if not all(_is_number(param) for param in params):
+        raise ScoringSpecError(f"Term {name!r}: {', '.join(param_keys)} must be numeric")
+
+    scalar_op, vector_op = _OPS[op]
+    getters = [_resolver(operand) for operand in operands]
+    deps = [value for kind, value in operands if kind == "ref"]
+
+    def scalar_fn(values):
+        return scalar_op(*[get(values) for get in getters], *params)
+
+    def vector_fn(values):
+        return vector_op(*[get(values) for get in getters], *params)
+
+    return deps, scalar_fn, vector_fn
+
+
+def _compile_select(name: str, term: Mapping[str, Any]) -> Tuple[List[str], Callable, Callable]:
+    try:
+        conditions = [
+            (_resolver(_operand(left)), _COMPARISONS[cmp], _resolver(_operand(right)), left, right)
+            for left, cmp, right in term["when"]
+        ]
+        then_operand, else_operand = _operand(term["then"]), _operand(term["else"])
+    except (KeyError, TypeError) as exc:
+        raise ScoringSpecError(f"Term {name!r}: invalid select ({exc})") from None
+    except ValueError as exc:
+        raise ScoringSpecError(f"Term {name!r}: {exc}") from None
+
+    get_then, get_else = _resolver(then_operand), _resolver(else_operand)
+    deps = [v for _, _, _, left, right in conditions for v in (left, right) if isinstance(v, str)]
+    deps += [value for kind, value in (then_operand, else_operand) if kind == "ref"]
+
+    def scalar_fn(values):
+        for get_left, compare, get_right, _, _ in conditions:
+            if not compare(get_left(values), get_right(values)):
+                return get_else(values)
+        return get_then(values)
+
+    def vector_fn(values):
+        mask = np.ones(np.shape(values[FEATURE_NAMES[0]]), dtype=bool)
+        for get_left, compare, get_right, _, _ in conditions:
+            mask &= compare(get_left(values), get_right(values))
+        return np.where(mask, get_then(values), get_else(values))
+
+    return deps, scalar_fn, vector_fn
+
+
+def _compile_score(name: str, score: Mapping[str, Any]) -> Tuple[List[str], Callable, Callable]:
+    if not isinstance(score, Mapping):
+        raise ScoringSpecError(f"Score {name!r}: must be an object")
+    try:
+        weights = [(str(ref), float(weight)) for ref, weight in score["weights"]]
+    except (KeyError, TypeError, ValueError):
+        raise ScoringSpecError(f"Score {name!r}: weights must be [[term, weight], ...]") from None
+    if not weights:
+        raise ScoringSpecError(f"Score {name!r}: no weights")
+    invert = bool(score.get("invert", False))
+
+    def weighted_sum(values):
+        ref, weight = weights[0]
+        total = weight * values[ref]
+        for ref, weight in weights[1:]:
+            total = total + weight * values[ref]
+        return 1 - total if invert else total
+
+    def scalar_fn(values):
+        return max(0.0, min(1.0, weighted_sum(values)))
+
+    def vector_fn(values):
+        return np.clip(weighted_sum(values), 0.0, 1.0)
+
+    return [ref for ref, _ in weights], scalar_fn, vector_fn
+
+
+def compile_spec(spec: Mapping[str, Any]) -> ScoringEvaluator:
+    """Validate a spec and order its terms/scores into a single-pass plan"""
+    if not isinstance(spec, Mapping):
+        raise ScoringSpecError("Spec must be an object")
+    terms = spec.get("terms", {})
+    scores = spec.get("scores", {})
+    if not isinstance(terms, Mapping) or not isinstance(scores, Mapping):
+        raise ScoringSpecError("terms and scores must be objects keyed by name")
+    missing = [name for name in SCORE_NAMES if name not in scores]
+    if missing:
+        raise ScoringSpecError(f"Spec is missing scores: {', '.join(missing)}")
+    for name in list(terms) + list(scores):
+        if name in FEATURE_NAMES:
+            raise ScoringSpecError(f"{name!r} shadows an input feature")
+    overlap = set(terms) & set(scores)
+    if overlap:
+        raise ScoringSpecError(f"Names used as both term and score: {', '.join(sorted(overlap))}")
+
+    compiled = {name: _compile_term(name, term) for name, term in terms.items()}
+    compiled.update({name: _compile_score(name, score) for name, score in scores.items()})
+
+    steps: List[Tuple[str, Callable, Callable]] = []
+    done = set(FEATURE_NAMES)
+    visiting = set()
+
+    def visit(name: str) -> None:
+        if name in done:
+            return
+        if name not in compiled:
+            raise ScoringSpecError(f"Unknown reference {name!r}")
+        if name in visiting:
+            raise ScoringSpecError(f"Cycle through {name!r}")
+        visiting.add(name)
+        deps, scalar_fn, vector_fn = compiled[name]
+        for dep in deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        steps.append((name, scalar_fn, vector_fn))
+
+    for name in SCORE_NAMES:
+        visit(name)
+    evaluator = ScoringEvaluator(steps)
+    # Well-formed but unusable (a zero divisor, a string compared to a
+    # number): fail here rather than on the first request
+    try:
+        evaluator.evaluate(dict.fromkeys(FEATURE_NAMES, 0.0))
+    except (ArithmeticError, TypeError) as exc:
+        raise ScoringSpecError(f"Spec fails on an all-zero window: {exc!r}") from None
+    return evaluator
+
+
+class ScoringSpecLoader:
+    """
+    Serves the compiled evaluator, hot-reloading a JSON spec file on change
+    The file's mtime is checked at most once per reload_interval seconds;
+    a spec that fails to load keeps the previous evaluator in service.
+    """
+
+    def __init__(self, path: str = "", reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._evaluator = compile_spec(DEFAULT_SCORING_SPEC)
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        if path:
+            self._reload()
+
+    def get(self) -> ScoringEvaluator:
+        if self.path and time.monotonic() >= self._next_check:
+            with self._lock:
+                if time.monotonic() >= self._next_check:
+                    self._reload()
+        return self._evaluator
+
+    def _reload(self) -> None:
+        self._next_check = time.monotonic() + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError as exc:
+            logger.warning("Scoring spec %s unavailable (%s); keeping current spec", self.path, exc)
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                evaluator = compile_spec(json.load(f))
+        except (OSError, ScoringSpecError, ValueError) as exc:
+            # ValueError: the file is not valid JSON (or not UTF-8)
+            logger.error("Invalid scoring spec %s: %s; keeping current spec", self.path, exc)
+        else:
+            self._evaluator = evaluator
+            logger.info("Loaded scoring spec from %s", self.path)
+        self._mtime = mtime
+
+
+if __name__ == "__main__":
+    print(json.dumps(DEFAULT_SCORING_SPEC, indent=2))
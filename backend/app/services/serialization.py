@@ -0,0 +1,56 @@
+"""
+Fast paths for returning stored metric rows
+History reads select only the requested columns and encode the row tuples
+directly with orjson, instead of loading ORM objects and validating each
+through CognitiveMetricResponse. Output matches the pydantic encoding
+(ISO datetimes, UTC as "Z"), so clients see the same JSON either way.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+from app.models.cognitive import CognitiveMetric
+from app.schemas.cognitive import METRIC_FIELDS
+
+# Always selected: the pagination cursor is built from them
+KEY_FIELDS = ("id", "timestamp")
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """
+    Columns for ?fields=a,b (all of them when empty), in response order
+    Raises ValueError for names that are not CognitiveMetricResponse fields
+    """
+    if not fields:
+        return METRIC_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(METRIC_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    requested.update(KEY_FIELDS)
+    return tuple(name for name in METRIC_FIELDS if name in requested)
+
+
+def metric_columns(fields: Sequence[str]) -> list:
+    return [getattr(CognitiveMetric, name) for name in fields]
+
+
+def row_dicts(rows: Sequence[Sequence[Any]], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def columnar(rows: Sequence[Sequence[Any]], fields: Sequence[str]) -> Dict[str, list]:
+    """{"field": [values...]} arrays, one per selected column"""
+    if not rows:
+        return {name: [] for name in fields}
+    return {name: list(values) for name, values in zip(fields, zip(*rows))}
+
+
+def metrics_payload(rows: Sequence[Sequence[Any]], fields: Sequence[str], layout: str):
+    return columnar(rows, fields) if layout == "columnar" else row_dicts(rows, fields)
@@ -0,0 +1,164 @@
+"""
+Session bookkeeping shared by the analyze paths
+Known session IDs are cached in-process so the sessions table is only
+touched once per new session; creation is an idempotent upsert, which also
+removes the check-then-insert race on the unique session_id index.
+With CACHE_URL set, local misses are checked against the shared cache first,
+so a session one worker created is not upserted again by every other.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.cognitive import Session as SessionModel
+from app.services.cache import CacheBackend, CacheError, cache_keys, off_loop, shared_cache
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def _upsert_statement(dialect: str):
+    """Idempotent multi-row insert for the dialect, or None if it has none"""
+    if dialect == "postgresql":
+        # Imported here: the postgresql dialect package is slow to import and
+        # is already loaded whenever this branch runs
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        return pg_insert(SessionModel).on_conflict_do_nothing(index_elements=["session_id"])
+    if dialect == "sqlite":
+        # INSERT OR IGNORE works on every SQLite version, unlike ON CONFLICT
+        return insert(SessionModel).prefix_with("OR IGNORE")
+    return None
+
+
+def upsert_sessions(db: Session, session_ids: List[str]) -> None:
+    """INSERT ... ON CONFLICT DO NOTHING for each session ID (caller commits)"""
+    rows = [{"session_id": sid} for sid in sorted(session_ids)]
+    stmt = _upsert_statement(db.get_bind().dialect.name)
+    if stmt is not None:
+        db.execute(stmt, rows)
+        return
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(SessionModel), [row])
+        except IntegrityError:
+            pass
+
+
+async def upsert_sessions_async(db: "AsyncSession", session_ids: List[str]) -> None:
+    """Async counterpart of upsert_sessions"""
+    rows = [{"session_id": sid} for sid in sorted(session_ids)]
+    stmt = _upsert_statement(db.get_bind().dialect.name)
+    if stmt is not None:
+        await db.execute(stmt, rows)
+        return
+    for row in rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(SessionModel), [row])
+        except IntegrityError:
+            pass
+
+
+class SessionRegistry:
+    """
+    Bounded LRU (with TTL) of session IDs known to exist in the sessions table
+    Sessions are never deleted, so a local entry cannot go stale; the
+    optional shared backend only saves other workers the upsert.
+    """
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 3600.0, shared: Optional[CacheBackend] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared = shared
+        self._known: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "upserts": 0, "shared_hits": 0, "shared_errors": 0}
+
+    def ensure(self, db: Session, session_ids: Iterable[str]) -> None:
+        """Make sure every session exists; commits only if something was upserted"""
+        unknown = self._unknown(session_ids)
+        if not unknown:
+            return
+        upsert_sessions(db, unknown)
+        db.commit()
+        self._remember(unknown)
+
+    async def ensure_async(self, db: "AsyncSession", session_ids: Iterable[str]) -> None:
+        unknown = await off_loop(self._unknown, list(session_ids))
+        if not unknown:
+            return
+        await upsert_sessions_async(db, unknown)
+        await db.commit()
+        await off_loop(self._remember, unknown)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._known.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._known),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                **self._counters,
+            }
+
+    def _unknown(self, session_ids: Iterable[str]) -> List[str]:
+        unknown = [sid for sid in set(session_ids) if not self._lookup(sid)]
+        if not unknown or self.shared is None:
+            return unknown
+        try:
+            found = self.shared.get_many(cache_keys("session", unknown))
+        except CacheError:
+            self._count("shared_errors")
+            return unknown
+        known = [sid for sid, value in zip(unknown, found) if value is not None]
+        if known:
+            self._remember(known, upserted=False)
+            self._count("shared_hits", len(known))
+        return [sid for sid, value in zip(unknown, found) if value is None]
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def _lookup(self, session_id: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._known.get(session_id)
+            if expires_at is not None and expires_at > now:
+                self._known.move_to_end(session_id)
+                self._counters["hits"] += 1
+                return True
+            if expires_at is not None:
+                del self._known[session_id]
+            self._counters["misses"] += 1
+            return False
+
+    def _remember(self, session_ids: List[str], upserted: bool = True) -> None:
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if upserted:
+                self._counters["upserts"] += len(session_ids)
+            for sid in session_ids:
+                self._known[sid] = expires_at
+                self._known.move_to_end(sid)
+            while len(self._known) > self.max_size:
+                self._known.popitem(last=False)
+        if upserted and self.shared is not None:
+            try:
+                self.shared.set_many(dict.fromkeys(cache_keys("session", session_ids), b"1"), self.ttl)
+            except CacheError:
+                self._count("shared_errors")
+
+
+session_registry = SessionRegistry(settings.session_cache_size, settings.session_cache_ttl, shared_cache)
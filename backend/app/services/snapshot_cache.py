@@ -0,0 +1,260 @@
+"""
+Per-session cache of the newest cognitive_metrics row
+The analyze paths write through it, and /latest plus diary entry creation
+read from it instead of running ORDER BY timestamp DESC LIMIT 1, falling
+back to the database on a miss. Eviction is LRU under a memory budget.
+
+With CACHE_URL set, snapshots live in the shared cache instead (see
+SharedSnapshotCache), so every worker reads the newest row any worker wrote.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.cognitive import CognitiveMetric
+from app.schemas.cognitive import METRIC_FIELDS
+from app.services.cache import (
+    CacheBackend, CacheError, cache_keys, decode_snapshot, encode_snapshot, off_loop, shared_cache
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+
+def _estimate_size(session_id: str, snapshot: Dict[str, Any]) -> int:
+    return (
+        sys.getsizeof(session_id)
+        + sys.getsizeof(snapshot)
+        + sum(sys.getsizeof(value) for value in snapshot.values())
+    )
+
+
+class SnapshotCache:
+    """LRU of session_id -> newest metric snapshot, bounded by approximate bytes"""
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self._counters["hits"] += 1
+            return entry[0]
+
+    def put(self, snapshot: Dict[str, Any]) -> None:
+        """Store a snapshot unless a newer one for the session is already cached"""
+        session_id = snapshot["session_id"]
+        size = _estimate_size(session_id, snapshot)
+        with self._lock:
+            current = self._entries.get(session_id)
+            if current is not None:
+                if _order_key(current[0]) > _order_key(snapshot):
+                    return
+                self._bytes -= current[1]
+            self._entries[session_id] = (snapshot, size)
+            self._entries.move_to_end(session_id)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters["evictions"] += 1
+
+    def put_many(self, snapshots: Iterable[Dict[str, Any]]) -> None:
+        for snapshot in snapshots:
+            self.put(snapshot)
+
+    # Read-through fills: put already keeps the newer of two snapshots
+    fill = put
+
+    def invalidate(self, session_id: Optional[str] = None) -> None:
+        """Drop one session's snapshot, or everything when session_id is None"""
+        with self._lock:
+            self._counters["invalidations"] += 1
+            if session_id is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            entry = self._entries.pop(session_id, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                **self._counters,
+            }
+
+
+class SharedSnapshotCache:
+    """
+    Latest snapshots in a shared CacheBackend, one key per session
+    Write paths overwrite the key after their commit; read-through fills
+    from the database only add a key that is absent, so a fill that read an
+    older row cannot replace a newer snapshot another worker just wrote.
+    invalidate() without a session stamps a flush marker: entries cached
+    before it are treated as misses (and dropped) on their next read, in the
+    same round trip as the lookup. Two workers writing the same session at
+    the same instant can still leave the older of the two rows cached until
+    the next write (or the TTL); sessions are written by one client at a time.
+    """
+
+    FLUSH_KEY = "cognitwin:snapshot-flush"
+
+    def __init__(self, backend: CacheBackend, ttl: float = 3600.0):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0, "writes": 0, "errors": 0}
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        key = cache_keys("snapshot", [session_id])[0]
+        try:
+            blob, flushed_at = self.backend.get_many([key, self.FLUSH_KEY])
+            entry = decode_snapshot(blob)
+            if entry is not None and flushed_at is not None and entry[1] <= float(flushed_at):
+                self.backend.delete(key)
+                entry = None
+        except CacheError:
+            self._count("errors")
+            entry = None
+        self._count("misses" if entry is None else "hits")
+        return None if entry is None else entry[0]
+
+    def put(self, snapshot: Dict[str, Any]) -> None:
+        self.put_many([snapshot])
+
+    def put_many(self, snapshots: Iterable[Dict[str, Any]]) -> None:
+        now = time.time()
+        newest: Dict[str, Dict[str, Any]] = {}
+        for snapshot in snapshots:
+            current = newest.get(snapshot["session_id"])
+            if current is None or _order_key(snapshot) >= _order_key(current):
+                newest[snapshot["session_id"]] = snapshot
+        items = {
+            key: encode_snapshot(snapshot, now)
+            for key, snapshot in zip(cache_keys("snapshot", newest), newest.values())
+        }
+        try:
+            self.backend.set_many(items, self.ttl)
+        except CacheError:
+            # The stale entry would outlive this row: try to drop it instead
+            self._count("errors")
+            self._drop(list(items))
+            return
+        self._count("writes", len(items))
+
+    def fill(self, snapshot: Dict[str, Any]) -> None:
+        key = cache_keys("snapshot", [snapshot["session_id"]])[0]
+        try:
+            self.backend.add(key, encode_snapshot(snapshot, time.time()), self.ttl)
+        except CacheError:
+            self._count("errors")
+
+    def invalidate(self, session_id: Optional[str] = None) -> None:
+        self._count("invalidations")
+        try:
+            if session_id is None:
+                self.backend.set(self.FLUSH_KEY, repr(time.time()).encode(), self.ttl)
+            else:
+                self.backend.delete(*cache_keys("snapshot", [session_id]))
+        except CacheError:
+            self._count("errors")
+            logger.warning("Could not invalidate cached snapshots (session=%s)", session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.backend.name, "ttl": self.ttl, **self._counters}
+
+    def _drop(self, keys) -> None:
+        try:
+            self.backend.delete(*keys)
+        except CacheError:
+            logger.warning("Cache unavailable: %s cached snapshots may be stale until their TTL", len(keys))
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+
+def _order_key(snapshot: Dict[str, Any]):
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    timestamp = snapshot["timestamp"]
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp, snapshot["id"])
+
+
+def snapshot_from_metric(metric: CognitiveMetric) -> Dict[str, Any]:
+    return {name: getattr(metric, name) for name in METRIC_FIELDS}
+
+
+def _latest_metric_statement(session_id: str):
+    return select(CognitiveMetric).where(
+        CognitiveMetric.session_id == session_id
+    ).order_by(CognitiveMetric.timestamp.desc(), CognitiveMetric.id.desc()).limit(1)
+
+
+def _cache_metric(metric: Optional[CognitiveMetric]) -> Optional[Dict[str, Any]]:
+    if metric is None:
+        return None
+    snapshot = snapshot_from_metric(metric)
+    snapshot_cache.fill(snapshot)
+    return snapshot
+
+
+def latest_snapshot(db: Session, session_id: str) -> Optional[Dict[str, Any]]:
+    """Newest metric snapshot for a session: cache first, then the database"""
+    snapshot = snapshot_cache.get(session_id)
+    if snapshot is not None:
+        return snapshot
+    return _cache_metric(db.scalars(_latest_metric_statement(session_id)).first())
+
+
+async def latest_snapshot_async(db: "AsyncSession", session_id: str) -> Optional[Dict[str, Any]]:
+    snapshot = await off_loop(snapshot_cache.get, session_id)
+    if snapshot is not None:
+        return snapshot
+    metric = (await db.scalars(_latest_metric_statement(session_id))).first()
+    return await off_loop(_cache_metric, metric)
+
+
+if shared_cache is not None:
+    snapshot_cache = SharedSnapshotCache(shared_cache, settings.cache_ttl)
+else:
+    snapshot_cache = SnapshotCache(settings.snapshot_cache_max_bytes)
+
+
+# Invalidation hooks: ORM deletes of single rows drop that session's entry;
+# bulk DELETE statements can touch any session, so they clear the cache.
+@event.listens_for(CognitiveMetric, "after_delete")
+def _invalidate_deleted_metric(mapper, connection, target):
+    snapshot_cache.invalidate(target.session_id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_delete(orm_execute_state):
+    if orm_execute_state.is_delete and any(
+        mapper.class_ is CognitiveMetric for mapper in orm_execute_state.all_mappers
+    ):
+        snapshot_cache.invalidate()
@@ -0,0 +1,44 @@
+"""
+Worker startup timing
+Offsets are measured from the start of the app.main import: how long the
+app took to import, how long the lifespan startup (schema init, workers)
+took, and when the first request was answered. Exposed at /internal/startup
+and as cognitwin_startup_* gauges; benchmarks/startup_report.py adds the
+per-module import breakdown.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.awaiting_first_request = True
+        self._marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> None:
+        """Record the offset of a phase; only the first mark of a name counts"""
+        with self._lock:
+            self._marks.setdefault(name, time.perf_counter() - self.started)
+
+    def first_request(self) -> None:
+        self.awaiting_first_request = False
+        self.mark("first_request")
+        logger.info("First request served %.0f ms after import", self._marks["first_request"] * 1000)
+
+    def offset_ms(self, name: str) -> Optional[float]:
+        with self._lock:
+            value = self._marks.get(name)
+        return None if value is None else value * 1000
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            return {f"{name}_ms": value * 1000 for name, value in self._marks.items()}
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,386 @@
+"""
+Storage backends behind the cognitive and diary routes
+STORAGE_BACKEND=sql (default) keeps everything in the database through
+SQLAlchemy; STORAGE_BACKEND=memory keeps it in per-session ring buffers in
+the worker process (app.services.memory_storage) and never opens a database
+connection. Routes get a backend from get_storage / get_read_storage and only
+call the methods of MetricStorage.
+
+With ASYNC_DB the async routes use AsyncSqlStorage (get_async_storage /
+get_async_read_storage), an AsyncMetricStorage: the same methods, awaited,
+built from the same statements and the same post-commit bookkeeping as
+SqlStorage.
+"""
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import Request
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import async_read_session, get_async_sessionmaker, new_session, read_session, uses_replica
+from app.models.cognitive import CognitiveMetric, DiaryEntry
+from app.schemas.cognitive import SCORE_NAMES, DiaryEntryCreate
+from app.services.cache import off_loop
+from app.services.export import aiter_partitions, iter_partitions
+from app.services.pagination import newest_first_page
+from app.services.replicas import recent_writes
+from app.services.rolling_stats import warm_sessions, warm_sessions_async
+from app.services.rollups import apply_rollups, apply_rollups_async, choose_resolution, series_statement
+from app.services.serialization import metric_columns
+from app.services.sessions import session_registry
+from app.services.snapshot_cache import latest_snapshot, latest_snapshot_async, snapshot_cache
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+def cache_newest(rows: List[dict], ids: List[int]) -> None:
+    """Attach inserted ids, cache the newest row of each session and mark the sessions written"""
+    # Rows are in batch order, so the last row per session is its newest
+    newest = {}
+    for row, metric_id in zip(rows, ids):
+        row["id"] = metric_id
+        newest[row["session_id"]] = row
+    snapshot_cache.put_many(newest.values())
+    recent_writes.mark(newest)
+
+
+# Statements shared by SqlStorage and AsyncSqlStorage
+
+def insert_metrics_statement():
+    """Multi-row INSERT returning the new ids in parameter order"""
+    return insert(CognitiveMetric).returning(CognitiveMetric.id, sort_by_parameter_order=True)
+
+
+def session_has_metrics(session_id: str):
+    return select(CognitiveMetric.id).where(CognitiveMetric.session_id == session_id).limit(1)
+
+
+def metrics_page_statement(session_id: str, fields: Sequence[str], limit: int, before: Optional[str]):
+    """Raises ValueError for a bad cursor"""
+    stmt = select(*metric_columns(fields)).where(CognitiveMetric.session_id == session_id)
+    return newest_first_page(stmt, CognitiveMetric, limit, before)
+
+
+def diary_page_statement(session_id: str, limit: int, before: Optional[str]):
+    stmt = select(DiaryEntry).where(DiaryEntry.session_id == session_id)
+    return newest_first_page(stmt, DiaryEntry, limit, before)
+
+
+def diary_entry_values(entry_data: DiaryEntryCreate, latest_metric: dict) -> Dict[str, Any]:
+    """Column values of a diary entry carrying a snapshot of the session's latest scores"""
+    values = {
+        "session_id": entry_data.session_id,
+        "mood_rating": entry_data.mood_rating,
+        "mood_notes": entry_data.mood_notes,
+        "is_crisis": entry_data.is_crisis,
+        "timestamp": datetime.now(timezone.utc),
+    }
+    values.update({name: latest_metric[name] for name in SCORE_NAMES})
+    return values
+
+
+class MetricStorage(ABC):
+    """
+    What the routes need from storage. Metric rows are dicts of the
+    cognitive_metrics columns; history rows are tuples in `fields` order with
+    .id and .timestamp attributes (for the pagination cursor); diary entries
+    are objects with the DiaryEntryResponse attributes.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def add_metrics(self, rows: List[dict]) -> None:
+        """Persist rows (in order), setting row["id"] on each"""
+
+    @abstractmethod
+    def warm_stats(self, session_ids: Sequence[str]) -> None:
+        """Load rolling stats for sessions the rolling stats store does not have"""
+
+    @abstractmethod
+    def metrics_page(self, session_id: str, fields: Sequence[str], limit: int, before: Optional[str]) -> list:
+        """Newest first, older than the `before` cursor; ValueError for a bad cursor"""
+
+    @abstractmethod
+    def latest(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def has_metrics(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def export_partitions(self, session_id: str) -> Iterator[list]:
+        """Every row of the session in METRIC_FIELDS order, oldest first, in lists"""
+
+    @abstractmethod
+    def series_rows(
+        self, session_id: str, start: datetime, end: datetime, points: int
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """(resolution, rows) for downsample_series; resolution None means raw rows"""
+
+    @abstractmethod
+    def add_diary_entry(self, values: Dict[str, Any]) -> Any:
+        ...
+
+    @abstractmethod
+    def diary_page(self, session_id: str, limit: int, before: Optional[str]) -> list:
+        ...
+
+    @abstractmethod
+    def get_diary_entry(self, entry_id: int) -> Any:
+        ...
+
+    @abstractmethod
+    def delete_diary_entry(self, entry_id: int) -> bool:
+        ...
+
+
+class SqlStorage(MetricStorage):
+    """The database, through one request's Session"""
+
+    name = "sql"
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add_metrics(self, rows: List[dict]) -> None:
+        session_registry.ensure(self.db, [row["session_id"] for row in rows])
+        ids = self.db.scalars(insert_metrics_statement(), rows).all()
+        apply_rollups(self.db, rows)
+        self.db.commit()
+        cache_newest(rows, ids)
+
+    def warm_stats(self, session_ids: Sequence[str]) -> None:
+        warm_sessions(self.db, session_ids)
+
+    def metrics_page(self, session_id: str, fields: Sequence[str], limit: int, before: Optional[str]) -> list:
+        return self.db.execute(metrics_page_statement(session_id, fields, limit, before)).all()
+
+    def latest(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return latest_snapshot(self.db, session_id)
+
+    def has_metrics(self, session_id: str) -> bool:
+        return self.db.scalars(session_has_metrics(session_id)).first() is not None
+
+    def export_partitions(self, session_id: str) -> Iterator[list]:
+        # Streams on its own session: the request's is closed before the body is sent
+        return iter_partitions(session_id)
+
+    def series_rows(
+        self, session_id: str, start: datetime, end: datetime, points: int
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        resolution = choose_resolution(start, end, points)
+        return resolution, self.db.execute(series_statement(session_id, resolution, start, end)).mappings().all()
+
+    def add_diary_entry(self, values: Dict[str, Any]) -> DiaryEntry:
+        entry = DiaryEntry(**values)
+        self.db.add(entry)
+        self.db.commit()
+        self.db.refresh(entry)
+        recent_writes.mark([entry.session_id])
+        return entry
+
+    def diary_page(self, session_id: str, limit: int, before: Optional[str]) -> list:
+        return self.db.scalars(diary_page_statement(session_id, limit, before)).all()
+
+    def get_diary_entry(self, entry_id: int) -> Optional[DiaryEntry]:
+        entry = self.db.get(DiaryEntry, entry_id)
+        if not entry and uses_replica(self.db):
+            # The entry may not have replicated yet
+            with new_session() as primary:
+                entry = primary.get(DiaryEntry, entry_id)
+        return entry
+
+    def delete_diary_entry(self, entry_id: int) -> bool:
+        entry = self.db.get(DiaryEntry, entry_id)
+        if not entry:
+            return False
+        session_id = entry.session_id
+        self.db.delete(entry)
+        self.db.commit()
+        recent_writes.mark([session_id])
+        return True
+
+
+class AsyncMetricStorage(ABC):
+    """MetricStorage for the async routes: the same methods and row shapes, awaited"""
+
+    name = ""
+
+    @abstractmethod
+    async def add_metrics(self, rows: List[dict]) -> None:
+        ...
+
+    @abstractmethod
+    async def warm_stats(self, session_ids: Sequence[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def metrics_page(self, session_id: str, fields: Sequence[str], limit: int, before: Optional[str]) -> list:
+        ...
+
+    @abstractmethod
+    async def latest(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def has_metrics(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def export_partitions(self, session_id: str) -> AsyncIterator[list]:
+        """An async iterator, not a coroutine"""
+
+    @abstractmethod
+    async def series_rows(
+        self, session_id: str, start: datetime, end: datetime, points: int
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    async def add_diary_entry(self, values: Dict[str, Any]) -> Any:
+        ...
+
+    @abstractmethod
+    async def diary_page(self, session_id: str, limit: int, before: Optional[str]) -> list:
+        ...
+
+    @abstractmethod
+    async def get_diary_entry(self, entry_id: int) -> Any:
+        ...
+
+    @abstractmethod
+    async def delete_diary_entry(self, entry_id: int) -> bool:
+        ...
+
+
+class AsyncSqlStorage(AsyncMetricStorage):
+    """Async counterpart of SqlStorage (ASYNC_DB): the same methods, awaited"""
+
+    name = "sql"
+
+    def __init__(self, db: "AsyncSession"):
+        self.db = db
+
+    async def add_metrics(self, rows: List[dict]) -> None:
+        await session_registry.ensure_async(self.db, [row["session_id"] for row in rows])
+        ids = (await self.db.scalars(insert_metrics_statement(), rows)).all()
+        await apply_rollups_async(self.db, rows)
+        await self.db.commit()
+        await off_loop(cache_newest, rows, ids)
+
+    async def warm_stats(self, session_ids: Sequence[str]) -> None:
+        await warm_sessions_async(self.db, session_ids)
+
+    async def metrics_page(self, session_id: str, fields: Sequence[str], limit: int, before: Optional[str]) -> list:
+        return (await self.db.execute(metrics_page_statement(session_id, fields, limit, before))).all()
+
+    async def latest(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return await latest_snapshot_async(self.db, session_id)
+
+    async def has_metrics(self, session_id: str) -> bool:
+        return (await self.db.scalars(session_has_metrics(session_id))).first() is not None
+
+    def export_partitions(self, session_id: str) -> AsyncIterator[list]:
+        return aiter_partitions(session_id)
+
+    async def series_rows(
+        self, session_id: str, start: datetime, end: datetime, points: int
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        resolution = choose_resolution(start, end, points)
+        result = await self.db.execute(series_statement(session_id, resolution, start, end))
+        return resolution, result.mappings().all()
+
+    async def add_diary_entry(self, values: Dict[str, Any]) -> DiaryEntry:
+        entry = DiaryEntry(**values)
+        self.db.add(entry)
+        await self.db.commit()
+        await self.db.refresh(entry)
+        await off_loop(recent_writes.mark, [entry.session_id])
+        return entry
+
+    async def diary_page(self, session_id: str, limit: int, before: Optional[str]) -> list:
+        return (await self.db.scalars(diary_page_statement(session_id, limit, before))).all()
+
+    async def get_diary_entry(self, entry_id: int) -> Optional[DiaryEntry]:
+        entry = await self.db.get(DiaryEntry, entry_id)
+        if not entry and uses_replica(self.db):
+            async with get_async_sessionmaker()() as primary:
+                entry = await primary.get(DiaryEntry, entry_id)
+        return entry
+
+    async def delete_diary_entry(self, entry_id: int) -> bool:
+        entry = await self.db.get(DiaryEntry, entry_id)
+        if not entry:
+            return False
+        session_id = entry.session_id
+        await self.db.delete(entry)
+        await self.db.commit()
+        await off_loop(recent_writes.mark, [session_id])
+        return True
+
+
+def memory_backend():
+    from app.services.memory_storage import memory_storage
+
+    return memory_storage
+
+
+def uses_memory() -> bool:
+    return settings.storage_backend == "memory"
+
+
+@contextmanager
+def open_storage() -> Iterator[MetricStorage]:
+    """Storage outside a request (WebSocket flushes): on sql, a session on the primary"""
+    if uses_memory():
+        yield memory_backend()
+        return
+    db = new_session()
+    try:
+        yield SqlStorage(db)
+    finally:
+        db.close()
+
+
+def get_storage():
+    with open_storage() as storage:
+        yield storage
+
+
+def get_read_storage(request: Request):
+    """get_storage for read-only routes; on sql, a replica when configured (see get_read_db)"""
+    if uses_memory():
+        yield memory_backend()
+        return
+    db = read_session(request.path_params.get("session_id"))
+    try:
+        yield SqlStorage(db)
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def open_async_storage() -> AsyncIterator[AsyncMetricStorage]:
+    """open_storage for ASYNC_DB: an AsyncSqlStorage on the primary"""
+    async with get_async_sessionmaker()() as db:
+        yield AsyncSqlStorage(db)
+
+
+async def get_async_storage():
+    async with open_async_storage() as storage:
+        yield storage
+
+
+async def get_async_read_storage(request: Request):
+    """get_async_storage for read-only routes; a replica when configured"""
+    db = await async_read_session(request.path_params.get("session_id"))
+    try:
+        yield AsyncSqlStorage(db)
+    finally:
+        await db.close()
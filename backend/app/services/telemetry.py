@@ -0,0 +1,259 @@
+"""
+In-process metrics in the Prometheus text format (no client library)
+Counters and histograms are updated by the request middleware, the
+SQLAlchemy cursor hooks and the analyzer; the existing /internal stats
+(write-behind, caches, pools, rolling stats) are exported as gauges when
+/metrics is scraped.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services.startup import startup_timer
+
+# Starlette appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ANALYZER_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = HTTP_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # labelvalues -> [per-bucket counts (non-cumulative), sum]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labelvalues: str) -> "_Timer":
+        return _Timer(self, labelvalues)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for labelvalues, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "started")
+
+    def __init__(self, histogram: Histogram, labelvalues: LabelValues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+
+
+class StatsGauges:
+    """
+    Exports a stats() dict as gauges: every numeric key becomes
+    <prefix>_<key>; nested dicts (e.g. per-engine pool stats) become a label
+    """
+
+    def __init__(self, prefix: str, documentation: str, source: Callable[[], dict], label: Optional[str] = None):
+        self.prefix = prefix
+        self.documentation = documentation
+        self.source = source
+        self.label = label
+
+    def render(self) -> List[str]:
+        stats = self.source()
+        groups = stats.items() if self.label else [(None, stats)]
+        samples: Dict[str, List[str]] = {}
+        for group, values in groups:
+            labels = _labels((self.label,), (group,)) if self.label else ""
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    samples.setdefault(key, []).append(f"{self.prefix}_{key}{labels} {_number(value)}")
+        lines = []
+        for key, rows in samples.items():
+            lines.append(f"# HELP {self.prefix}_{key} {self.documentation}: {key}")
+            lines.append(f"# TYPE {self.prefix}_{key} gauge")
+            lines.extend(rows)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._collectors: list = []
+
+    def register(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "cognitwin_http_requests_total", "HTTP requests by route template and status",
+    ("method", "route", "status"),
+))
+http_latency = registry.register(Histogram(
+    "cognitwin_http_request_duration_seconds", "HTTP request latency by route template and status",
+    ("method", "route", "status"), HTTP_BUCKETS,
+))
+db_queries = registry.register(Counter(
+    "cognitwin_db_queries_total", "SQL statements executed, by statement type", ("statement",),
+))
+db_latency = registry.register(Histogram(
+    "cognitwin_db_query_duration_seconds", "SQL statement duration, by statement type",
+    ("statement",), SQL_BUCKETS,
+))
+analyzer_latency = registry.register(Histogram(
+    "cognitwin_analyzer_duration_seconds", "CognitiveAnalyzer scoring time (single row or batch)",
+    ("mode",), ANALYZER_BUCKETS,
+))
+
+STATEMENT_TYPES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def statement_type(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in STATEMENT_TYPES else "OTHER"
+
+
+# Engine-class listeners cover the sync engine, the async engine's sync
+# core and any engine created later (CLI scripts, tests)
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    kind = statement_type(statement)
+    db_queries.inc(kind)
+    db_latency.observe(time.perf_counter() - started, kind)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware: request count and latency per route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; unmatched
+            # paths share one label so URLs cannot blow up cardinality
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            labels = (scope["method"], template, status[0])
+            http_requests.inc(*labels)
+            http_latency.observe(time.perf_counter() - started, *labels)
+            if startup_timer.awaiting_first_request:
+                startup_timer.first_request()
+
+
+def register_stats(gauges: Iterable[StatsGauges]) -> None:
+    for gauge in gauges:
+        registry.register(gauge)
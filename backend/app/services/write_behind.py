@@ -0,0 +1,249 @@
+"""
+Write-behind buffer for cognitive metrics
+Opt-in (WRITE_BEHIND_ENABLED): the analyze route hands its row to a bounded
+in-process queue and returns immediately; a background thread drains the
+queue with multi-row INSERTs and one commit per batch.
+
+A failed flush (e.g. the database is briefly unreachable) is retried with
+exponential backoff, up to max_retries times; meanwhile the queue fills and
+submit() starts refusing rows, so clients see 503s instead of losing data.
+Rows are lost only when a worker is killed (not shut down cleanly) with rows
+still queued, or when a batch still fails after its last retry (counted in
+failed_rows and logged). This trades a small durability window for fewer
+round trips and fsyncs.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import new_session
+from app.models.cognitive import CognitiveMetric
+from app.services.rollups import apply_rollups
+from app.services.sessions import session_registry
+from app.services.snapshot_cache import snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+
+class MetricWriteBehind:
+    """Bounded queue of metric rows plus the background writer that drains it"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_size: int = 500,
+        flush_interval: float = 1.0,
+        queue_size: int = 10000,
+        enqueue_timeout: float = 0.05,
+        max_retries: int = 5,
+        retry_backoff: float = 0.5,
+    ):
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Submits past the _stopping check; stop() waits for them to land
+        self._submitting = 0
+        self._submit_done = threading.Condition()
+        self._counters = {
+            "enqueued": 0,
+            "backpressure_waits": 0,
+            "rejected": 0,
+            "flushed_rows": 0,
+            "batches": 0,
+            "flush_retries": 0,
+            "failed_rows": 0,
+            "max_depth": 0,
+        }
+        self._last_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="metric-write-behind", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Write-behind started (flush_size=%s, flush_interval=%ss, queue_size=%s)",
+            self.flush_size, self.flush_interval, self._queue.maxsize,
+        )
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting rows and flush everything still queued"""
+        if not self.running:
+            return
+        with self._submit_done:
+            self._stopping.set()
+            self._submit_done.wait_for(lambda: self._submitting == 0)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Write-behind still flushing after %ss; %s rows queued", timeout, self._queue.qsize())
+            return
+        # The writer can exit between a submit's check and its put
+        while True:
+            batch = self._collect()
+            if not batch:
+                break
+            self._flush(batch)
+        logger.info("Write-behind stopped")
+
+    def submit(self, row: Dict[str, Any]) -> bool:
+        """
+        Queue a row for persistence
+        Returns False when the queue stays full for enqueue_timeout (the
+        caller should shed the request rather than pile up more work)
+        """
+        with self._submit_done:
+            if self._stopping.is_set():
+                return False
+            self._submitting += 1
+        try:
+            if not self._put(row):
+                return False
+        finally:
+            with self._submit_done:
+                self._submitting -= 1
+                self._submit_done.notify_all()
+        depth = self._queue.qsize()
+        with self._lock:
+            self._counters["enqueued"] += 1
+            self._counters["max_depth"] = max(self._counters["max_depth"], depth)
+        return True
+
+    def _put(self, row: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._count("backpressure_waits")
+            try:
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            except queue.Full:
+                self._count("rejected")
+                return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "flush_size": self.flush_size,
+            "flush_interval": self.flush_interval,
+            "max_retries": self.max_retries,
+            "last_flush_seconds": self._last_flush_seconds,
+            **counters,
+        }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        """Wait for a first row, then take up to flush_size within flush_interval"""
+        if self._stopping.is_set():
+            batch = []
+            while len(batch) < self.flush_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            return batch
+
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        """Write a batch, retrying with exponential backoff before giving up on it"""
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                ids = self._write(batch)
+                break
+            except Exception:
+                if attempt == self.max_retries:
+                    self._count("failed_rows", len(batch))
+                    logger.exception(
+                        "Write-behind flush of %s rows failed %s times; dropping them",
+                        len(batch), attempt + 1,
+                    )
+                    return
+                delay = self.retry_backoff * 2 ** attempt
+                self._count("flush_retries")
+                logger.warning(
+                    "Write-behind flush of %s rows failed; retry %s/%s in %.1fs",
+                    len(batch), attempt + 1, self.max_retries, delay, exc_info=True,
+                )
+                time.sleep(delay)
+        self._last_flush_seconds = time.perf_counter() - started
+        # Queue order is submit order, so later rows are newer per session
+        snapshot_cache.put_many({**row, "id": metric_id} for row, metric_id in zip(batch, ids))
+        with self._lock:
+            self._counters["flushed_rows"] += len(batch)
+            self._counters["batches"] += 1
+
+    def _write(self, batch: List[Dict[str, Any]]) -> List[int]:
+        """INSERT the batch and its rollups in one transaction; returns the new ids"""
+        db = self.session_factory()
+        try:
+            session_registry.ensure(db, (row["session_id"] for row in batch))
+            ids = db.scalars(
+                insert(CognitiveMetric).returning(CognitiveMetric.id, sort_by_parameter_order=True),
+                batch
+            ).all()
+            apply_rollups(db, batch)
+            db.commit()
+            return ids
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+metric_writer = MetricWriteBehind(
+    new_session,
+    flush_size=settings.write_behind_flush_size,
+    flush_interval=settings.write_behind_flush_interval,
+    queue_size=settings.write_behind_queue_size,
+    enqueue_timeout=settings.write_behind_enqueue_timeout,
+    max_retries=settings.write_behind_max_retries,
+    retry_backoff=settings.write_behind_retry_backoff,
+)
@@ -0,0 +1,348 @@
+"""Synthetic sessions, metrics and diary entries for scale testing.
+
+Each session gets its own typing baseline (log-normal dwell/flight times,
+error propensity, mood) and drifts as fatigue and frustration build over
+the session. Every metric row is scored by the real CognitiveAnalyzer
+(analyze_batch), and diary entries snapshot the scores of the row they
+follow, with is_crisis driven by rage and heat. Output depends only on
+--seed and the chunk layout, not on the number of workers.
+
+Rows are loaded with COPY ... FROM STDIN on PostgreSQL (psycopg2) and with
+batched executemany INSERTs elsewhere. On PostgreSQL every worker process
+generates and loads its own chunks over its own connection; on SQLite
+(one writer at a time) workers only generate and the parent loads. Rollups
+are filled from the generated rows in the same transaction (--skip-rollups
+leaves them empty). The cohort refresher picks the rows up by itself: it
+waits at id gaps until the loading transactions have committed. Large loads
+fold faster with a one-off rebuild afterwards:
+  python -m app.services.cohort --rebuild
+
+Run from backend/:
+  python -m app.synthetic --sessions 10000 --metrics-per-session 200 --workers 8
+  python -m app.synthetic --sessions 50 --days 7 --seed 2
+
+Session IDs are synthetic-<seed>-<n>: use a new --seed to add more data.
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import get_engine, init_schema
+from app.models.cognitive import CognitiveMetric, DiaryEntry
+from app.schemas.cognitive import FEATURE_NAMES, SCORE_NAMES
+from app.services.cognitive_analyzer import CognitiveAnalyzer
+from app.services.rolling_stats import RollingStatsStore
+from app.services.rollups import apply_rollups
+from app.services.sessions import upsert_sessions
+
+METRIC_COLUMNS = ("session_id", "timestamp", *FEATURE_NAMES, *SCORE_NAMES)
+DIARY_COLUMNS = ("session_id", "timestamp", "mood_rating", "mood_notes", *SCORE_NAMES, "is_crisis")
+
+# Rows per generated chunk (and per load transaction), roughly
+DEFAULT_CHUNK_ROWS = 20000
+
+
+@dataclass(frozen=True)
+class Plan:
+    seed: int
+    metrics_per_session: int
+    days: float
+    interval: float
+    diary_rate: float
+    end: datetime
+
+
+class Chunk(NamedTuple):
+    index: int
+    first_session: int
+    sessions: int
+
+
+class ChunkResult(NamedTuple):
+    rows: Dict[str, int]
+    generate_seconds: float
+    load_seconds: float
+
+
+@dataclass
+class GeneratedChunk:
+    sessions: List[str]
+    metrics: List[Dict[str, Any]]
+    diary: List[Dict[str, Any]]
+    generate_seconds: float
+
+
+def plan_chunks(sessions: int, metrics_per_session: int, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> List[Chunk]:
+    per_chunk = max(1, chunk_rows // max(1, metrics_per_session))
+    return [
+        Chunk(index, first, min(per_chunk, sessions - first))
+        for index, first in enumerate(range(0, sessions, per_chunk))
+    ]
+
+
+def session_ids(seed: int, first: int, count: int) -> List[str]:
+    return [f"synthetic-{seed}-{first + i:08d}" for i in range(count)]
+
+
+_analyzer: Optional[CognitiveAnalyzer] = None
+
+
+def _get_analyzer() -> CognitiveAnalyzer:
+    # One per process; a private stats store keeps the app's rolling stats clean
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = CognitiveAnalyzer(stats_store=RollingStatsStore())
+    return _analyzer
+
+
+def generate_chunk(plan: Plan, chunk: Chunk) -> GeneratedChunk:
+    started = time.perf_counter()
+    rng = np.random.default_rng([plan.seed, chunk.index])
+    n = chunk.sessions
+    ids = session_ids(plan.seed, chunk.first_session, n)
+
+    # Per-session traits
+    dwell_base = rng.lognormal(np.log(100), 0.25, n)
+    flight_base = rng.lognormal(np.log(180), 0.35, n)
+    error_base = rng.beta(1.5, 12, n)
+    mood = rng.normal(0.05, 0.3, n)
+    frustration = rng.beta(1.2, 6, n)
+
+    counts = np.maximum(rng.poisson(plan.metrics_per_session, n), 1)
+    total = int(counts.sum())
+    owner = np.repeat(np.arange(n), counts)
+    first_row = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    progress = (np.arange(total) - first_row[owner]) / counts[owner]
+    drift = frustration[owner] * progress
+
+    # Seconds since each session's first row, then a start inside the window
+    elapsed = np.cumsum(rng.exponential(plan.interval, total))
+    elapsed -= elapsed[first_row][owner]
+    span = elapsed[first_row + counts - 1]
+    window = plan.days * 86400
+    start = rng.uniform(0, 1, n) * np.maximum(window - span, 0) - window
+    offsets = start[owner] + elapsed
+
+    pause_count = rng.poisson(1.5 + 3 * drift)
+    text_length = rng.gamma(2.0, 120.0, total).astype(int)
+    error_rate = np.clip(error_base[owner] * (1 + 2 * drift) * rng.lognormal(0, 0.3, total), 0, 1)
+    columns = {
+        "avg_dwell_time": dwell_base[owner] * (1 + 0.15 * drift) * rng.lognormal(0, 0.1, total),
+        "avg_flight_time": flight_base[owner] * (1 + 0.3 * drift) * rng.lognormal(0, 0.25, total),
+        "pause_count": pause_count,
+        "avg_pause_duration": np.where(pause_count > 0, rng.lognormal(np.log(3500), 0.5, total), 0.0),
+        "error_rate": error_rate,
+        "correction_rate": np.clip(error_rate * rng.uniform(0.5, 1.1, total), 0, 1),
+        "text_length": text_length,
+        "sentiment_score": np.clip(mood[owner] - 0.5 * drift + rng.normal(0, 0.25, total), -1, 1),
+        "word_count": (text_length / rng.uniform(4.5, 6.5, total)).astype(int),
+    }
+    scores = _get_analyzer().analyze_batch({name: columns[name].astype(float) for name in FEATURE_NAMES})
+
+    timestamps = [plan.end + timedelta(seconds=float(s)) for s in offsets]
+    values = {name: columns[name].tolist() for name in FEATURE_NAMES}
+    values.update({name: scores[name].tolist() for name in SCORE_NAMES})
+    metrics = [
+        {"session_id": ids[session], "timestamp": timestamps[i], **{name: values[name][i] for name in values}}
+        for i, session in enumerate(owner.tolist())
+    ]
+
+    diary = []
+    diary_rows = np.flatnonzero(rng.random(total) < plan.diary_rate)
+    crisis_draw = rng.random(len(diary_rows))
+    for i, draw in zip(diary_rows.tolist(), crisis_draw.tolist()):
+        row = metrics[i]
+        rating = 4 + 2 * row["sentiment_score"] - 2 * row["rage"] - row["mood_drift"]
+        diary.append({
+            "session_id": row["session_id"],
+            "timestamp": row["timestamp"] + timedelta(seconds=5),
+            "mood_rating": int(min(max(round(rating), 1), 5)),
+            "mood_notes": "",
+            **{name: row[name] for name in SCORE_NAMES},
+            "is_crisis": (row["rage"] > 0.6 or row["heat"] > 0.75) and draw < 0.5,
+        })
+    return GeneratedChunk(ids, metrics, diary, time.perf_counter() - started)
+
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_field(value: Any) -> str:
+    """One field in COPY's text format (\\N is NULL, so "" stays an empty string)"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.translate(COPY_ESCAPES)
+    return str(value)
+
+
+def copy_rows(conn: Connection, table: str, columns: Sequence[str], rows: Iterable[Dict[str, Any]]) -> None:
+    """COPY rows into table over the connection's psycopg2 cursor"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(copy_field(row[name]) for name in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+
+def insert_rows(conn: Connection, model, rows: List[Dict[str, Any]], batch_size: int) -> None:
+    for first in range(0, len(rows), batch_size):
+        conn.execute(insert(model), rows[first:first + batch_size])
+
+
+def uses_copy(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+
+def load_chunk(engine: Engine, generated: GeneratedChunk, rollups: bool, batch_size: int) -> float:
+    """Load one chunk in a single transaction; returns seconds spent"""
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        db = Session(bind=conn)
+        upsert_sessions(db, generated.sessions)
+        if uses_copy(engine):
+            copy_rows(conn, CognitiveMetric.__tablename__, METRIC_COLUMNS, generated.metrics)
+            copy_rows(conn, DiaryEntry.__tablename__, DIARY_COLUMNS, generated.diary)
+        else:
+            insert_rows(conn, CognitiveMetric, generated.metrics, batch_size)
+            insert_rows(conn, DiaryEntry, generated.diary, batch_size)
+        if rollups:
+            apply_rollups(db, generated.metrics)
+        db.close()
+    return time.perf_counter() - started
+
+
+def row_counts(generated: GeneratedChunk) -> Dict[str, int]:
+    return {"sessions": len(generated.sessions), "metrics": len(generated.metrics), "diary": len(generated.diary)}
+
+
+def _init_worker() -> None:
+    # Forked workers must not reuse the parent's pooled connections
+    get_engine().dispose(close=False)
+
+
+def _generate_and_load(task) -> ChunkResult:
+    plan, chunk, rollups, batch_size = task
+    generated = generate_chunk(plan, chunk)
+    load_seconds = load_chunk(get_engine(), generated, rollups, batch_size)
+    return ChunkResult(row_counts(generated), generated.generate_seconds, load_seconds)
+
+
+def _generate(task) -> GeneratedChunk:
+    plan, chunk = task
+    return generate_chunk(plan, chunk)
+
+
+def run(plan: Plan, chunks: List[Chunk], workers: int, rollups: bool, batch_size: int) -> Dict[str, Any]:
+    engine = get_engine()
+    # Only PostgreSQL takes concurrent writers; elsewhere the parent loads
+    parallel_load = uses_copy(engine)
+    totals = {"sessions": 0, "metrics": 0, "diary": 0}
+    generate_seconds = load_seconds = 0.0
+    started = time.perf_counter()
+
+    def record(rows: Dict[str, int], generated_in: float, loaded_in: float) -> None:
+        nonlocal generate_seconds, load_seconds
+        for name, count in rows.items():
+            totals[name] += count
+        generate_seconds += generated_in
+        load_seconds += loaded_in
+        elapsed = time.perf_counter() - started
+        print(
+            f"\r{totals['metrics']:>12,} metrics  {totals['metrics'] / elapsed:>10,.0f} rows/s",
+            end="", file=sys.stderr, flush=True,
+        )
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker) if workers > 1 else None
+    try:
+        if parallel_load:
+            tasks = [(plan, chunk, rollups, batch_size) for chunk in chunks]
+            results = pool.imap_unordered(_generate_and_load, tasks) if pool else map(_generate_and_load, tasks)
+            for result in results:
+                record(result.rows, result.generate_seconds, result.load_seconds)
+        else:
+            tasks = [(plan, chunk) for chunk in chunks]
+            results = pool.imap(_generate, tasks) if pool else map(_generate, tasks)
+            for generated in results:
+                loaded_in = load_chunk(engine, generated, rollups, batch_size)
+                record(row_counts(generated), generated.generate_seconds, loaded_in)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    rows = totals["metrics"] + totals["diary"]
+    return {
+        "loader": "copy" if parallel_load else "executemany",
+        "workers": workers,
+        "rows": totals,
+        "wall_seconds": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else 0.0,
+        # Summed over workers: CPU-side generation vs time inside load transactions
+        "generate_seconds": generate_seconds,
+        "load_seconds": load_seconds,
+        "load_rows_per_second": rows / load_seconds if load_seconds else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate and bulk-load synthetic CogniTwin data")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--metrics-per-session", type=int, default=100, help="mean; varies per session")
+    parser.add_argument("--days", type=float, default=30.0, help="sessions are spread over the last N days")
+    parser.add_argument("--interval", type=float, default=20.0, help="mean seconds between a session's metrics")
+    parser.add_argument("--diary-rate", type=float, default=0.02, help="chance of a diary entry after a metric")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per executemany (non-COPY)")
+    parser.add_argument("--skip-rollups", action="store_true", help="leave the rollup tables alone")
+    args = parser.parse_args()
+    if args.sessions < 1 or args.metrics_per_session < 1 or args.workers < 1:
+        parser.error("--sessions, --metrics-per-session and --workers must be positive")
+
+    init_schema(settings.db_startup_timeout)
+    plan = Plan(
+        seed=args.seed,
+        metrics_per_session=args.metrics_per_session,
+        days=args.days,
+        interval=args.interval,
+        diary_rate=args.diary_rate,
+        end=datetime.now(timezone.utc),
+    )
+    chunks = plan_chunks(args.sessions, args.metrics_per_session, args.chunk_rows)
+    report = run(plan, chunks, args.workers, not args.skip_rollups, args.batch_size)
+
+    rows = report["rows"]
+    print(f"Loaded {rows['sessions']:,} sessions, {rows['metrics']:,} metrics, {rows['diary']:,} diary entries")
+    print(f"  loader: {report['loader']} ({report['workers']} workers)")
+    print(f"  wall: {report['wall_seconds']:.1f} s, {report['rows_per_second']:,.0f} rows/s")
+    print(
+        f"  generate: {report['generate_seconds']:.1f} s, load: {report['load_seconds']:.1f} s "
+        f"({report['load_rows_per_second']:,.0f} rows/s inside load transactions)"
+    )
+
+
+if __name__ == "__main__":
+    main()
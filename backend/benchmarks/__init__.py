@@ -0,0 +1 @@
+"""Benchmarks and load tools; run from backend/ as python -m benchmarks.<name>"""
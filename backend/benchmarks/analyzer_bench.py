@@ -0,0 +1,234 @@
+"""
+Microbenchmarks for the scoring hot path, gated against a stored baseline
+
+Cases: CognitiveAnalyzer.analyze and analyze_batch, each calculate_* method,
+FeatureDetector.analyze_features, the compiled scoring spec on its own
+(evaluate, and compile_spec), KeystrokeData validation and
+CognitiveMetricResponse serialization. Inputs are synthetic but follow
+realistic typing distributions (see synthetic_features), seeded so runs are
+comparable. Each case reports the best-of-rounds ops/sec plus tracemalloc
+peak and retained bytes per op (measured in a separate pass, since tracing
+slows the code down).
+
+Run from backend/:
+  python -m benchmarks.analyzer_bench --save        # record the baseline
+  python -m benchmarks.analyzer_bench               # compare; exit 1 on regression
+                                                    # or when a case has no baseline
+  python -m benchmarks.analyzer_bench --only calculate_
+
+Baselines are machine-specific: record one per CI runner class.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.models.cognitive import CognitiveMetric
+from app.schemas.cognitive import FEATURE_NAMES, CognitiveMetricResponse, KeystrokeData
+from app.services.cognitive_analyzer import CognitiveAnalyzer
+from app.services.rolling_stats import RollingStatsStore
+from app.services.scoring_spec import DEFAULT_SCORING_SPEC, compile_spec
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "analyzer.json")
+
+# Per-op allocation figures below this many bytes are too small to gate on
+ALLOC_SLACK_BYTES = 256
+
+
+def synthetic_features(rng: np.random.Generator, count: int) -> List[dict]:
+    """
+    Feature dicts shaped like real sessions: log-normal dwell/flight times,
+    Poisson pauses, skewed (beta) error and correction rates, and word
+    counts derived from the text length. A few rows sit on the zero and
+    clipping edges the formulas branch on.
+    """
+    text_length = rng.gamma(2.0, 120.0, count).astype(int)
+    pause_count = rng.poisson(2.0, count)
+    rows = []
+    for i in range(count):
+        rows.append({
+            "session_id": f"bench-{i % 50}",
+            "avg_dwell_time": float(rng.lognormal(np.log(100), 0.3)),
+            "avg_flight_time": float(rng.lognormal(np.log(180), 0.5)),
+            "pause_count": int(pause_count[i]),
+            "avg_pause_duration": float(rng.lognormal(np.log(3500), 0.6)) if pause_count[i] else 0.0,
+            "error_rate": float(rng.beta(1.5, 12)),
+            "correction_rate": float(rng.beta(1.2, 15)),
+            "text_length": int(text_length[i]),
+            "sentiment_score": float(np.clip(rng.normal(0.05, 0.35), -1, 1)),
+            "word_count": int(text_length[i] / rng.uniform(4.5, 6.5)),
+        })
+    for row in rows[: max(1, count // 50)]:
+        row.update(pause_count=0, avg_pause_duration=0.0, error_rate=0.0, text_length=0, word_count=0)
+    return rows
+
+
+class Case(NamedTuple):
+    op: Callable[[Any], Any]
+    items: Sequence[Any]
+    ops_per_item: int = 1
+
+
+def build_cases(count: int, seed: int) -> Dict[str, Case]:
+    rows = synthetic_features(np.random.default_rng(seed), count)
+    inputs = [KeystrokeData(**row) for row in rows]
+    analyzer = CognitiveAnalyzer(stats_store=RollingStatsStore())
+    columns = {name: np.array([row[name] for row in rows], dtype=float) for name in FEATURE_NAMES}
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    stored = [
+        CognitiveMetric(id=i + 1, timestamp=started + timedelta(seconds=i), **row, **dict(analyzer.analyze(data)))
+        for i, (row, data) in enumerate(zip(rows, inputs))
+    ]
+
+    cases = {
+        "analyze": Case(analyzer.analyze, inputs),
+        "analyze_batch": Case(analyzer.analyze_batch, [columns] * 20, count),
+        "feature_detector.analyze_features": Case(analyzer.feature_detector.analyze_features, inputs),
+        "scoring_spec.evaluate": Case(analyzer.spec_loader.get().evaluate, rows),
+        "scoring_spec.compile": Case(compile_spec, [DEFAULT_SCORING_SPEC] * 20),
+        "keystroke_data.validate": Case(KeystrokeData.model_validate, rows),
+        "metric_response.serialize": Case(
+            lambda metric: CognitiveMetricResponse.model_validate(metric).model_dump_json(), stored
+        ),
+    }
+    for name in sorted(dir(analyzer)):
+        if name.startswith("calculate_"):
+            cases[name] = Case(getattr(analyzer, name), inputs)
+    return cases
+
+
+def measure(case: Case, rounds: int) -> Dict[str, float]:
+    op, items = case.op, case.items
+    ops = len(items) * case.ops_per_item
+
+    def run():
+        for item in items:
+            op(item)
+
+    run()  # warm-up: spec compile, pydantic/ORM lazy setup
+    best = min(_timed(run) for _ in range(rounds))
+
+    # Traced separately, op by op: the peak above the pre-call level is the
+    # transient footprint of one call, what is left afterwards is retained
+    transient = retained = 0
+    tracemalloc.start()
+    try:
+        for item in items:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            op(item)
+            after, peak = tracemalloc.get_traced_memory()
+            transient += max(peak - before, 0)
+            retained += max(after - before, 0)
+    finally:
+        tracemalloc.stop()
+    return {
+        "ops_per_sec": ops / best,
+        "peak_bytes_per_op": transient / ops,
+        "retained_bytes_per_op": retained / ops,
+    }
+
+
+def _timed(run: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    run()
+    return time.perf_counter() - started
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Regressions of more than `threshold` (a fraction) against the baseline"""
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:,.0f} ops/s vs baseline {base['ops_per_sec']:,.0f}"
+            )
+        for key in ("peak_bytes_per_op", "retained_bytes_per_op"):
+            limit = max(base[key] * (1 + threshold), base[key] + ALLOC_SLACK_BYTES)
+            if result[key] > limit:
+                regressions.append(f"{name}: {key} {result[key]:,.0f} vs baseline {base[key]:,.0f}")
+    return regressions
+
+
+def run_suite(count: int, rounds: int, seed: int, only: Optional[str] = None) -> Dict[str, dict]:
+    results = {}
+    for name, case in build_cases(count, seed).items():
+        if only and not re.search(only, name):
+            continue
+        results[name] = measure(case, rounds)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown/growth (fraction)")
+    parser.add_argument("--size", type=int, default=2000, help="synthetic inputs per case")
+    parser.add_argument("--rounds", type=int, default=5, help="timed rounds per case (best is kept)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", help="regex selecting cases")
+    args = parser.parse_args()
+
+    results = run_suite(args.size, args.rounds, args.seed, args.only)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)["cases"]
+
+    print(f"{'case':<36} {'ops/s':>12} {'vs base':>8} {'peak B/op':>10} {'kept B/op':>10}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        ratio = f"{result['ops_per_sec'] / base['ops_per_sec']:>7.2f}x" if base else f"{'-':>8}"
+        print(
+            f"{name:<36} {result['ops_per_sec']:>12,.0f} {ratio} "
+            f"{result['peak_bytes_per_op']:>10,.0f} {result['retained_bytes_per_op']:>10,.0f}"
+        )
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as handle:
+            json.dump({
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "python": sys.version.split()[0],
+                "size": args.size,
+                "seed": args.seed,
+                "cases": {**baseline, **results},
+            }, handle, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+    # A gate without a baseline would pass whatever the numbers are
+    unrecorded = sorted(set(results) - set(baseline))
+    if unrecorded:
+        sys.exit(
+            f"\nNo baseline for {', '.join(unrecorded)} in {args.baseline}; "
+            "run with --save on this runner class to record one"
+        )
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        # Re-measure flagged cases once so a noisy neighbour does not fail the run
+        flagged = {line.split(":", 1)[0] for line in regressions}
+        cases = build_cases(args.size, args.seed)
+        retry = {name: measure(cases[name], args.rounds) for name in flagged}
+        regressions = compare(retry, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
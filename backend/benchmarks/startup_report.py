@@ -0,0 +1,108 @@
+"""
+Worker startup report: import cost per module and time to first request
+
+1. Runs `python -X importtime -c "import app.main"` in a fresh interpreter
+   and lists the slowest modules (cumulative and self time) plus the total
+   per top-level package.
+2. Spawns uvicorn and measures process start -> first 200 from /health,
+   then reads the in-process phases from /internal/startup.
+
+Run from backend/ (uses the same env as the app, e.g. DATABASE_URL):
+  python -m benchmarks.startup_report
+  python -m benchmarks.startup_report --top 40 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.common import start_server, stop_server
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def import_times(target: str = "app.main") -> List[Dict]:
+    """One entry per imported module: name, depth, self_ms, cumulative_ms"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, env={**os.environ, "LOG_LEVEL": "WARNING"}, check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules.append({
+                "module": match.group(4),
+                "depth": (len(match.group(3)) - 1) // 2,
+                "self_ms": int(match.group(1)) / 1000,
+                "cumulative_ms": int(match.group(2)) / 1000,
+            })
+    return modules
+
+
+def by_package(modules: List[Dict]) -> Dict[str, float]:
+    """Self time summed per top-level package, slowest first"""
+    totals: Dict[str, float] = defaultdict(float)
+    for module in modules:
+        totals[module["module"].split(".", 1)[0]] += module["self_ms"]
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def time_to_first_request(port: int) -> Dict:
+    started = time.perf_counter()
+    proc = start_server(port, {"LOG_LEVEL": "WARNING", "INTERNAL_ENDPOINTS_ENABLED": "true"})
+    try:
+        healthy_ms = (time.perf_counter() - started) * 1000
+        headers = {"X-Internal-Token": os.environ.get("INTERNAL_TOKEN", "")}
+        phases = httpx.get(f"http://127.0.0.1:{port}/internal/startup", headers=headers, timeout=5).json()
+    finally:
+        stop_server(proc)
+    return {"spawn_to_first_response_ms": healthy_ms, "in_process": phases}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20, help="modules to list")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--skip-server", action="store_true", help="only report import times")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    modules = import_times()
+    app_main = next(m for m in modules if m["module"] == "app.main")
+    report = {
+        "import_app_main_ms": app_main["cumulative_ms"],
+        "slowest_modules": sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[: args.top],
+        "slowest_self": sorted(modules, key=lambda m: m["self_ms"], reverse=True)[: args.top],
+        "packages": by_package(modules),
+    }
+
+    print(f"import app.main: {app_main['cumulative_ms']:.0f} ms ({len(modules)} modules)\n")
+    print(f"{'module (cumulative)':<56} {'cum ms':>8} {'self ms':>8}")
+    for module in report["slowest_modules"]:
+        name = "  " * module["depth"] + module["module"]
+        print(f"{name[:56]:<56} {module['cumulative_ms']:>8.1f} {module['self_ms']:>8.1f}")
+    print(f"\n{'package (self time)':<56} {'ms':>8}")
+    for package, total in list(report["packages"].items())[: args.top]:
+        print(f"{package:<56} {total:>8.1f}")
+
+    if not args.skip_server:
+        report["server"] = time_to_first_request(args.port)
+        print(f"\nuvicorn spawn -> first /health response: {report['server']['spawn_to_first_response_ms']:.0f} ms")
+        for phase, offset in report["server"]["in_process"].items():
+            print(f"  {phase:<24} {offset:>8.0f} ms after the app.main import began")
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
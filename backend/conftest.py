@@ -0,0 +1,58 @@
+"""Shared fixtures: a throwaway SQLite database with the app's tables"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.database as database
+import app.services.admission as admission
+from app.config import settings
+from app.database import Base
+from app.services.admission import SessionRateLimiter
+from app.services.rolling_stats import rolling_stats
+from app.services.sessions import session_registry
+from app.services.snapshot_cache import snapshot_cache
+
+ENGINE_CACHES = (
+    database.get_engine,
+    database.get_sessionmaker,
+    database.get_async_engine,
+    database.get_async_sessionmaker,
+)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """sessionmaker over a fresh SQLite file with every table created"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def app_database(tmp_path, monkeypatch):
+    """
+    Point the app's engines at a fresh SQLite file, with the per-process
+    caches emptied and the session rate limit off
+    """
+    monkeypatch.setattr(settings, "database_url", f"sqlite:///{tmp_path / 'api.db'}")
+    monkeypatch.setattr(admission, "session_limiter", SessionRateLimiter(rate=0, burst=1))
+    for cached in ENGINE_CACHES:
+        cached.cache_clear()
+    session_registry.clear()
+    snapshot_cache.invalidate()
+    rolling_stats.clear()
+    Base.metadata.create_all(database.get_engine())
+    yield database.get_sessionmaker()
+    database.get_engine().dispose()
+    for cached in ENGINE_CACHES:
+        cached.cache_clear()
+
+
+@pytest.fixture
+def client(app_database):
+    """TestClient for the (sync) app; startup tasks are not run"""
+    from app.main import app
+
+    return TestClient(app)
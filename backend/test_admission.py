@@ -0,0 +1,92 @@
+"""Admission control: token buckets, the in-flight cap and the analyze route's 429"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import app.services.admission as admission
+from app.services.admission import (
+    AdmissionMiddleware,
+    ConcurrencyLimiter,
+    SessionRateLimiter,
+    enforce_session_rate,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_token_bucket_bursts_then_refills(clock):
+    limiter = SessionRateLimiter(rate=0.5, burst=3)
+    assert [limiter.acquire(["s1"]) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire(["s1"]) == pytest.approx(2.0)
+    # Other sessions have their own buckets
+    assert limiter.acquire(["s2"]) == 0
+    clock.now += 2.0
+    assert limiter.acquire(["s1"]) == 0
+    assert limiter.acquire(["s1"]) > 0
+    # A batch is refused as a whole when any of its sessions is over the limit
+    assert limiter.acquire(["s1", "s2"]) > 0
+    assert limiter.acquire(["s2"]) == 0
+    assert limiter.stats() == {"sessions": 2, "admitted": 6, "rate_limited": 3, "evictions": 0}
+
+
+def test_enforce_session_rate_answers_429(clock, monkeypatch):
+    monkeypatch.setattr(admission, "session_limiter", SessionRateLimiter(rate=0.2, burst=1))
+    enforce_session_rate(["s1"])
+    with pytest.raises(HTTPException) as exc_info:
+        enforce_session_rate(["s1"])
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers == {"Retry-After": "5"}
+
+
+def test_middleware_sheds_past_the_in_flight_cap():
+    limiter = ConcurrencyLimiter(limit=1)
+    release = asyncio.Event()
+
+    async def endpoint(scope, receive, send):
+        if scope["path"].startswith("/api/") and not scope["path"].endswith("/health"):
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionMiddleware(endpoint, limiter=limiter)
+
+    async def request(path):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "path": path, "method": "GET", "headers": []}, None, send)
+        start = messages[0]
+        return start["status"], dict(start["headers"]).get(b"retry-after")
+
+    async def scenario():
+        first = asyncio.create_task(request("/api/cognitive/latest/s1"))
+        await asyncio.sleep(0)
+        shed = await request("/api/diary/entries/s1")
+        # Paths outside /api and the /api health check are never shed
+        health = await request("/health")
+        api_health = await request("/api/cognitive/health")
+        release.set()
+        return await first, shed, health, api_health
+
+    first, shed, health, api_health = asyncio.run(scenario())
+    assert first == (200, None)
+    assert shed == (503, b"1")
+    assert health == (200, None)
+    assert api_health == (200, None)
+    assert limiter.stats() == {"limit": 1, "in_flight": 0, "admitted": 1, "shed": 1, "peak_in_flight": 1}
@@ -0,0 +1,46 @@
+"""Regression gating of the analyzer microbenchmarks"""
+import sys
+
+import pytest
+
+from benchmarks.analyzer_bench import compare, main, run_suite
+
+
+def test_suite_runs_every_case():
+    results = run_suite(count=20, rounds=1, seed=3)
+    assert {
+        "analyze", "analyze_batch", "calculate_cognitive_load", "calculate_risk_volatility",
+        "feature_detector.analyze_features", "scoring_spec.evaluate", "metric_response.serialize",
+    } <= set(results)
+    assert all(result["ops_per_sec"] > 0 for result in results.values())
+    assert results["analyze"]["peak_bytes_per_op"] > 0
+
+
+def test_compare_flags_slowdowns_and_allocation_growth():
+    baseline = {
+        "fast": {"ops_per_sec": 1000.0, "peak_bytes_per_op": 100.0, "retained_bytes_per_op": 0.0},
+        "lean": {"ops_per_sec": 1000.0, "peak_bytes_per_op": 4000.0, "retained_bytes_per_op": 0.0},
+    }
+    current = {
+        "fast": {"ops_per_sec": 900.0, "peak_bytes_per_op": 300.0, "retained_bytes_per_op": 0.0},
+        "lean": {"ops_per_sec": 700.0, "peak_bytes_per_op": 6000.0, "retained_bytes_per_op": 0.0},
+        "new": {"ops_per_sec": 1.0, "peak_bytes_per_op": 0.0, "retained_bytes_per_op": 0.0},
+    }
+    regressions = compare(current, baseline, threshold=0.15)
+    assert len(regressions) == 2
+    assert all(line.startswith("lean:") for line in regressions)
+
+
+def test_gate_fails_without_a_baseline(tmp_path, monkeypatch):
+    baseline = tmp_path / "analyzer.json"
+    argv = ["analyzer_bench", "--baseline", str(baseline), "--size", "20", "--rounds", "1", "--only", "^analyze$"]
+    monkeypatch.setattr(sys, "argv", argv)
+    with pytest.raises(SystemExit) as exited:
+        main()
+    assert exited.value.code != 0
+
+    monkeypatch.setattr(sys, "argv", argv + ["--save"])
+    main()
+    # Recorded now; a generous threshold keeps the re-run from flaking
+    monkeypatch.setattr(sys, "argv", argv + ["--threshold", "100"])
+    main()
@@ -0,0 +1,134 @@
+"""The cognitive and diary routes on both paths: sync Session and async (aiosqlite) AsyncSession"""
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_async_engine
+from app.routes import cognitive, cognitive_async, diary, diary_async
+from app.services.pagination import NEXT_CURSOR_HEADER
+
+ROUTERS = {
+    "sync": (cognitive.router, diary.router),
+    "async": (cognitive_async.router, diary_async.router),
+}
+
+WINDOW = {
+    "avg_dwell_time": 110.0,
+    "avg_flight_time": 180.0,
+    "pause_count": 2,
+    "avg_pause_duration": 3000.0,
+    "error_rate": 0.1,
+    "correction_rate": 0.05,
+    "text_length": 120,
+    "sentiment_score": -0.2,
+    "word_count": 24,
+}
+
+
+@pytest.fixture(params=list(ROUTERS))
+def api(request, app_database):
+    app = FastAPI()
+    for router in ROUTERS[request.param]:
+        app.include_router(router)
+    with TestClient(app) as client:
+        yield client
+        if request.param == "async":
+            # aiosqlite connections belong to the client's event loop
+            client.portal.call(get_async_engine().dispose)
+
+
+def analyze(api, session_id, **changes):
+    response = api.post("/api/cognitive/analyze", json={"session_id": session_id, **WINDOW, **changes})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_analyze_then_read_back(api):
+    first = analyze(api, "s1", error_rate=0.3)
+    analyze(api, "s1")
+    last = analyze(api, "s1", sentiment_score=0.5)
+    assert set(first["scores"]) >= {"cognitive_load", "heat", "rage"}
+
+    latest = api.get("/api/cognitive/latest/s1").json()
+    assert latest["id"] == 3
+    assert latest["mood_drift"] == last["scores"]["mood_drift"]
+
+    page = api.get("/api/cognitive/metrics/s1", params={"limit": 2, "fields": "error_rate"})
+    assert [row["id"] for row in page.json()] == [3, 2]
+    older = api.get("/api/cognitive/metrics/s1", params={"limit": 2, "before": page.headers[NEXT_CURSOR_HEADER]})
+    assert [(row["id"], row["error_rate"]) for row in older.json()] == [(1, 0.3)]
+    assert api.get("/api/cognitive/metrics/s1", params={"before": "bad"}).status_code == 400
+    assert api.get("/api/cognitive/metrics/nobody").status_code == 404
+
+    series = api.get("/api/cognitive/series/s1").json()
+    # A day at 500 points reads the minute rollups
+    assert series["resolution"] == "minute"
+    assert sum(point["count"] for point in series["series"]["rage"]) == 3
+
+    trend = api.get("/api/cognitive/trend/s1").json()
+    assert trend["count"] == 3
+
+    exported = api.get("/api/cognitive/export/s1")
+    assert [json.loads(line)["id"] for line in exported.text.splitlines()] == [1, 2, 3]
+    assert api.get("/api/cognitive/export/nobody").status_code == 404
+
+
+def test_batch_then_baseline(api):
+    batch = {"session_id": ["b1"] * 12, **{name: [value] * 12 for name, value in WINDOW.items()}}
+    response = api.post("/api/cognitive/analyze/batch", json=batch)
+    assert response.status_code == 200
+    assert response.json()["count"] == 12
+    assert api.get("/api/cognitive/latest/b1").json()["id"] == 12
+
+    # Twelve identical rows: zero variance, so no z-scores yet
+    baseline = api.post(
+        "/api/cognitive/analyze", params={"baseline": "true"}, json={"session_id": "b1", **WINDOW}
+    ).json()["baseline"]
+    assert set(baseline.values()) == {None}
+
+
+def test_diary_entries(api):
+    assert api.post("/api/diary/entry", json={"session_id": "d1", "mood_rating": 3}).status_code == 404
+    scores = analyze(api, "d1")["scores"]
+
+    created = [
+        api.post("/api/diary/entry", json={"session_id": "d1", "mood_rating": rating, "mood_notes": "ok"}).json()
+        for rating in (2, 4, 5)
+    ]
+    assert created[0]["rage"] == scores["rage"]
+    # The create response matches a later read of the same entry
+    assert api.get(f"/api/diary/entry/{created[0]['id']}").json() == created[0]
+
+    page = api.get("/api/diary/entries/d1", params={"limit": 2})
+    assert [entry["mood_rating"] for entry in page.json()] == [5, 4]
+    rest = api.get("/api/diary/entries/d1", params={"limit": 2, "before": page.headers[NEXT_CURSOR_HEADER]})
+    assert [entry["mood_rating"] for entry in rest.json()] == [2]
+
+    assert api.delete(f"/api/diary/entry/{created[1]['id']}").status_code == 200
+    assert api.delete(f"/api/diary/entry/{created[1]['id']}").status_code == 404
+    assert api.get(f"/api/diary/entry/{created[1]['id']}").status_code == 404
+    assert len(api.get("/api/diary/entries/d1").json()) == 2
+
+
+def test_full_write_behind_queue_sheds_without_blocking_the_loop(api, monkeypatch):
+    class FullQueue:
+        running = True
+        calls_on_loop = 0
+
+        def submit(self, row):
+            try:
+                asyncio.get_running_loop()
+                self.calls_on_loop += 1
+            except RuntimeError:
+                pass
+            return False
+
+    writer = FullQueue()
+    monkeypatch.setattr(cognitive, "metric_writer", writer)
+    response = api.post("/api/cognitive/analyze", json={"session_id": "s1", **WINDOW})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert writer.calls_on_loop == 0
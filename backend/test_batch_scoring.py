@@ -0,0 +1,89 @@
+"""Vectorized batch scoring vs the scalar path, and batch input edge cases"""
+import random
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.cognitive import FEATURE_NAMES, SCORE_NAMES, KeystrokeBatch, KeystrokeData
+from app.services.cognitive_analyzer import CognitiveAnalyzer
+
+
+def random_keystroke_data(rng, session_id='test-batch'):
+    """Random inputs that also hit the zero/threshold branches of the formulas"""
+    return KeystrokeData(
+        session_id=session_id,
+        avg_dwell_time=rng.choice([0.0, 100.0, rng.uniform(20, 300)]),
+        avg_flight_time=rng.choice([50.0, 300.0, rng.uniform(0, 500)]),
+        pause_count=rng.choice([0, rng.randint(1, 15)]),
+        avg_pause_duration=rng.choice([0.0, rng.uniform(0, 12000)]),
+        error_rate=rng.choice([0.0, 0.2, rng.random()]),
+        correction_rate=rng.choice([0.0, rng.random()]),
+        text_length=rng.choice([0, rng.randint(1, 800)]),
+        sentiment_score=rng.choice([0.0, rng.uniform(-1, 1)]),
+        word_count=rng.randint(0, 150),
+    )
+
+
+def test_analyze_batch_matches_scalar():
+    rng = random.Random(1234)
+    analyzer = CognitiveAnalyzer()
+    samples = [random_keystroke_data(rng) for _ in range(500)]
+
+    columns = {name: [getattr(s, name) for s in samples] for name in FEATURE_NAMES}
+    batch = analyzer.analyze_batch(columns)
+
+    for i, sample in enumerate(samples):
+        scalar = analyzer.analyze(sample)
+        for name in SCORE_NAMES:
+            # Bit-identical, not approximately equal
+            assert batch[name][i] == getattr(scalar, name), (name, sample)
+
+
+def test_zero_length_batch_scores_to_empty_columns():
+    batch = CognitiveAnalyzer().analyze_batch({name: [] for name in FEATURE_NAMES})
+    assert set(batch) == set(SCORE_NAMES)
+    assert all(isinstance(column, np.ndarray) and column.shape == (0,) for column in batch.values())
+
+
+def test_mismatched_column_lengths_are_rejected():
+    columns = {name: [1.0, 2.0, 3.0] for name in FEATURE_NAMES}
+    # A single value must not broadcast over the other columns
+    columns["error_rate"] = [0.5]
+    with pytest.raises(ValueError):
+        CognitiveAnalyzer().analyze_batch(columns)
+
+
+def test_batch_schema_rejects_bad_shapes():
+    base = {"session_id": ["s1", "s1"], "avg_dwell_time": [100.0, 90.0], "avg_flight_time": [200.0, 210.0],
+            "pause_count": [1, 2], "error_rate": [0.1, 0.2], "text_length": [50, 60]}
+    batch = KeystrokeBatch(**base)
+    # Optional columns are filled with the KeystrokeData defaults
+    assert batch.feature_columns()["sentiment_score"] == [0, 0]
+
+    with pytest.raises(ValidationError, match="error_rate has 1 values, expected 2"):
+        KeystrokeBatch(**{**base, "error_rate": [0.1]})
+    with pytest.raises(ValidationError):
+        KeystrokeBatch(**{name: [] for name in base})
+
+
+@pytest.mark.parametrize("literal", ["NaN", "Infinity", "-Infinity"])
+def test_batch_with_non_finite_values_is_rejected_before_storing(client, app_database, literal):
+    body = (
+        '{"session_id": ["s1", "s1"], "avg_dwell_time": [100.0, %s], "avg_flight_time": [200.0, 210.0],'
+        ' "pause_count": [1, 2], "error_rate": [0.1, 0.2], "text_length": [50, 60]}' % literal
+    )
+    response = client.post(
+        "/api/cognitive/analyze/batch", content=body, headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 422
+    assert "avg_dwell_time[1] must be a finite number" in response.text
+    assert client.get("/api/cognitive/latest/s1").status_code == 404
+
+
+def test_single_window_with_nan_is_a_422(client, app_database):
+    body = ('{"session_id": "s1", "avg_dwell_time": NaN, "avg_flight_time": 200.0,'
+            ' "pause_count": 1, "error_rate": 0.1, "text_length": 50}')
+    response = client.post("/api/cognitive/analyze", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["input"] == "nan"
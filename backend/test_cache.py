@@ -0,0 +1,217 @@
+"""Shared cache: RESP client against a fake server, codec, and two workers sharing state"""
+import asyncio
+import socketserver
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import app.services.cache as cache_module
+from app.schemas.cognitive import FEATURE_NAMES, SCORE_NAMES
+from app.services.cache import (
+    CODEC_VERSION,
+    CacheBackend,
+    CacheError,
+    LocalCache,
+    RespCache,
+    decode_snapshot,
+    dumps,
+    encode_snapshot,
+    loads,
+    off_loop,
+)
+from app.services.rolling_stats import RollingStatsStore, SharedRollingStats
+from app.services.snapshot_cache import SharedSnapshotCache
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """Just enough RESP2 for RespCache: MGET, SET [PX ms] [NX], DEL, PING, AUTH, SELECT"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), FakeRedisHandler)
+        self.password = password
+        self.data = {}
+        self.lock = threading.Lock()
+        self.commands = []
+
+    def lookup(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return value
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        authed = self.server.password is None
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            name = command[0].upper().decode()
+            self.server.commands.append(name)
+            if name == "AUTH":
+                authed = command[1].decode() == self.server.password
+                self.reply(b"+OK" if authed else b"-WRONGPASS invalid password")
+            elif not authed:
+                self.reply(b"-NOAUTH Authentication required.")
+            elif name == "PING":
+                self.reply(b"+PONG")
+            elif name == "SELECT":
+                self.reply(b"+OK")
+            elif name == "MGET":
+                with self.server.lock:
+                    values = [self.server.lookup(key) for key in command[1:]]
+                self.wfile.write(b"*%d\r\n" % len(values))
+                for value in values:
+                    self.wfile.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value))
+            elif name == "SET":
+                key, value, options = command[1], command[2], [part.upper() for part in command[3:]]
+                expires_at = None
+                if b"PX" in options:
+                    expires_at = time.monotonic() + int(command[3 + options.index(b"PX") + 1]) / 1000
+                with self.server.lock:
+                    if b"NX" in options and self.server.lookup(key) is not None:
+                        self.reply(b"$-1")
+                        continue
+                    self.server.data[key] = (value, expires_at)
+                self.reply(b"+OK")
+            elif name == "DEL":
+                with self.server.lock:
+                    removed = sum(self.server.data.pop(key, None) is not None for key in command[1:])
+                self.reply(b":%d" % removed)
+            else:
+                self.reply(b"-ERR unknown command")
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        parts = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+    def reply(self, line):
+        self.wfile.write(line + b"\r\n")
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeRedis(password="s3cret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(server, password="s3cret"):
+    host, port = server.server_address
+    return RespCache(f"redis://:{password}@{host}:{port}/1")
+
+
+@pytest.mark.parametrize("backend", ["memory", "resp"])
+def test_backends_multi_get_set_ttl_and_add(backend, fake_redis):
+    cache = LocalCache() if backend == "memory" else client(fake_redis)
+    cache.set_many({"a": b"1", "b": b"\r\n$binary\x00"}, ttl=0.2)
+    cache.set("c", b"3")
+    assert cache.get_many(["a", "b", "c", "missing"]) == [b"1", b"\r\n$binary\x00", b"3", None]
+    assert not cache.add("c", b"other")
+    assert cache.add("d", b"4", ttl=10)
+    assert cache.delete("c", "missing") == 1
+    time.sleep(0.25)
+    assert cache.get_many(["a", "b", "d"]) == [None, None, b"4"]
+    cache.close()
+
+
+def test_resp_pipelines_and_reports_errors(fake_redis):
+    cache = client(fake_redis)
+    cache.set_many({f"k{i}": b"v" for i in range(50)})
+    assert cache.stats()["round_trips"] == 1
+    # AUTH and SELECT once per connection, then one SET per key in one write
+    assert fake_redis.commands.count("SET") == 50
+    with pytest.raises(CacheError):
+        client(fake_redis, password="wrong").get("k1")
+    host, port = fake_redis.server_address
+    fake_redis.shutdown()
+    fake_redis.server_close()
+    with pytest.raises(CacheError):
+        RespCache(f"redis://{host}:{port}").get("k1")
+
+
+def snapshot(session_id, metric_id, **scores):
+    row = {"id": metric_id, "session_id": session_id, "timestamp": datetime(2026, 5, 1, 12, metric_id, tzinfo=timezone.utc)}
+    row.update({name: float(i) for i, name in enumerate(FEATURE_NAMES)})
+    row.update({name: scores.get(name, 0.25) for name in SCORE_NAMES})
+    return row
+
+
+def test_codec_round_trips_snapshots_and_rejects_other_layouts():
+    row = snapshot("s", 3, rage=0.9)
+    assert decode_snapshot(encode_snapshot(row, 12.5)) == (row, 12.5)
+    assert loads("stats", encode_snapshot(row, 1.0)) is None
+    assert loads("stats", b"not json") is None
+    assert loads("stats", dumps("stats", [1])) == [1]
+    stale = dumps("stats", [1]).replace(b'"v":%d' % CODEC_VERSION, b'"v":%d' % (CODEC_VERSION + 1))
+    assert loads("stats", stale) is None
+
+
+def test_incomplete_backend_fails_at_instantiation():
+    class GetOnly(CacheBackend):
+        def get_many(self, keys):
+            return [None] * len(keys)
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_workers_share_snapshots_without_stale_reads(fake_redis):
+    worker_a = SharedSnapshotCache(client(fake_redis))
+    worker_b = SharedSnapshotCache(client(fake_redis))
+    worker_a.put(snapshot("s1", 1))
+    assert worker_b.get("s1")["id"] == 1
+    worker_b.put_many([snapshot("s1", 3), snapshot("s1", 2)])
+    assert worker_a.get("s1")["id"] == 3
+    # A read-through fill of an older row does not replace the newer snapshot
+    worker_a.fill(snapshot("s1", 2))
+    assert worker_b.get("s1")["id"] == 3
+    worker_b.invalidate()
+    assert worker_a.get("s1") is None
+    worker_a.fill(snapshot("s1", 3))
+    assert worker_b.get("s1")["id"] == 3
+
+
+def test_shared_rolling_stats_match_the_local_store():
+    backend = LocalCache()
+    worker_a = SharedRollingStats(backend, window=5)
+    worker_b = SharedRollingStats(backend, window=5)
+    local = RollingStatsStore(window=5)
+    rows = [snapshot("s1", i, rage=i / 20) for i in range(12)]
+    for i, row in enumerate(rows):
+        (worker_a if i % 2 else worker_b).update(row)
+        local.update(row)
+    assert worker_a.missing(["s1", "s2"]) == ["s2"]
+    shared_summary = worker_b.summary("s1")
+    local_summary = local.summary("s1")
+    assert shared_summary["count"] == 12
+    assert shared_summary["scores"]["rage"] == pytest.approx(local_summary["scores"]["rage"])
+    assert worker_a.zscores("s1", {"rage": 0.6}, min_count=10) == pytest.approx(
+        local.zscores("s1", {"rage": 0.6}, min_count=10)
+    )
+
+
+def test_off_loop_moves_remote_cache_calls_off_the_event_loop(fake_redis, monkeypatch):
+    async def calling_thread():
+        return await off_loop(threading.get_ident)
+
+    monkeypatch.setattr(cache_module, "shared_cache", LocalCache())
+    assert asyncio.run(calling_thread()) == threading.get_ident()
+    monkeypatch.setattr(cache_module, "shared_cache", client(fake_redis))
+    assert asyncio.run(calling_thread()) != threading.get_ident()
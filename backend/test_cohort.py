@@ -0,0 +1,112 @@
+"""Cohort histograms: quantile accuracy, merging and the incremental refresh"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.cognitive import CognitiveMetric, CohortDayHistogram, CohortWatermark
+from app.schemas.cognitive import SCORE_NAMES
+import app.services.cohort as cohort
+from app.services.cohort import BINS, histogram_rows, quantiles, refresh
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def score_rows(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        {"id": i + 1, "session_id": f"s{i % 9}", "timestamp": START + timedelta(minutes=7 * i),
+         **{name: rng.betavariate(2, 5) for name in SCORE_NAMES}}
+        for i in range(count)
+    ]
+
+
+def bins_of(histogram, score):
+    counts = {}
+    for row in histogram:
+        if row["score"] == score:
+            counts[row["bin"]] = counts.get(row["bin"], 0) + row["count"]
+    return counts
+
+
+def test_quantiles_within_one_bin_of_exact():
+    rows = score_rows(5000)
+    counts = bins_of(histogram_rows(rows, "day"), "rage")
+    exact = np.quantile([row["rage"] for row in rows], [0.5, 0.9, 0.99])
+    approx = quantiles(counts, [0.5, 0.9, 0.99])
+    assert list(approx) == ["p50", "p90", "p99"]
+    for value, expected in zip(approx.values(), exact):
+        assert abs(value - expected) <= 1 / BINS
+    assert quantiles({}, [0.5]) == {"p50": None}
+
+
+def test_histograms_merge_by_adding_counts():
+    rows = score_rows(2000)
+    whole = bins_of(histogram_rows(rows, "hour"), "heat")
+    merged = {}
+    for part in (rows[:777], rows[777:]):
+        for index, count in bins_of(histogram_rows(part, "hour"), "heat").items():
+            merged[index] = merged.get(index, 0) + count
+    assert merged == whole
+    assert sum(whole.values()) == 2000
+
+
+def test_refresh_folds_only_new_rows_past_the_lag(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cohort.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    rows = [{key: value for key, value in row.items() if key != "id"} for row in score_rows(300)]
+    db.execute(insert(CognitiveMetric), rows)
+    # Too recent for the lag window: left for a later pass
+    db.execute(insert(CognitiveMetric), [{**rows[0], "timestamp": datetime.now(timezone.utc)}])
+    db.commit()
+
+    assert refresh(db, lag=60, batch_size=64)["cognitive_metrics"] == 300
+    assert refresh(db, lag=60, batch_size=64)["cognitive_metrics"] == 0
+    assert db.get(CohortWatermark, "cognitive_metrics").last_id == 300
+    day_counts = db.execute(
+        select(CohortDayHistogram.count).where(CohortDayHistogram.score == "rage")
+    ).scalars().all()
+    assert sum(day_counts) == 300
+
+    assert refresh(db, lag=0)["cognitive_metrics"] == 1
+    db.close()
+    engine.dispose()
+
+
+def test_refresh_holds_at_id_gaps_until_open_transactions_end(session_factory, monkeypatch):
+    # Simulated PostgreSQL: txids below `xmin` have ended, `xmax` is the next one
+    snapshot = {"xmin": 10, "xmax": 12}
+    monkeypatch.setattr(cohort, "tracks_in_flight_ids", lambda db: True)
+    monkeypatch.setattr(cohort, "snapshot_xmin", lambda db: snapshot["xmin"])
+    monkeypatch.setattr(cohort, "snapshot_xmax", lambda db: snapshot["xmax"])
+    db = session_factory()
+    rows = score_rows(6)
+
+    def commit(*ids):
+        db.execute(insert(CognitiveMetric), [rows[i - 1] for i in ids])
+        db.commit()
+
+    # 3 is still being written when 4 commits
+    commit(1, 2, 4)
+    assert refresh(db, lag=0)["cognitive_metrics"] == 2
+    watermark = db.get(CohortWatermark, "cognitive_metrics")
+    assert (watermark.last_id, watermark.pending_id, watermark.pending_xid) == (2, 4, 12)
+    commit(3)
+    assert refresh(db, lag=0)["cognitive_metrics"] == 2
+
+    # 5 is rolled back: held while a transaction from before the gap may run,
+    # skipped once they have all ended
+    commit(6)
+    assert refresh(db, lag=0)["cognitive_metrics"] == 0
+    snapshot["xmin"] = 13
+    assert refresh(db, lag=0)["cognitive_metrics"] == 0
+    watermark = db.get(CohortWatermark, "cognitive_metrics")
+    assert (watermark.pending_id, watermark.pending_xid) == (6, 12)
+    snapshot.update(xmin=20, xmax=21)
+    assert refresh(db, lag=0)["cognitive_metrics"] == 1
+    assert db.get(CohortWatermark, "cognitive_metrics").last_id == 6
+    db.close()
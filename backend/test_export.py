@@ -0,0 +1,50 @@
+"""Streaming export: CSV and NDJSON content of a session's full history"""
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import insert
+
+import app.services.export as export
+from app.models.cognitive import CognitiveMetric
+from app.schemas.cognitive import METRIC_FIELDS
+from test_memory_storage import metric_rows
+
+
+@pytest.fixture
+def seeded(app_database, monkeypatch):
+    # Small partitions, so the stream spans several chunks
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 3)
+    with app_database() as db:
+        db.execute(insert(CognitiveMetric), metric_rows("s1", 7) + metric_rows("other", 2))
+        db.commit()
+
+
+def test_ndjson_and_csv_carry_the_same_rows(client, seeded):
+    ndjson = client.get("/api/cognitive/export/s1")
+    assert ndjson.status_code == 200
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert ndjson.headers["content-disposition"] == 'attachment; filename="s1.ndjson"'
+    records = [json.loads(line) for line in ndjson.text.splitlines()]
+
+    response = client.get("/api/cognitive/export/s1", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+
+    # Oldest first, only this session, header once
+    assert header == list(METRIC_FIELDS)
+    assert [record["id"] for record in records] == list(range(1, 8))
+    assert {record["session_id"] for record in records} == {"s1"}
+    assert len(rows) == 7
+    for record, row in zip(records, rows):
+        assert row[METRIC_FIELDS.index("timestamp")] == record["timestamp"]
+        assert "T" in record["timestamp"]
+        assert dict(zip(METRIC_FIELDS, row)) == {name: str(value) for name, value in record.items()}
+    assert records[2]["avg_dwell_time"] == 2.0 and records[2]["pause_count"] == 2
+
+
+def test_export_of_an_unknown_session_is_404(client, app_database):
+    assert client.get("/api/cognitive/export/nobody").status_code == 404
+    assert client.get("/api/cognitive/export/nobody", params={"format": "xml"}).status_code == 422
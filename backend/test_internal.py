@@ -0,0 +1,37 @@
+"""/internal/* and /metrics: mounted only when enabled, token-checked when set"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.main
+from app.config import settings
+from app.routes import internal
+
+
+def internal_client():
+    app = FastAPI()
+    app.include_router(internal.router)
+    app.include_router(internal.metrics_router)
+    return TestClient(app)
+
+
+def test_operational_endpoints_are_off_by_default(client):
+    assert not settings.internal_endpoints_enabled
+    paths = {route.path for route in app.main.app.routes}
+    assert "/metrics" not in paths
+    assert not any(path.startswith("/internal") for path in paths)
+    assert client.get("/metrics").status_code == 404
+    assert client.get("/internal/admission").status_code == 404
+
+
+def test_token_is_required_when_set(monkeypatch):
+    monkeypatch.setattr(settings, "internal_token", "s3cret")
+    client = internal_client()
+    for path in ("/metrics", "/internal/admission", "/internal/profiles"):
+        assert client.get(path).status_code == 403
+        assert client.get(path, headers={internal.INTERNAL_TOKEN_HEADER: "wrong"}).status_code == 403
+        assert client.get(path, headers={internal.INTERNAL_TOKEN_HEADER: "s3cret"}).status_code == 200
+
+
+def test_no_token_leaves_enabled_endpoints_open(monkeypatch):
+    monkeypatch.setattr(settings, "internal_token", "")
+    assert internal_client().get("/internal/admission").status_code == 200
@@ -0,0 +1,15 @@
+"""Reproducibility of the load generator's simulated typists"""
+import random
+
+from benchmarks.loadgen import Typist
+
+
+def test_typists_replay_with_the_same_seed():
+    def session(seed):
+        typist = Typist(random.Random(f"{seed}:steady:3"), "s")
+        return [typist.features() for _ in range(20)]
+
+    assert session(1) == session(1)
+    assert session(1) != session(2)
+    lengths = [row["text_length"] for row in session(1)]
+    assert lengths == sorted(lengths)
@@ -0,0 +1,108 @@
+"""In-memory storage: ring buffer wrap-around, paging, the byte budget and diary entries"""
+import inspect
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.schemas.cognitive import FEATURE_NAMES, METRIC_FIELDS, SCORE_NAMES
+from app.services.memory_storage import MemoryStorage
+from app.services.pagination import encode_cursor, next_cursor
+from app.services.storage import AsyncMetricStorage, AsyncSqlStorage, MetricStorage
+
+START = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+
+def metric_rows(session_id, count, offset=0):
+    rows = []
+    for i in range(offset, offset + count):
+        row = {"session_id": session_id, "timestamp": START + timedelta(seconds=5 * i)}
+        row.update({name: float(i) for name in FEATURE_NAMES})
+        row.update({name: (i % 100) / 100 for name in SCORE_NAMES})
+        rows.append(row)
+    return rows
+
+
+def test_ring_keeps_the_newest_rows_and_pages_across_the_wrap():
+    store = MemoryStorage(ring_capacity=8)
+    store.add_metrics(metric_rows("s1", 5))
+    store.add_metrics(metric_rows("s1", 7, offset=5))
+    assert store.stats()["rows"] == 8
+    assert store.stats()["rows_overwritten"] == 4
+
+    pages, before = [], None
+    while True:
+        page = store.metrics_page("s1", METRIC_FIELDS, 3, before)
+        pages.append([row.avg_dwell_time for row in page])
+        before = next_cursor(page, 3)
+        if before is None:
+            break
+    assert pages == [[11.0, 10.0, 9.0], [8.0, 7.0, 6.0], [5.0, 4.0]]
+    assert store.metrics_page("s1", METRIC_FIELDS, 3, encode_cursor(START, 1)) == []
+    with pytest.raises(ValueError):
+        store.metrics_page("s1", METRIC_FIELDS, 3, "not-a-cursor")
+
+    latest = store.latest("s1")
+    assert latest["id"] == 12
+    assert latest["timestamp"] == START + timedelta(seconds=55)
+    assert latest["pause_count"] == 11 and isinstance(latest["pause_count"], int)
+    assert latest["rage"] == pytest.approx(0.11)
+    exported = [row for partition in store.export_partitions("s1") for row in partition]
+    assert [row[0] for row in exported] == list(range(5, 13))
+
+
+def test_series_rows_are_raw_rows_in_the_window():
+    store = MemoryStorage()
+    store.add_metrics(metric_rows("s1", 10))
+    resolution, rows = store.series_rows("s1", START + timedelta(seconds=10), START + timedelta(seconds=25), 500)
+    assert resolution is None
+    assert [row["heat_mean"] for row in rows] == pytest.approx([0.02, 0.03, 0.04])
+    assert rows[0]["count"] == 1
+
+
+def test_budget_evicts_least_recently_used_sessions():
+    store = MemoryStorage(ring_capacity=64, max_bytes=21_000)
+    for session_id in ("a", "b", "c"):
+        store.add_metrics(metric_rows(session_id, 40))
+    # Reading "a" makes "b" the least recently used
+    assert store.latest("a") is not None
+    store.add_metrics(metric_rows("d", 40))
+    stats = store.stats()
+    assert stats["bytes"] <= 21_000
+    assert stats["evictions"] == 1
+    assert not store.has_metrics("b")
+    assert store.has_metrics("a") and store.has_metrics("d")
+
+
+def test_diary_entries_page_delete_and_cap():
+    store = MemoryStorage(diary_capacity=3)
+    values = {"session_id": "s1", "mood_rating": 3, "mood_notes": "", "is_crisis": False,
+              "timestamp": START, **{name: 0.5 for name in SCORE_NAMES}}
+    ids = [store.add_diary_entry({**values, "mood_rating": rating}).id for rating in range(1, 5)]
+    # The oldest entry fell out of the session's diary
+    assert store.get_diary_entry(ids[0]) is None
+    page = store.diary_page("s1", 2, None)
+    assert [entry.mood_rating for entry in page] == [4, 3]
+    assert [entry.mood_rating for entry in store.diary_page("s1", 2, next_cursor(page, 2))] == [2]
+    assert store.delete_diary_entry(ids[2])
+    assert not store.delete_diary_entry(ids[2])
+    assert [entry.id for entry in store.diary_page("s1", 10, None)] == [ids[3], ids[1]]
+
+
+def test_incomplete_backend_fails_at_instantiation():
+    class MetricsOnly(MetricStorage):
+        def add_metrics(self, rows):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        MetricsOnly()
+
+
+def test_async_backend_covers_every_storage_method():
+    assert AsyncMetricStorage.__abstractmethods__ == MetricStorage.__abstractmethods__
+    assert not AsyncSqlStorage.__abstractmethods__
+    for name in MetricStorage.__abstractmethods__:
+        method = getattr(AsyncSqlStorage, name)
+        sync_params = list(inspect.signature(getattr(MetricStorage, name)).parameters)
+        assert list(inspect.signature(method).parameters) == sync_params, name
+        # export_partitions hands back an async iterator; the rest are awaited
+        assert inspect.iscoroutinefunction(method) == (name != "export_partitions"), name
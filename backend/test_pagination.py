@@ -0,0 +1,61 @@
+"""Keyset pagination: cursors, ties on timestamp and bad cursors"""
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.models.cognitive import CognitiveMetric
+from app.services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, newest_first_page, next_cursor
+from test_memory_storage import START, metric_rows
+
+
+def seed_ties(db, session_id="s1"):
+    """Seven rows, several sharing a timestamp, inserted out of timestamp order"""
+    rows = metric_rows(session_id, 7)
+    for row, second in zip(rows, [10, 20, 20, 20, 5, 20, 10]):
+        row["timestamp"] = START.replace(second=second)
+    db.execute(insert(CognitiveMetric), rows)
+    db.commit()
+
+
+def test_cursor_round_trip_and_malformed_cursors():
+    stamp = datetime(2026, 6, 1, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(stamp, 42)) == (stamp, 42)
+    for bad in ("not-a-cursor", "", encode_cursor(stamp, 42)[:-3], "bm8tcGlwZQ"):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_pages_walk_rows_with_equal_timestamps(session_factory):
+    with session_factory() as db:
+        seed_ties(db)
+        stmt = select(CognitiveMetric.id, CognitiveMetric.timestamp).where(CognitiveMetric.session_id == "s1")
+        expected = db.execute(newest_first_page(stmt, CognitiveMetric, 100)).all()
+
+        seen, before = [], None
+        while True:
+            page = db.execute(newest_first_page(stmt, CognitiveMetric, 2, before)).all()
+            seen.extend(page)
+            before = next_cursor(page, 2)
+            if before is None:
+                break
+    # Ties are broken by id, so no row is skipped or repeated
+    assert [row.id for row in seen] == [row.id for row in expected] == [6, 4, 3, 2, 7, 1, 5]
+
+
+def test_history_route_pages_and_rejects_bad_cursors(client, app_database):
+    with app_database() as db:
+        seed_ties(db)
+    first = client.get("/api/cognitive/metrics/s1", params={"limit": 4, "fields": "rage"})
+    assert first.status_code == 200
+    assert [row["id"] for row in first.json()] == [6, 4, 3, 2]
+    second = client.get(
+        "/api/cognitive/metrics/s1", params={"limit": 4, "before": first.headers[NEXT_CURSOR_HEADER]}
+    )
+    assert [row["id"] for row in second.json()] == [7, 1, 5]
+    assert NEXT_CURSOR_HEADER not in second.headers
+
+    response = client.get("/api/cognitive/metrics/s1", params={"before": "not-a-cursor"})
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
+    assert client.get("/api/diary/entries/s1", params={"before": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,23 @@
+"""Month arithmetic and retention selection of the partition maintenance CLI"""
+from datetime import date
+
+from app.partitions import add_months, expired_months, partition_month, partition_name
+
+
+def test_partition_names_round_trip():
+    month = date(2026, 12, 1)
+    assert partition_name(month) == "cognitive_metrics_y2026m12"
+    assert partition_month(partition_name(month)) == month
+    assert partition_month("cognitive_metrics_default") is None
+    assert add_months(month, 1) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -13) == date(2024, 12, 1)
+
+
+def test_expired_months_respects_retention():
+    months = [add_months(date(2025, 1, 1), i) for i in range(24)]
+    this_month = date(2026, 10, 1)
+    # Keeping 6 months: April 2026 onwards stays, March 2026 and older expire
+    expired = expired_months(months, 6, this_month)
+    assert expired[-1] == date(2026, 3, 1)
+    assert expired[0] == date(2025, 1, 1)
+    assert expired_months(months, 0, this_month) == []
@@ -0,0 +1,33 @@
+"""Pool instrumentation: checkout waits, timeouts and dispose()"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.services.pool_monitor import InstrumentedQueuePool, PoolMonitor
+
+
+def test_monitor_counts_checkouts_and_timeouts(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    monitor = PoolMonitor("test")
+    monitor.attach(engine.pool)
+
+    held = engine.connect()
+    assert monitor.stats()["checked_out"] == 1
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    held.close()
+
+    # dispose() recreates the pool; the monitor must follow it
+    engine.dispose()
+    engine.connect().close()
+
+    stats = monitor.stats()
+    assert stats["checkouts"] == 2
+    assert stats["checkins"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["connects"] == 2
+    assert stats["peak_checked_out"] == 1
+    assert stats["wait_max_ms"] >= 50
@@ -0,0 +1,60 @@
+"""Sampling profiler middleware and the on-disk profile store"""
+import asyncio
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.profiling import ProfilerMiddleware, ProfileStore, profile_sync_endpoints
+
+
+def _busy(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def _app(store: ProfileStore) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/{item}")
+    def sync_endpoint(item: int):
+        return {"value": _busy(20000)}
+
+    @app.get("/async")
+    async def async_endpoint():
+        await asyncio.sleep(0)
+        return {"value": _busy(20000)}
+
+    profile_sync_endpoints(app.routes)
+    app.add_middleware(ProfilerMiddleware, store=store, header_token="token")
+    return app
+
+
+def test_header_triggers_capture_per_route(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=10)
+    client = TestClient(_app(store))
+
+    client.get("/sync/1")
+    client.get("/sync/1", headers={"X-Profile": "wrong"})
+    assert store.slowest() == []
+
+    assert client.get("/sync/7", headers={"X-Profile": "token"}).status_code == 200
+    client.get("/async", headers={"X-Profile": "token"})
+    captures = {entry["route"]: entry for entry in store.slowest()}
+    assert set(captures) == {"/sync/{item}", "/async"}
+    assert captures["/sync/{item}"]["status"] == 200
+
+    # The worker-thread profile of the sync endpoint is merged into the dump
+    for entry in captures.values():
+        with open(store.path(entry["id"], "collapsed")) as handle:
+            stacks = handle.read()
+        assert "_busy (test_profiling.py" in stacks
+    assert store.path("../../etc/passwd", "prof") is None
+
+
+def test_store_keeps_newest(tmp_path):
+    store = ProfileStore(str(tmp_path), keep=2)
+    client = TestClient(_app(store))
+    for _ in range(4):
+        client.get("/async", headers={"X-Profile": "token"})
+    assert len(store.slowest()) == 2
+    assert len(os.listdir(tmp_path)) == 6
@@ -0,0 +1,75 @@
+"""Read replicas: round robin, failover to the next replica and read-your-writes"""
+import pytest
+from sqlalchemy import create_engine, text
+
+import app.database as database
+import app.services.replicas as replicas
+from app.services.cache import LocalCache
+from app.services.replicas import RecentWrites, ReplicaSet, replica_urls
+
+
+@pytest.fixture
+def replica_files(tmp_path, monkeypatch):
+    urls = []
+    for name in ("a", "b"):
+        url = f"sqlite:///{tmp_path / name}.db"
+        with create_engine(url).begin() as conn:
+            conn.execute(text("CREATE TABLE origin (name TEXT)"))
+            conn.execute(text("INSERT INTO origin VALUES (:name)"), {"name": name})
+        urls.append(url)
+    # A replica that can never be opened (its directory does not exist)
+    urls.insert(1, f"sqlite:///{tmp_path / 'missing' / 'c.db'}")
+
+    replica_set = ReplicaSet(urls, retry_after=60)
+    recent = RecentWrites(window=60, shared=LocalCache())
+    monkeypatch.setattr(replicas, "replica_set", replica_set)
+    monkeypatch.setattr(database, "replica_set", replica_set)
+    monkeypatch.setattr(database, "recent_writes", recent)
+    database.get_replica_engine.cache_clear()
+    yield replica_set, recent
+    database.get_replica_engine.cache_clear()
+
+
+def origin(db):
+    return db.execute(text("SELECT name FROM origin")).scalar()
+
+
+def test_replica_urls_and_round_robin():
+    assert replica_urls(" a, ,b ") == ["a", "b"]
+    replica_set = ReplicaSet(["a", "b", "c"])
+    assert [replica_set.candidates()[0] for _ in range(4)] == [0, 1, 2, 0]
+    replica_set.mark_down(1, RuntimeError("down"))
+    assert [replica_set.candidates() for _ in range(2)] == [[0, 2], [2, 0]]
+    assert replica_set.stats()["healthy"] == 2
+
+
+def test_failover_skips_a_dead_replica(replica_files):
+    replica_set, _ = replica_files
+    seen = []
+    for _ in range(4):
+        db = database.read_session()
+        seen.append(origin(db))
+        db.close()
+    # The dead replica fails once, then stays out of rotation
+    assert seen == ["a", "b", "a", "b"]
+    stats = replica_set.stats()
+    assert stats["failovers"] == 1
+    assert stats["healthy"] == 2
+    assert stats["replica_reads"] == 4
+
+
+def test_recent_writes_read_the_primary(replica_files):
+    replica_set, recent = replica_files
+    recent.mark(["s1"])
+    db = database.read_session("s1")
+    assert not database.uses_replica(db)
+    db.close()
+    db = database.read_session("s2")
+    assert database.uses_replica(db)
+    db.close()
+    assert replica_set.stats()["read_your_writes"] == 1
+
+    # Another worker sharing the cache sees the write too
+    other_worker = RecentWrites(window=60, shared=recent.shared)
+    assert other_worker.recent("s1")
+    assert not other_worker.recent("s2")
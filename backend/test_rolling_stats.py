@@ -0,0 +1,57 @@
+"""Online statistics vs a full recomputation over the same history"""
+import random
+
+import numpy as np
+import pytest
+
+from app.schemas.cognitive import SCORE_NAMES
+from app.services.cognitive_analyzer import CognitiveAnalyzer
+from app.services.rolling_stats import RollingStatsStore
+from test_batch_scoring import random_keystroke_data
+
+
+def analyzed_rows(count, session_id="trend"):
+    rng = random.Random(99)
+    analyzer = CognitiveAnalyzer()
+    rows = []
+    for _ in range(count):
+        data = random_keystroke_data(rng, session_id)
+        rows.append({**dict(data), **analyzer.analyze(data).model_dump()})
+    return rows
+
+
+def test_online_stats_match_recomputation():
+    store = RollingStatsStore(window=20, alpha=0.3)
+    rows = analyzed_rows(200)
+    for row in rows:
+        store.update(row)
+
+    summary = store.summary("trend")
+    assert summary["count"] == 200
+    for name in ("avg_flight_time", "word_count"):
+        values = np.array([row[name] for row in rows], dtype=float)
+        stat = summary["features"][name]
+        assert stat["mean"] == pytest.approx(values.mean())
+        assert stat["std"] == pytest.approx(values.std(ddof=1))
+        assert stat["window_mean"] == pytest.approx(values[-20:].mean())
+        ewma = values[0]
+        for value in values[1:]:
+            ewma = 0.3 * value + 0.7 * ewma
+        assert stat["ewma"] == pytest.approx(ewma)
+
+
+def test_baseline_scores_need_history():
+    store = RollingStatsStore()
+    analyzer = CognitiveAnalyzer(stats_store=store)
+    rows = analyzed_rows(30, "baseline")
+    scores = analyzer.analyze(random_keystroke_data(random.Random(5), "baseline"))
+
+    assert analyzer.baseline_scores("baseline", scores).cognitive_load is None
+    for row in rows:
+        store.update(row)
+    baseline = analyzer.baseline_scores("baseline", scores)
+    loads = np.array([row["cognitive_load"] for row in rows])
+    assert baseline.cognitive_load == pytest.approx(
+        (scores.cognitive_load - loads.mean()) / loads.std(ddof=1)
+    )
+    assert set(baseline.model_dump()) == set(SCORE_NAMES)
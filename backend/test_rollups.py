@@ -0,0 +1,65 @@
+"""Rollup aggregation and LTTB downsampling (no database needed)"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.schemas.cognitive import SCORE_NAMES
+from app.services.downsample import lttb
+from app.services.rollups import aggregate_rows, choose_resolution
+
+
+def score_rows(count, start, step):
+    rng = random.Random(8)
+    return [
+        {"session_id": "rollup", "timestamp": start + step * i, **{name: rng.random() for name in SCORE_NAMES}}
+        for i in range(count)
+    ]
+
+
+def test_aggregates_merge_like_a_single_pass():
+    rows = score_rows(500, datetime(2026, 1, 1, tzinfo=timezone.utc), timedelta(seconds=17))
+    whole = aggregate_rows(rows, "minute")
+    # Split mid-bucket: merging the halves must give the single-pass result
+    halves = aggregate_rows(rows[:251], "minute") + aggregate_rows(rows[251:], "minute")
+    merged = {}
+    for agg in halves:
+        key = agg["bucket"]
+        if key not in merged:
+            merged[key] = dict(agg)
+            continue
+        merged[key]["count"] += agg["count"]
+        for name in SCORE_NAMES:
+            merged[key][f"{name}_min"] = min(merged[key][f"{name}_min"], agg[f"{name}_min"])
+            merged[key][f"{name}_max"] = max(merged[key][f"{name}_max"], agg[f"{name}_max"])
+            merged[key][f"{name}_sum"] += agg[f"{name}_sum"]
+
+    assert sum(agg["count"] for agg in whole) == 500
+    assert len(merged) == len(whole)
+    for agg in whole:
+        other = merged[agg["bucket"]]
+        assert other["count"] == agg["count"]
+        assert other["heat_min"] == agg["heat_min"]
+        assert other["heat_max"] == agg["heat_max"]
+        assert other["heat_sum"] == pytest.approx(agg["heat_sum"])
+
+
+def test_choose_resolution_picks_coarsest_that_fits():
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert choose_resolution(start, start + timedelta(hours=1), 500) is None
+    assert choose_resolution(start, start + timedelta(days=1), 500) == "minute"
+    assert choose_resolution(start, start + timedelta(days=365), 500) == "hour"
+    assert choose_resolution(start, start + timedelta(days=365), 300) == "day"
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10000, dtype=float)
+    y = np.sin(x / 300)
+    y[4321] = 10.0
+    kept = lttb(x, y, 200)
+    assert len(kept) == 200
+    assert kept[0] == 0 and kept[-1] == 9999
+    assert 4321 in kept
+    assert np.all(np.diff(kept) > 0)
+    assert list(lttb(x[:50], y[:50], 200)) == list(range(50))
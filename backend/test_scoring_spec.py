@@ -0,0 +1,172 @@
+"""Golden-output tests: compiled scoring spec vs the reference formulas"""
+import copy
+import json
+import os
+import random
+
+import pytest
+
+from app.schemas.cognitive import FEATURE_NAMES, SCORE_NAMES
+from app.services.cognitive_analyzer import CognitiveAnalyzer
+from app.services.features import FeatureDetector
+from app.services.rolling_stats import RollingStatsStore
+from app.services.scoring_spec import (
+    DEFAULT_SCORING_SPEC,
+    ScoringSpecError,
+    ScoringSpecLoader,
+    compile_spec,
+)
+from test_batch_scoring import random_keystroke_data
+
+
+def normalize(value, low, high):
+    return max(0.0, min(1.0, (value - low) / (high - low)))
+
+
+def clip(value):
+    return max(0.0, min(1.0, value))
+
+
+def reference_scores(data):
+    """
+    The hand-written formulas the default spec replaced, kept here as the
+    golden reference: the spec must reproduce them bit for bit
+    """
+    speed = 1 - normalize(data.avg_flight_time, 50, 300)
+    dwell_norm = normalize(data.avg_dwell_time, 50, 200)
+    dwell_instability = min(1.0, abs(data.avg_dwell_time - 100) / 100)
+    pause_norm = normalize(data.pause_count, 0, 10)
+    load_pause = 1 - normalize(data.avg_pause_duration, 2000, 10000) if data.pause_count > 0 else 0.8
+    recklessness = data.error_rate / (1 + data.correction_rate) if data.correction_rate > 0 else data.error_rate
+    rush_score = normalize(data.text_length / (1 + data.avg_pause_duration / 1000), 0, 100) if data.text_length > 0 else 0
+
+    heat = clip(
+        0.35 * speed + 0.25 * dwell_norm
+        + 0.25 * (0.9 if data.pause_count == 0 else 1 - pause_norm)
+        + 0.15 * (normalize(data.text_length, 0, 500) if data.text_length > 0 else 0)
+    )
+    if data.error_rate > 0.2 and data.correction_rate < data.error_rate * 0.5:
+        frustration = 0.8
+    else:
+        frustration = data.error_rate * 0.5
+    sentiment_rage = abs(data.sentiment_score) if data.sentiment_score < 0 else 0
+    return {
+        'cognitive_load': clip(0.4 * speed + 0.4 * data.error_rate + 0.2 * load_pause),
+        'mood_drift': clip(0.5 * ((1 - data.sentiment_score) / 2) + 0.3 * data.error_rate + 0.2 * dwell_norm),
+        'decision_stability': clip(
+            1 - (0.5 * data.correction_rate + 0.3 * pause_norm + 0.2 * dwell_instability)
+        ),
+        'risk_volatility': clip(0.4 * speed + 0.4 * recklessness + 0.2 * rush_score),
+        'heat': heat,
+        'rage': clip(
+            0.30 * data.error_rate + 0.30 * sentiment_rage + 0.20 * frustration
+            + 0.10 * dwell_instability + 0.10 * (heat * 0.5)
+        ),
+    }
+
+
+def test_default_spec_matches_reference_formulas():
+    rng = random.Random(42)
+    evaluator = compile_spec(DEFAULT_SCORING_SPEC)
+    samples = [random_keystroke_data(rng) for _ in range(2000)]
+
+    columns = {name: [getattr(s, name) for s in samples] for name in FEATURE_NAMES}
+    batch = evaluator.evaluate_batch(columns)
+
+    for i, sample in enumerate(samples):
+        expected = reference_scores(sample)
+        scalar = evaluator.evaluate(dict(sample))
+        for name in SCORE_NAMES:
+            assert scalar[name] == expected[name], (name, sample)
+            assert batch[name][i] == expected[name], (name, sample)
+
+
+def test_public_score_methods_delegate_to_the_spec():
+    rng = random.Random(7)
+    analyzer = CognitiveAnalyzer(stats_store=RollingStatsStore())
+    for sample in (random_keystroke_data(rng) for _ in range(200)):
+        expected = reference_scores(sample)
+        assert analyzer.calculate_cognitive_load(sample) == expected['cognitive_load']
+        assert analyzer.calculate_mood_drift(sample) == expected['mood_drift']
+        assert analyzer.calculate_decision_stability(sample) == expected['decision_stability']
+        assert analyzer.calculate_risk_volatility(sample) == expected['risk_volatility']
+        features = {'heat': expected['heat'], 'rage': expected['rage']}
+        assert analyzer.feature_detector.analyze_features(sample) == features
+        assert FeatureDetector().detect_rage(sample) == expected['rage']
+
+
+def test_compile_rejects_bad_specs():
+    spec = copy.deepcopy(DEFAULT_SCORING_SPEC)
+    del spec["scores"]["rage"]
+    with pytest.raises(ScoringSpecError):
+        compile_spec(spec)
+
+    spec = copy.deepcopy(DEFAULT_SCORING_SPEC)
+    spec["terms"]["speed"] = {"op": "invert", "of": "no_such_term"}
+    with pytest.raises(ScoringSpecError):
+        compile_spec(spec)
+
+    spec = copy.deepcopy(DEFAULT_SCORING_SPEC)
+    spec["terms"]["heat_amplification"] = {"op": "scale", "of": "rage", "by": 0.5}
+    with pytest.raises(ScoringSpecError):
+        compile_spec(spec)
+
+
+def test_loader_hot_reloads_weight_changes(tmp_path):
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps(DEFAULT_SCORING_SPEC))
+    loader = ScoringSpecLoader(str(path), reload_interval=0)
+    data = dict(random_keystroke_data(random.Random(7)))
+    before = loader.get().evaluate(data)
+
+    spec = copy.deepcopy(DEFAULT_SCORING_SPEC)
+    spec["scores"]["mood_drift"]["weights"] = [["sentiment_factor", 1.0]]
+    path.write_text(json.dumps(spec))
+    os.utime(path, (0, 12345))
+    after = loader.get().evaluate(data)
+    assert after["mood_drift"] == max(0.0, min(1.0, (1 - data["sentiment_score"]) / 2))
+    assert after["cognitive_load"] == before["cognitive_load"]
+
+    # A broken file keeps the last good spec in service
+    path.write_text("{not json")
+    os.utime(path, (0, 23456))
+    assert loader.get().evaluate(data) == after
+
+
+@pytest.mark.parametrize("spec", [
+    [],
+    {"terms": [], "scores": {}},
+    {"terms": {"speed": "invert flight_norm"}},
+    {"terms": {"flight_norm": {"op": "normalize", "of": "avg_flight_time", "range": 300}}},
+    {"terms": {"flight_norm": {"op": "normalize", "of": "avg_flight_time", "range": ["a", "b"]}}},
+    {"terms": {"load_pause": {"op": "select", "when": [["pause_count", [">"], 0]], "then": 1, "else": 0}}},
+    {"terms": {"sentiment_factor": {"op": "reflect", "of": "sentiment_score", "offset": 1, "divisor": 0}}},
+    {"scores": {"heat": "speed"}},
+])
+def test_loader_keeps_last_good_spec_on_malformed_shapes(tmp_path, spec):
+    if isinstance(spec, dict):
+        # Graft the broken part onto an otherwise valid spec
+        merged = copy.deepcopy(DEFAULT_SCORING_SPEC)
+        for section, entries in spec.items():
+            if isinstance(entries, dict) and entries:
+                merged[section].update(entries)
+            else:
+                merged[section] = entries
+        spec = merged
+    with pytest.raises(ScoringSpecError):
+        compile_spec(spec)
+
+    data = dict(random_keystroke_data(random.Random(11)))
+    expected = compile_spec(DEFAULT_SCORING_SPEC).evaluate(data)
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps(spec))
+    # The first load falls back to the built-in spec instead of failing
+    loader = ScoringSpecLoader(str(path), reload_interval=0)
+    assert loader.get().evaluate(data) == expected
+
+    path.write_text(json.dumps(DEFAULT_SCORING_SPEC))
+    os.utime(path, (0, 12345))
+    assert loader.get().evaluate(data) == expected
+    path.write_text(json.dumps(spec))
+    os.utime(path, (0, 23456))
+    assert loader.get().evaluate(data) == expected
@@ -0,0 +1,29 @@
+"""Projection and columnar encoding of metric history rows"""
+from datetime import datetime, timezone
+
+import pytest
+
+from app.schemas.cognitive import CognitiveMetricResponse, METRIC_FIELDS
+from app.services.serialization import FastJSONResponse, columnar, parse_fields, row_dicts
+
+
+def test_parse_fields_keeps_keys_and_response_order():
+    assert parse_fields(None) == METRIC_FIELDS
+    assert parse_fields("rage, cognitive_load") == ("id", "timestamp", "cognitive_load", "rage")
+    with pytest.raises(ValueError, match="nope"):
+        parse_fields("rage,nope")
+
+
+def test_encoding_matches_pydantic():
+    row = {name: 0.1 for name in METRIC_FIELDS}
+    row.update(id=7, session_id="s", pause_count=2, text_length=40, word_count=8,
+               timestamp=datetime(2026, 3, 1, 12, 0, 0, 250000, tzinfo=timezone.utc))
+    rows = [tuple(row[name] for name in METRIC_FIELDS)]
+    expected = "[" + CognitiveMetricResponse(**row).model_dump_json() + "]"
+    assert FastJSONResponse(row_dicts(rows, METRIC_FIELDS)).body.decode() == expected
+
+    fields = parse_fields("rage")
+    assert columnar([(1, "t1", 0.5), (2, "t2", 0.25)], fields) == {
+        "id": [1, 2], "timestamp": ["t1", "t2"], "rage": [0.5, 0.25],
+    }
+    assert columnar([], fields) == {"id": [], "timestamp": [], "rage": []}
@@ -0,0 +1,53 @@
+"""Session bookkeeping: idempotent upserts and the known-session cache"""
+import pytest
+from sqlalchemy import func, select
+
+import app.services.sessions as sessions
+from app.models.cognitive import Session as SessionModel
+from app.services.sessions import SessionRegistry, upsert_sessions
+
+
+def session_ids(db):
+    return sorted(db.scalars(select(SessionModel.session_id)))
+
+
+@pytest.mark.parametrize("dialect_upsert", [True, False], ids=["insert-or-ignore", "savepoint-fallback"])
+def test_upsert_ignores_existing_sessions(session_factory, monkeypatch, dialect_upsert):
+    if not dialect_upsert:
+        # Dialects without an upsert insert row by row inside savepoints
+        monkeypatch.setattr(sessions, "_upsert_statement", lambda dialect: None)
+    with session_factory() as db:
+        upsert_sessions(db, ["a", "b"])
+        db.commit()
+        upsert_sessions(db, ["b", "c", "a"])
+        db.commit()
+        assert session_ids(db) == ["a", "b", "c"]
+
+
+def test_registries_of_two_workers_create_each_session_once(session_factory):
+    first, second = SessionRegistry(), SessionRegistry()
+    with session_factory() as db:
+        first.ensure(db, ["s1", "s1", "s2"])
+        # Another worker has not seen the sessions: it upserts them again
+        second.ensure(db, ["s2", "s3"])
+        first.ensure(db, ["s1", "s2"])
+        assert session_ids(db) == ["s1", "s2", "s3"]
+        assert db.scalar(select(func.count(SessionModel.id))) == 3
+
+    assert first.stats()["upserts"] == 2
+    assert first.stats()["hits"] == 2
+    assert second.stats()["upserts"] == 2
+
+
+def test_registry_is_a_bounded_lru(session_factory):
+    registry = SessionRegistry(max_size=2)
+    with session_factory() as db:
+        registry.ensure(db, ["a"])
+        registry.ensure(db, ["b"])
+        registry.ensure(db, ["a"])
+        registry.ensure(db, ["c"])
+        # "b" was the least recently used; it is upserted again, harmlessly
+        registry.ensure(db, ["b"])
+        assert session_ids(db) == ["a", "b", "c"]
+    assert registry.stats()["size"] == 2
+    assert registry.stats()["upserts"] == 4
@@ -0,0 +1,79 @@
+"""Latest-snapshot cache: read-through, newest-wins and invalidation on deletes"""
+import time
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+import app.services.snapshot_cache as snapshot_module
+from app.models.cognitive import CognitiveMetric
+from app.services.cache import LocalCache
+from app.services.snapshot_cache import SharedSnapshotCache, SnapshotCache, latest_snapshot
+from test_memory_storage import metric_rows
+
+
+@pytest.fixture(params=["local", "shared"])
+def cache(request, monkeypatch):
+    if request.param == "local":
+        cache = SnapshotCache()
+    else:
+        cache = SharedSnapshotCache(LocalCache())
+    # The ORM delete hooks look the module's cache up at call time
+    monkeypatch.setattr(snapshot_module, "snapshot_cache", cache)
+    return cache
+
+
+def seed(db, session_id, count):
+    db.execute(insert(CognitiveMetric), metric_rows(session_id, count))
+    db.commit()
+
+
+def test_read_through_then_hit(session_factory, cache):
+    with session_factory() as db:
+        seed(db, "s1", 3)
+        assert latest_snapshot(db, "s1")["avg_dwell_time"] == 2.0
+        assert cache.stats()["misses"] == 1
+        assert latest_snapshot(db, "s1")["avg_dwell_time"] == 2.0
+        assert cache.stats()["hits"] == 1
+        assert latest_snapshot(db, "nobody") is None
+
+
+def test_read_through_fill_does_not_replace_a_newer_snapshot(cache):
+    older, newer = metric_rows("s1", 2)
+    cache.put({**newer, "id": 2})
+    # A fill that read the database before the write landed
+    cache.fill({**older, "id": 1})
+    assert cache.get("s1")["id"] == 2
+
+
+def test_orm_delete_invalidates_that_session(session_factory, cache):
+    with session_factory() as db:
+        seed(db, "s1", 3)
+        seed(db, "s2", 1)
+        latest_snapshot(db, "s1")
+        latest_snapshot(db, "s2")
+
+        newest = db.scalars(select(CognitiveMetric).where(CognitiveMetric.session_id == "s1")
+                            .order_by(CognitiveMetric.id.desc())).first()
+        db.delete(newest)
+        db.commit()
+        assert cache.get("s1") is None
+        assert cache.get("s2") is not None
+        # The next read falls back to the row that is now newest
+        assert latest_snapshot(db, "s1")["avg_dwell_time"] == 1.0
+
+
+def test_bulk_delete_clears_every_session(session_factory, cache):
+    with session_factory() as db:
+        seed(db, "s1", 2)
+        seed(db, "s2", 2)
+        latest_snapshot(db, "s1")
+        latest_snapshot(db, "s2")
+        if isinstance(cache, SharedSnapshotCache):
+            # The flush marker compares wall-clock stamps
+            time.sleep(0.01)
+
+        db.execute(delete(CognitiveMetric).where(CognitiveMetric.session_id == "s2"))
+        db.commit()
+        assert cache.get("s1") is None and cache.get("s2") is None
+        assert latest_snapshot(db, "s2") is None
+        assert latest_snapshot(db, "s1")["avg_dwell_time"] == 1.0
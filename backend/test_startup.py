@@ -0,0 +1,27 @@
+"""Importing the app must stay side-effect free and light"""
+import os
+import subprocess
+import sys
+
+from app.lazy import lazy_module
+
+
+def test_import_does_not_connect_or_load_heavy_modules(tmp_path):
+    db_path = tmp_path / "app.db"
+    check = (
+        "import sys, app.main\n"
+        "heavy = [m for m in ('numpy', 'sqlalchemy.ext.asyncio', 'sqlalchemy.dialects.postgresql') if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+        "from app.database import get_engine\n"
+        "assert get_engine.cache_info().currsize == 0\n"
+    )
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "ASYNC_DB": "false", "LOG_LEVEL": "WARNING"}
+    subprocess.run([sys.executable, "-c", check], env=env, check=True, cwd=os.path.dirname(__file__) or ".")
+    assert not db_path.exists()
+
+
+def test_lazy_module_imports_on_first_use():
+    json_module = lazy_module("json")
+    assert "dumps" not in vars(json_module)
+    assert json_module.dumps([1]) == "[1]"
+    assert "dumps" in vars(json_module)
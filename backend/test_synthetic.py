@@ -0,0 +1,52 @@
+"""Synthetic data generator: determinism, real scores and loading"""
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine, func, select
+
+from app.database import Base
+from app.models.cognitive import CognitiveMetric, DayRollup, DiaryEntry, Session as SessionModel
+from app.schemas.cognitive import FEATURE_NAMES, SCORE_NAMES, KeystrokeData
+from app.services.cognitive_analyzer import CognitiveAnalyzer
+from app.services.rolling_stats import RollingStatsStore
+from app.synthetic import Plan, copy_field, generate_chunk, load_chunk, plan_chunks
+
+PLAN = Plan(seed=5, metrics_per_session=40, days=3, interval=20.0, diary_rate=0.05,
+            end=datetime(2026, 3, 1, tzinfo=timezone.utc))
+
+
+def test_chunks_are_deterministic_and_scored_by_the_analyzer():
+    chunks = plan_chunks(25, PLAN.metrics_per_session, chunk_rows=400)
+    assert [chunk.sessions for chunk in chunks] == [10, 10, 5]
+    first = generate_chunk(PLAN, chunks[1])
+    again = generate_chunk(PLAN, chunks[1])
+    assert first.metrics == again.metrics and first.diary == again.diary
+    assert first.sessions[0] == "synthetic-5-00000010"
+
+    analyzer = CognitiveAnalyzer(stats_store=RollingStatsStore())
+    for row in first.metrics[::50]:
+        features = KeystrokeData(session_id=row["session_id"], **{name: row[name] for name in FEATURE_NAMES})
+        assert analyzer.analyze(features).model_dump() == {name: row[name] for name in SCORE_NAMES}
+        assert row["timestamp"] < PLAN.end
+    assert all(1 <= entry["mood_rating"] <= 5 for entry in first.diary)
+
+
+def test_copy_field_escapes_text_format():
+    assert copy_field(None) == "\\N"
+    assert copy_field("") == ""
+    assert copy_field("a\tb\\c\n") == "a\\tb\\\\c\\n"
+    assert copy_field(0.5) == "0.5"
+
+
+def test_load_chunk_fills_tables_and_rollups(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'synthetic.db'}")
+    Base.metadata.create_all(engine)
+    generated = generate_chunk(PLAN, plan_chunks(6, PLAN.metrics_per_session)[0])
+    load_chunk(engine, generated, rollups=True, batch_size=64)
+
+    with engine.connect() as conn:
+        count = lambda stmt: conn.execute(stmt).scalar()
+        assert count(select(func.count()).select_from(SessionModel)) == 6
+        assert count(select(func.count()).select_from(CognitiveMetric)) == len(generated.metrics)
+        assert count(select(func.count()).select_from(DiaryEntry)) == len(generated.diary)
+        assert count(select(func.sum(DayRollup.count))) == len(generated.metrics)
+    engine.dispose()
@@ -0,0 +1,32 @@
+"""Prometheus text rendering of the in-process metrics"""
+from app.services.telemetry import Counter, Histogram, StatsGauges, statement_type
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/x")
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/x",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/x"} 4' in lines
+    assert 'latency_seconds_sum{route="/x"} 3.65' in lines
+
+
+def test_counter_and_gauges_render():
+    counter = Counter("requests_total", "test", ("status",))
+    counter.inc('4"04')
+    assert 'requests_total{status="4\\"04"} 1' in counter.render()
+
+    gauges = StatsGauges("pool", "test", lambda: {"sync": {"size": 5, "pool": "QueuePool"}}, label="engine")
+    lines = gauges.render()
+    assert 'pool_size{engine="sync"} 5' in lines
+    assert not any(line.startswith("pool_pool") for line in lines)
+
+
+def test_statement_type():
+    assert statement_type("  select 1") == "SELECT"
+    assert statement_type("INSERT INTO t VALUES (1)") == "INSERT"
+    assert statement_type("PRAGMA table_info(x)") == "OTHER"
+    assert statement_type("") == "OTHER"
@@ -0,0 +1,134 @@
+"""WebSocket ingestion: per-frame scoring, error frames, rate limit and flushing"""
+import asyncio
+import json
+import random
+
+from sqlalchemy import func, select
+
+import app.routes.cognitive as cognitive
+import app.routes.cognitive_ws as cognitive_ws
+import app.services.admission as admission
+from app.models.cognitive import CognitiveMetric
+from app.routes.cognitive_ws import ConnectionBuffer
+from app.services.admission import SessionRateLimiter
+from test_batch_scoring import random_keystroke_data
+
+
+def frame(rng):
+    return random_keystroke_data(rng).model_dump(exclude={"session_id"})
+
+
+def stored_rows(app_database, session_id):
+    with app_database() as db:
+        return db.scalar(
+            select(func.count()).select_from(CognitiveMetric).where(CognitiveMetric.session_id == session_id)
+        )
+
+
+def test_frames_are_scored_and_persisted_at_close(client, app_database):
+    rng = random.Random(1)
+    with client.websocket_connect("/ws/cognitive/ws-1") as websocket:
+        for _ in range(3):
+            websocket.send_text(json.dumps(frame(rng)))
+            reply = websocket.receive_json()
+            assert reply["session_id"] == "ws-1"
+            assert 0 <= reply["scores"]["cognitive_load"] <= 1
+        # Below WS_FLUSH_SIZE nothing is written until the socket closes
+        assert stored_rows(app_database, "ws-1") == 0
+    assert stored_rows(app_database, "ws-1") == 3
+
+
+def test_invalid_frames_get_an_error_and_keep_the_connection(client, app_database):
+    rng = random.Random(2)
+    with client.websocket_connect("/ws/cognitive/ws-2") as websocket:
+        websocket.send_text("not json")
+        assert websocket.receive_json()["error"] == "Invalid frame"
+        websocket.send_text(json.dumps({**frame(rng), "error_rate": "high"}))
+        assert websocket.receive_json()["error"] == "Invalid frame"
+        websocket.send_text(json.dumps(frame(rng)))
+        assert "error" not in websocket.receive_json()
+    assert stored_rows(app_database, "ws-2") == 1
+
+
+def test_rate_limit_only_counts_valid_frames(client, app_database, monkeypatch):
+    monkeypatch.setattr(admission, "session_limiter", SessionRateLimiter(rate=0.001, burst=2))
+    rng = random.Random(3)
+    with client.websocket_connect("/ws/cognitive/ws-3") as websocket:
+        for _ in range(3):
+            websocket.send_text("[]")
+            assert websocket.receive_json()["error"] == "Invalid frame"
+        for _ in range(2):
+            websocket.send_text(json.dumps(frame(rng)))
+            assert "error" not in websocket.receive_json()
+        websocket.send_text(json.dumps(frame(rng)))
+        reply = websocket.receive_json()
+        assert reply["error"] == "Rate limit exceeded"
+        assert reply["retry_after"] > 0
+    assert stored_rows(app_database, "ws-3") == 2
+
+
+def test_failed_flush_keeps_rows_for_the_next_one(monkeypatch):
+    written, failures = [], [RuntimeError("database down")]
+
+    def persist(rows):
+        if failures:
+            raise failures.pop()
+        written.extend(rows)
+
+    monkeypatch.setattr(cognitive_ws, "persist_rows", persist)
+    buffer = ConnectionBuffer(flush_size=2, flush_interval=60, max_rows=3)
+
+    async def scenario():
+        assert await buffer.add({"n": 1})
+        assert await buffer.add({"n": 2})  # reaches flush_size; the flush fails
+        assert buffer.pending == 2 and not written
+        assert await buffer.add({"n": 3})  # retried along with the kept rows
+        assert buffer.pending == 0
+        assert [row["n"] for row in written] == [1, 2, 3]
+
+        failures.extend([RuntimeError("database down")] * 2)
+        for n in (4, 5, 6):  # both flushes fail, rows 4-6 stay buffered
+            assert await buffer.add({"n": n})
+        assert buffer.pending == 3
+        assert not await buffer.add({"n": 7})  # full: the frame is refused
+        assert await buffer.flush(final=True)
+        assert [row["n"] for row in written] == [1, 2, 3, 4, 5, 6]
+
+    asyncio.run(scenario())
+
+
+def test_write_behind_frames_are_queued_off_the_loop_and_marked_written(client, monkeypatch):
+    class Writer:
+        running = True
+        rows = []
+        calls_on_loop = 0
+
+        def submit(self, row):
+            try:
+                asyncio.get_running_loop()
+                self.calls_on_loop += 1
+            except RuntimeError:
+                pass
+            self.rows.append(row)
+            return len(self.rows) < 2
+
+    class Recent:
+        marked = []
+
+        def mark(self, session_ids):
+            self.marked.extend(session_ids)
+
+    writer, recent = Writer(), Recent()
+    monkeypatch.setattr(cognitive, "metric_writer", writer)
+    monkeypatch.setattr(cognitive_ws, "metric_writer", writer)
+    monkeypatch.setattr(cognitive, "recent_writes", recent)
+    rng = random.Random(4)
+    with client.websocket_connect("/ws/cognitive/ws-4") as websocket:
+        websocket.send_text(json.dumps(frame(rng)))
+        assert "error" not in websocket.receive_json()
+        # Second submit finds the queue full
+        websocket.send_text(json.dumps(frame(rng)))
+        assert "error" in websocket.receive_json()
+    assert writer.calls_on_loop == 0
+    # Only the queued row marks the session (read-your-writes routing)
+    assert recent.marked == ["ws-4"]
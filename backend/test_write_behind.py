@@ -0,0 +1,96 @@
+"""Write-behind: batched flushes, retries, backpressure and the stop/drain handshake"""
+import threading
+import uuid
+
+from sqlalchemy import func, select
+
+from app.models.cognitive import CognitiveMetric
+from app.services.write_behind import MetricWriteBehind
+from test_memory_storage import metric_rows
+
+
+def session_rows(count):
+    # Fresh session ids: the session registry is process-wide
+    return metric_rows(f"wb-{uuid.uuid4().hex}", count)
+
+
+def stored_rows(session_factory):
+    with session_factory() as db:
+        return db.scalar(select(func.count(CognitiveMetric.id)))
+
+
+def failing_first(session_factory, failures):
+    """A session factory whose first `failures` calls fail like a dropped connection"""
+    calls = []
+
+    def factory():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("database unavailable")
+        return session_factory()
+
+    return factory
+
+
+def test_flush_writes_batches_and_stop_drains(session_factory):
+    writer = MetricWriteBehind(session_factory, flush_size=4, flush_interval=0.05)
+    writer.start()
+    assert all(writer.submit(row) for row in session_rows(10))
+    writer.stop(timeout=5)
+
+    assert stored_rows(session_factory) == 10
+    stats = writer.stats()
+    assert stats["flushed_rows"] == 10 and stats["failed_rows"] == 0
+    assert stats["batches"] >= 3
+    # Stopped: nothing more is accepted
+    assert not writer.submit(session_rows(1)[0])
+
+
+def test_failed_flush_is_retried_then_dropped(session_factory):
+    writer = MetricWriteBehind(failing_first(session_factory, 2), max_retries=3, retry_backoff=0)
+    writer._flush(session_rows(5))
+    assert stored_rows(session_factory) == 5
+    assert writer.stats()["flush_retries"] == 2
+
+    writer = MetricWriteBehind(failing_first(session_factory, 10), max_retries=3, retry_backoff=0)
+    writer._flush(session_rows(5))
+    assert stored_rows(session_factory) == 5
+    stats = writer.stats()
+    assert stats["flush_retries"] == 3
+    assert stats["failed_rows"] == 5 and stats["flushed_rows"] == 0
+
+
+def test_full_queue_rejects_after_the_enqueue_timeout(session_factory):
+    # Not started: nothing drains the queue
+    writer = MetricWriteBehind(session_factory, queue_size=2, enqueue_timeout=0.01)
+    rows = session_rows(3)
+    assert writer.submit(rows[0]) and writer.submit(rows[1])
+    assert not writer.submit(rows[2])
+    stats = writer.stats()
+    assert stats["rejected"] == 1 and stats["backpressure_waits"] == 1
+    assert stats["enqueued"] == 2 and stats["max_depth"] == 2
+
+
+def test_stop_waits_for_in_flight_submits(session_factory):
+    writer = MetricWriteBehind(session_factory, flush_interval=0.05)
+    put, release = writer._put, threading.Event()
+
+    def slow_put(row):
+        # Past the stopping check but not yet queued
+        release.wait()
+        return put(row)
+
+    writer._put = slow_put
+    writer.start()
+    submitter = threading.Thread(target=writer.submit, args=(session_rows(1)[0],))
+    submitter.start()
+    stopper = threading.Thread(target=writer.stop, kwargs={"timeout": 5})
+    stopper.start()
+    stopper.join(0.2)
+    assert stopper.is_alive()
+
+    release.set()
+    submitter.join(5)
+    stopper.join(5)
+    assert not stopper.is_alive()
+    assert stored_rows(session_factory) == 1
@@ -1,11 +1,11 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import TextInput from './components/TextInput';
 import Dashboard from './components/Dashboard';
 import CrisisSupport from './components/CrisisSupport';
 import BehaviorDiary from './components/BehaviorDiary';
 import { useKeystrokeCapture } from './hooks/useKeystrokeCapture';
 import { analyzeSentiment, countWords } from './services/sentimentAnalyzer';
-import { analyzeTyping } from './services/api';
+import { createAnalysisStream } from './services/api';
 import './App.css';
 
 function App() {
@@ -15,6 +15,7 @@ function App() {
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState('analysis'); // analysis, crisis, diary
+  const streamRef = useRef(null);
   
   const {
     handleKeyDown,
@@ -28,6 +29,13 @@ function App() {
     updateTextLength(text.length);
   }, [text, updateTextLength]);
   
+  // One WebSocket per session for analysis (HTTP until it is connected)
+  useEffect(() => {
+    const stream = createAnalysisStream(sessionId);
+    streamRef.current = stream;
+    return () => stream.close();
+  }, [sessionId]);
+  
   // Auto-analyze every 5 seconds if there's text
   useEffect(() => {
     if (text.trim().length === 0) {
@@ -61,7 +69,7 @@ function App() {
         word_count: wordCount,
       };
       
-      const response = await analyzeTyping(data);
+      const response = await streamRef.current.analyze(data);
       setScores(response.scores);
     } catch (err) {
       console.error('Analysis error:', err);
@@ -26,4 +26,57 @@ export const getLatestMetric = async (sessionId) => {
   return response.data;
 };
 
+// Same host as the REST API, over ws:// or wss://
+const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
+
+// One long-lived WebSocket per session; falls back to POST /analyze while
+// the socket is connecting or when WebSockets are unavailable
+export const createAnalysisStream = (sessionId) => {
+  let socket = null;
+  const pending = [];
+
+  const connect = () => {
+    socket = new WebSocket(`${WS_BASE_URL}/ws/cognitive/${encodeURIComponent(sessionId)}`);
+    socket.onmessage = (event) => {
+      // Replies come back in the order frames were sent
+      const waiter = pending.shift();
+      if (!waiter) return;
+      const message = JSON.parse(event.data);
+      if (message.error) {
+        waiter.reject(new Error(message.error));
+      } else {
+        waiter.resolve(message);
+      }
+    };
+    socket.onclose = () => {
+      pending.splice(0).forEach((waiter) => waiter.reject(new Error('Connection closed')));
+      socket = null;
+    };
+  };
+
+  const analyze = (data) => {
+    if (typeof WebSocket === 'undefined') {
+      return analyzeTyping(data);
+    }
+    if (!socket) {
+      connect();
+    }
+    if (socket.readyState !== WebSocket.OPEN) {
+      return analyzeTyping(data);
+    }
+    return new Promise((resolve, reject) => {
+      pending.push({ resolve, reject });
+      socket.send(JSON.stringify(data));
+    });
+  };
+
+  const close = () => {
+    if (socket) {
+      socket.close();
+    }
+  };
+
+  return { analyze, close };
+};
+
 export default api;